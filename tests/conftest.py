@@ -29,10 +29,37 @@ def args_gen():
         "s",
         "sort",
         "reverse",
+        "cache",
+        "cache_max_entries",
+        "cache_prune",
+        "prober",
+        "walk_threads",
+        "per_device",
+        "timeout",
+        "retries",
+        "backoff",
+        "sniff",
+        "dedup",
+        "count_duplicates",
+        "files_from",
+        "null",
+        "fields",
+        "group_by",
+        "playlists",
     )
 
     for arg in arguments:
         setattr(args, arg, False)
+    args.prober = "auto"
+    args.walk_threads = 4
+    args.timeout = None
+    args.cache_max_entries = None
+    args.retries = 0
+    args.backoff = 0.0
+    args.files_from = None
+    args.fields = ()
+    args.group_by = None
+    args.playlists = True
 
     return args
 
@@ -140,6 +167,13 @@ format_params = (
     pytest.param(1234.0, "d", "0.014d", id="days"),
 )
 
+semaphore_params = (
+    pytest.param("4", 4, id="number"),
+    pytest.param("AUTO", "auto", id="auto"),
+    pytest.param("0", None, id="zero"),
+    pytest.param("many", None, id="nonsense"),
+)
+
 checking_args_params = (
     pytest.param(True, True, False, False, id="--Verbose --Sort"),
     pytest.param(True, False, False, False, id="--Verbose"),
@@ -177,3 +211,10 @@ handle_params = (
     pytest.param("16_bad.mp3", sort_args(), 0.0, 0, False, True),
     pytest.param("17_bad.mp3", reverse_args(), 100.0, 0, False, True),
 )
+
+probe_duration_params = (
+    pytest.param("auto", 10.0, 20.0, 10.0, False, id="auto native"),
+    pytest.param("auto", None, 20.0, 20.0, True, id="auto fallback"),
+    pytest.param("native", None, 20.0, False, False, id="native failure"),
+    pytest.param("ffprobe", 10.0, 20.0, 20.0, True, id="ffprobe"),
+)
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+import viddur
+import viddur.source as source
+from viddur.api import make_args
+
+
+@pytest.fixture()
+def probed(monkeypatch):
+    monkeypatch.setattr(source, "check_ffprobe", lambda: True)
+    monkeypatch.setattr(source, "find_duration", AsyncMock(return_value=10.0))
+
+
+def test_make_args():
+    args = make_args(recursive=True, sem=3)
+    assert args.recursive and args.sem == 3
+    assert args.prober == "auto"
+    with pytest.raises(TypeError):
+        make_args(nonsense=True)
+
+
+def test_probe_paths(probed, mocked_directory):
+    results = viddur.probe_paths(["dir1", "pwd_correct_1.mp4"], recursive=True)
+    by_path = {result.path: result for result in results}
+    assert len(by_path) == 9
+    assert by_path["dir1/dir3/dir3_correct_1.mp4"].duration == 10.0
+    assert by_path["dir1/dir1_bad_2.pdf"].status is viddur.Status.NOT_MEDIA
+    assert sum(result.duration for result in results) == 50.0
+
+
+def test_probe_paths_not_recursive(probed, mocked_directory):
+    results = viddur.probe_paths("dir1")
+    assert sorted(result.path for result in results) == [
+        "dir1/dir1_bad_1.mp3",
+        "dir1/dir1_bad_2.pdf",
+        "dir1/dir1_correct_1.mp4",
+        "dir1/dir1_correct_2.mkv",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_aprobe_paths_concurrent_calls(probed, mocked_directory):
+    async def total(path):
+        return sum(
+            [
+                result.duration
+                async for result in viddur.aprobe_paths(path, recursive=True)
+            ]
+        )
+
+    assert await asyncio.gather(total("dir1"), total("dir2")) == [40.0, 20.0]
+
+
+@pytest.mark.asyncio
+async def test_aprobe_paths_shared_cache(probed, mocked_directory, tmp_path):
+    with viddur.DurationCache(str(tmp_path / "cache.sqlite3")) as cache:
+        for _ in range(2):
+            _ = [result async for result in viddur.aprobe_paths("dir2", cache=cache)]
+        assert (cache.hits, cache.misses) == (2, 2)
+
+
+@pytest.mark.parametrize("concurrency", (0, -2, "many"))
+def test_probe_paths_bad_concurrency(probed, mocked_directory, concurrency):
+    with pytest.raises(ValueError):
+        viddur.probe_paths("dir1", concurrency=concurrency)
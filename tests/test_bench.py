@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+from viddur import bench
+from viddur.containers import native_duration
+from viddur.walker import walk
+
+
+def test_tiny_files(tmp_path):
+    for name, content in (
+        ("a.mp4", bench.tiny_mp4(12.5)),
+        ("b.mkv", bench.tiny_mkv(3)),
+    ):
+        (tmp_path / name).write_bytes(content)
+        assert native_duration(str(tmp_path / name)) == pytest.approx(
+            12.5 if name == "a.mp4" else 3.0
+        )
+
+
+def test_make_corpus(tmp_path):
+    total = bench.make_corpus(str(tmp_path), 250, video_ratio=0.5)
+    files = list(walk(str(tmp_path)))
+    assert len(files) == 250
+    durations = [native_duration(file) for file in files if not file.endswith(".txt")]
+    assert 0 < len(durations) < 250
+    assert sum(durations) == pytest.approx(total)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("failure_rate", "failed"), ((0.0, 0), (1.0, 20)))
+async def test_bench(tmp_path, failure_rate, failed):
+    bench.make_corpus(str(tmp_path), 20, video_ratio=1.0)
+    path = os.environ["PATH"]
+    with bench.stub_ffprobe(0.0, failure_rate):
+        run = await bench.bench(str(tmp_path), 4, "ffprobe", 2)
+    assert os.environ["PATH"] == path
+    assert (run.files, run.probed, run.failed) == (20, 20, failed)
+    assert 0 < run.p50 <= run.p99
+
+
+@pytest.mark.asyncio
+async def test_bench_in_child(tmp_path):
+    bench.make_corpus(str(tmp_path), 20, video_ratio=1.0)
+    ballast = b"x" * (256 << 20)  # The peak of this process isn't the child's.
+    with bench.stub_ffprobe():
+        run = await bench.bench_in_child(str(tmp_path), 4, "ffprobe", 2)
+    del ballast
+    assert (run.files, run.probed, run.failed) == (20, 20, 0)
+    if os.path.exists("/proc/self/status"):
+        assert 0 < run.peak_rss < 256
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert bench.percentile(values, 0.5) == 50.0
+    assert bench.percentile(values, 0.99) == 99.0
+    assert bench.percentile([], 0.5) == 0.0
+
+
+def test_regressions(tmp_path):
+    run = bench.Run(100, 4, "ffprobe", 0.0, 1.0, 80, 0, 100.0, 0.1, 0.2, None)
+    baseline = tmp_path / "base.jsonl"
+    baseline.write_text(json.dumps(run._replace(rate=110.0)._asdict()) + "\n")
+    assert bench.regressions([run], str(baseline), 0.2) == []
+    assert len(bench.regressions([run], str(baseline), 0.05)) == 1
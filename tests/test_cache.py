@@ -0,0 +1,78 @@
+import os
+from unittest.mock import AsyncMock
+
+import pytest
+from conftest import args_gen
+
+import viddur.source as viddur
+from viddur.cache import DurationCache, stat_key
+
+
+@pytest.fixture()
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"Some nonsense")
+    return str(path)
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    with DurationCache(str(tmp_path / "cache" / "durations.sqlite3")) as db:
+        yield db
+
+
+def test_stat_key_missing_file(tmp_path):
+    assert stat_key(str(tmp_path / "missing.mp4")) is None
+
+
+def test_cache_hit_and_miss(cache, video):
+    key = stat_key(video)
+    assert cache.get(key) is None
+    cache.put(key, video, 12.5)
+    assert cache.get(key) == 12.5
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_modified_file_is_a_miss(cache, video):
+    cache.put(stat_key(video), video, 12.5)
+    stat = os.stat(video)
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(stat_key(video)) is None
+
+
+def test_cache_persists(tmp_path, video):
+    path = str(tmp_path / "durations.sqlite3")
+    with DurationCache(path) as db:
+        db.put(stat_key(video), video, 3.0)
+    with DurationCache(path) as db:
+        assert db.get(stat_key(video)) == 3.0
+
+
+def test_cache_prune(cache, video, tmp_path):
+    other = tmp_path / "other.mkv"
+    other.write_bytes(b"Some nonsense")
+    cache.put(stat_key(video), video, 1.0)
+    cache.put(stat_key(str(other)), str(other), 2.0)
+    os.remove(video)
+    assert cache.prune() == 1
+    assert len(cache) == 1
+
+
+def test_cache_evict(cache, tmp_path):
+    for i in range(5):
+        cache.put((0, i, 1, 1), f"{i}.mp4", float(i))
+    cache.commit()
+    assert cache.evict(2) == 3
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_uses_cache(monkeypatch, cache, video):
+    mocked = AsyncMock(return_value=42.0)
+    monkeypatch.setattr(viddur, "find_duration", mocked)
+    semaphore = viddur.asyncio.Semaphore(1)
+    first = await viddur.handle(video, semaphore, args_gen(), cache)
+    second = await viddur.handle(video, semaphore, args_gen(), cache)
+    assert first.duration == second.duration == 42.0
+    assert mocked.await_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from viddur import concurrency
+from viddur.concurrency import AdaptiveLimiter, DeviceScheduler, acquire
+
+
+def feed(limiter, latency, windows, start=0.0):
+    now = start
+    for _ in range(windows):
+        for _ in range(max(limiter.limit, concurrency.MIN_WINDOW)):
+            now += latency / limiter.limit
+            limiter.record(latency, now)
+    return now
+
+
+@pytest.mark.asyncio
+async def test_limiter_grows_with_steady_latency():
+    limiter = AdaptiveLimiter(initial=4, maximum=10, use_load=False)
+    feed(limiter, 0.1, windows=20)
+    assert limiter.limit == limiter.highest == 10
+
+
+@pytest.mark.asyncio
+async def test_limiter_shrinks_with_inflated_latency():
+    limiter = AdaptiveLimiter(initial=8, maximum=10, use_load=False)
+    now = feed(limiter, 0.1, windows=1)
+    feed(limiter, 1.0, windows=3, start=now)
+    assert limiter.limit < 8
+    assert limiter.lowest == limiter.limit
+
+
+@pytest.mark.asyncio
+async def test_limiter_shrinks_with_high_load(monkeypatch):
+    monkeypatch.setattr(
+        concurrency.os, "getloadavg", lambda: (1e6, 0, 0), raising=False
+    )
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    limiter.use_load = True
+    feed(limiter, 0.1, windows=2)
+    assert limiter.limit < 8
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_in_flight():
+    limiter = AdaptiveLimiter(initial=3, maximum=3, use_load=False)
+    in_flight = peak = 0
+
+    async def probe():
+        nonlocal in_flight, peak
+        async with limiter:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+
+    await asyncio.gather(*(probe() for _ in range(30)))
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_device_scheduler_orders_by_inode(tmp_path):
+    files = []
+    for i in range(6):
+        path = tmp_path / f"{i}.mp4"
+        path.write_bytes(b"Some nonsense")
+        files.append(str(path))
+    files.sort(key=lambda file: concurrency.os.stat(file).st_ino)
+    scheduler = DeviceScheduler(1)
+    order = []
+    gate = asyncio.Event()
+
+    async def probe(file):
+        async with acquire(scheduler, file):
+            await gate.wait()
+            order.append(file)
+
+    tasks = [asyncio.create_task(probe(file)) for file in reversed(files)]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+    # The first one got the slot right away, the rest are released in inode order.
+    assert order == [files[-1]] + files[:-1]
+    assert len(scheduler.devices) == 1
+
+
+@pytest.mark.asyncio
+async def test_device_scheduler_separate_budgets(monkeypatch):
+    devices = {"a": 1, "b": 2}
+    monkeypatch.setattr(
+        concurrency.os,
+        "stat",
+        lambda file: type("stat", (), {"st_dev": devices[file[0]], "st_ino": 1}),
+    )
+    scheduler = DeviceScheduler(1)
+    slow = asyncio.Event()
+
+    async def probe(file, event=None):
+        async with acquire(scheduler, file):
+            if event is not None:
+                await event.wait()
+
+    blocked = asyncio.create_task(probe("a1", slow))
+    await asyncio.sleep(0)
+    # Device "b" isn't starved by the stuck probe on device "a".
+    await asyncio.wait_for(probe("b1"), timeout=1)
+    slow.set()
+    await blocked
+
+
+@pytest.mark.asyncio
+async def test_device_scheduler_cancelled_waiter(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"Some nonsense")
+    scheduler = DeviceScheduler(1)
+    gate = asyncio.Event()
+
+    async def probe():
+        async with acquire(scheduler, str(path)):
+            await gate.wait()
+
+    first = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    second.cancel()
+    gate.set()
+    await first
+    await asyncio.wait_for(probe(), timeout=1)
+    (device,) = scheduler.devices.values()
+    assert device.in_flight == 0
@@ -0,0 +1,127 @@
+import struct
+
+import pytest
+
+from viddur.containers import media_kind, native_duration, sniff
+
+
+def box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def mvhd(timescale, duration, version=0):
+    if version:
+        fields = struct.pack(">QQIQ", 0, 0, timescale, duration)
+    else:
+        fields = struct.pack(">IIII", 0, 0, timescale, duration)
+    return box(b"mvhd", bytes([version, 0, 0, 0]) + fields + bytes(80))
+
+
+def mp4(timescale, duration, version=0, moov_at_end=False):
+    ftyp = box(b"ftyp", b"isom\x00\x00\x02\x00isommp41")
+    moov = box(b"moov", mvhd(timescale, duration, version))
+    mdat = box(b"mdat", bytes(4096))
+    return ftyp + (mdat + moov if moov_at_end else moov + mdat)
+
+
+def ebml(element_id, payload):
+    size = len(payload) | (1 << 56)  # 8 bytes size.
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return id_bytes + size.to_bytes(8, "big") + payload
+
+
+def mkv(duration_ticks, timecode_scale=1_000_000, unknown_cluster=False):
+    header = ebml(0x1A45DFA3, ebml(0x4282, b"matroska"))
+    info = ebml(
+        0x1549A966,
+        ebml(0x2AD7B1, timecode_scale.to_bytes(3, "big"))
+        + ebml(0x4489, struct.pack(">d", duration_ticks)),
+    )
+    seek_head = ebml(0x114D9B74, bytes(32))
+    if unknown_cluster:
+        cluster = b"\x1f\x43\xb6\x75\x01\xff\xff\xff\xff\xff\xff\xff" + bytes(64)
+        return header + ebml(0x18538067, seek_head + cluster + info)
+    return header + ebml(0x18538067, seek_head + info + ebml(0x1F43B675, bytes(64)))
+
+
+def chunk(chunk_id, payload):
+    return struct.pack("<4sI", chunk_id, len(payload)) + payload
+
+
+def avi(micro_sec_per_frame, frames, grand_frames=None):
+    avih = chunk(
+        b"avih",
+        struct.pack("<10I", micro_sec_per_frame, 0, 0, 0, frames, 0, 1, 0, 2, 2)
+        + bytes(16),
+    )
+    hdrl = b"hdrl" + avih
+    if grand_frames is not None:
+        hdrl += chunk(
+            b"LIST",
+            b"odml" + chunk(b"dmlh", struct.pack("<I", grand_frames) + bytes(244)),
+        )
+    return chunk(b"RIFF", b"AVI " + chunk(b"LIST", hdrl) + chunk(b"LIST", b"movi"))
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    (
+        pytest.param(mp4(1_000, 90_500), 90.5, id="mp4"),
+        pytest.param(mp4(600, 6_000, moov_at_end=True), 10.0, id="mp4 moov at end"),
+        pytest.param(mp4(1_000, 5_000, version=1), 5.0, id="mp4 version 1"),
+        pytest.param(mp4(1_000, 0), None, id="fragmented mp4"),
+        pytest.param(mkv(12_345.0), 12.345, id="mkv"),
+        pytest.param(mkv(2_000.0, timecode_scale=500_000), 1.0, id="mkv scaled"),
+        pytest.param(mkv(2_000.0, unknown_cluster=True), None, id="mkv live"),
+        pytest.param(avi(40_000, 250), 10.0, id="avi"),
+        pytest.param(avi(40_000, 250, grand_frames=500), 20.0, id="avi odml"),
+        pytest.param(b"Some nonsense", None, id="nonsense"),
+        pytest.param(b"", None, id="empty"),
+    ),
+)
+def test_native_duration(tmp_path, content, expected):
+    path = tmp_path / "video"
+    path.write_bytes(content)
+    assert native_duration(str(path)) == pytest.approx(expected)
+
+
+def test_native_duration_missing_file(tmp_path):
+    assert native_duration(str(tmp_path / "missing.mp4")) is None
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    (
+        pytest.param("a.mp4", "video", id="mp4"),
+        pytest.param("dir.d/A.MKV", "video", id="upper case"),
+        pytest.param("a.mp3", "audio", id="mp3"),
+        pytest.param("a.pdf", "application", id="pdf"),
+        pytest.param("README", None, id="no extension"),
+    ),
+)
+def test_media_kind(name, expected):
+    assert media_kind(name) == expected
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    (
+        pytest.param(mp4(1_000, 1_000), True, id="mp4"),
+        pytest.param(box(b"ftyp", b"M4A \x00\x00\x00\x00"), False, id="m4a"),
+        pytest.param(box(b"ftyp", b"heic\x00\x00\x00\x00"), False, id="heic"),
+        pytest.param(box(b"ftyp", b"avif\x00\x00\x00\x00"), False, id="avif"),
+        pytest.param(mkv(1_000.0), True, id="mkv"),
+        pytest.param(avi(40_000, 10), True, id="avi"),
+        pytest.param(b"RIFF\x00\x00\x00\x00WAVEfmt ", False, id="wav"),
+        pytest.param((b"\x47" + bytes(187)) * 2, True, id="mpeg-ts"),
+        pytest.param(b"%PDF-1.7\n", False, id="pdf"),
+        pytest.param(b"ID3\x04\x00", False, id="mp3"),
+        pytest.param(b"Some nonsense", None, id="unknown"),
+        pytest.param(b"", None, id="empty"),
+    ),
+)
+def test_sniff(tmp_path, content, expected):
+    path = tmp_path / "file"
+    path.write_bytes(content)
+    assert sniff(str(path)) is expected
+    assert sniff(str(tmp_path / "missing")) is None
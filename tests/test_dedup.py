@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import pytest
+
+from viddur import dedup
+from viddur.results import Result, Status
+
+
+@pytest.fixture()
+def files(tmp_path):
+    (tmp_path / "a.mp4").write_bytes(b"A" * 200_000)
+    os.link(tmp_path / "a.mp4", tmp_path / "hardlink.mp4")
+    (tmp_path / "copy.mp4").write_bytes(b"A" * 200_000)
+    (tmp_path / "same_size.mp4").write_bytes(b"B" * 200_000)
+    (tmp_path / "other.mp4").write_bytes(b"C" * 100)
+    return [
+        str(tmp_path / name)
+        for name in ("a.mp4", "hardlink.mp4", "copy.mp4", "same_size.mp4", "other.mp4")
+    ]
+
+
+async def run_all(deduplicator, files):
+    probed = []
+
+    async def examine(file):
+        await asyncio.sleep(0.01)
+        probed.append(os.path.basename(file))
+        return Result(file, 10.0, Status.OK)
+
+    results = await asyncio.gather(
+        *(deduplicator.run(file, lambda file=file: examine(file)) for file in files)
+    )
+    return sorted(probed), [result.status for result in results]
+
+
+def test_fingerprint(files):
+    a, hardlink, copy, same_size, _ = files
+    assert (
+        dedup.fingerprint(a) == dedup.fingerprint(copy) == dedup.fingerprint(hardlink)
+    )
+    assert dedup.fingerprint(a) != dedup.fingerprint(same_size)
+    assert dedup.fingerprint(a + ".missing") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("mode", "count_duplicates", "probed", "statuses"),
+    (
+        pytest.param(
+            "inode",
+            False,
+            ["a.mp4", "copy.mp4", "other.mp4", "same_size.mp4"],
+            [Status.OK, Status.DUPLICATE, Status.OK, Status.OK, Status.OK],
+            id="inode",
+        ),
+        pytest.param(
+            "content",
+            False,
+            ["a.mp4", "other.mp4", "same_size.mp4"],
+            [Status.OK, Status.DUPLICATE, Status.DUPLICATE, Status.OK, Status.OK],
+            id="content",
+        ),
+        pytest.param(
+            "content",
+            True,
+            ["a.mp4", "other.mp4", "same_size.mp4"],
+            [Status.OK] * 5,
+            id="content counted",
+        ),
+    ),
+)
+async def test_run(files, mode, count_duplicates, probed, statuses):
+    deduplicator = dedup.Deduplicator(mode, count_duplicates)
+    assert await run_all(deduplicator, files) == (probed, statuses)
+    assert deduplicator.duplicates == len(files) - len(probed)
+
+
+@pytest.mark.asyncio
+async def test_failed_original(files):
+    deduplicator = dedup.Deduplicator("inode")
+
+    async def examine():
+        return Result(files[0], 0.0, Status.FAILED)
+
+    await deduplicator.run(files[0], examine)
+    result = await deduplicator.run(files[1], examine)
+    assert result == Result(files[1], 0.0, Status.FAILED)
+    assert not deduplicator.duplicates
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        dedup.Deduplicator("path")
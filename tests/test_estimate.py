@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from viddur import estimate
+from viddur.results import Result, Status
+
+
+@pytest.fixture()
+def population():
+    rng = random.Random(0)
+    population = estimate.Population()
+    durations = {}
+    for i in range(2_000):
+        extension = ".mkv" if i % 4 else ".mp4"
+        path = f"dir/{i}{extension}"
+        duration = rng.uniform(60, 3_600)
+        bitrate = 1_000 if extension == ".mkv" else 3_000
+        population.add(path, int(duration * bitrate * rng.uniform(0.5, 1.5)))
+        durations[path] = duration
+    population.add("dir/rare.avi", 5_000)
+    durations["dir/rare.avi"] = 10.0
+    return population, durations
+
+
+def prober(durations, probed):
+    async def probe(paths):
+        for path in paths:
+            probed.append(path)
+            yield Result(path, durations[path], Status.OK)
+
+    return probe
+
+
+def test_collect(tmp_path):
+    (tmp_path / "a.mp4").write_bytes(b"1234")
+    (tmp_path / "b.txt").write_bytes(b"12")
+    files = [str(tmp_path / name) for name in ("a.mp4", "b.txt", "missing.mp4")]
+    population = estimate.collect(files, all_files=False)
+    assert population.paths == [str(tmp_path / "a.mp4")]
+    assert list(population.sizes) == [4]
+    assert len(estimate.collect(files, all_files=True)) == 2
+
+
+def test_exact_when_everything_is_probed(population):
+    population, durations = population
+    estimator = estimate.Estimator(population)
+    for index, path in enumerate(population.paths):
+        estimator.add(index, durations[path])
+    result = estimator.estimate()
+    assert result.total == pytest.approx(sum(durations.values()))
+    assert result.error == pytest.approx(0.0, abs=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_single_round(population):
+    population, durations = population
+    probed = []
+    result = await estimate.estimate(
+        population, prober(durations, probed), 100, rng=random.Random(1)
+    )
+    assert result.probed == len(probed) == 100
+    assert result.population == 2_001
+    assert abs(result.total - sum(durations.values())) <= result.error
+
+
+@pytest.mark.asyncio
+async def test_target_error(population):
+    population, durations = population
+    probed = []
+    result = await estimate.estimate(
+        population,
+        prober(durations, probed),
+        50,
+        target_error=0.01,
+        rng=random.Random(1),
+    )
+    assert result.error <= 0.01 * result.total
+    assert 50 < len(probed) == len(set(probed)) < 2_001
+
+
+@pytest.mark.asyncio
+async def test_time_budget(population):
+    population, durations = population
+    probed = []
+    result = await estimate.estimate(
+        population, prober(durations, probed), 10, time_budget=0.0
+    )
+    assert result.probed == 10
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from viddur import walker
+from viddur.filters import WalkFilter, make_filter, parse_size, parse_time
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    (tmp_path / "a.mp4").write_bytes(b"x" * 10)
+    (tmp_path / "dir1" / "dir2").mkdir(parents=True)
+    (tmp_path / "dir1" / "b.mkv").write_bytes(b"x" * 1000)
+    (tmp_path / "dir1" / "dir2" / "c.avi").write_bytes(b"x" * 100)
+    (tmp_path / "skip").mkdir()
+    (tmp_path / "skip" / "d.mp4").write_bytes(b"x")
+    os.utime(tmp_path / "dir1" / "b.mkv", (0, 1_000_000))
+    os.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        pytest.param("700", 700, id="bytes"),
+        pytest.param("10M", 10 << 20, id="megabytes"),
+        pytest.param("1.5gib", 3 << 29, id="fraction"),
+    ),
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+def test_parse_size_invalid():
+    with pytest.raises(ValueError):
+        parse_size("ten")
+
+
+def test_parse_time():
+    assert parse_time("2d", now=1_000_000) == 1_000_000 - 2 * 86400
+    assert parse_time("1970-01-02T00:00:00+00:00") == 86400
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+@pytest.mark.parametrize(
+    ("options", "expected"),
+    (
+        pytest.param(
+            {}, ["a.mp4", "dir1/b.mkv", "dir1/dir2/c.avi", "skip/d.mp4"], id="none"
+        ),
+        pytest.param({"include": ["*.mp4"]}, ["a.mp4", "skip/d.mp4"], id="include"),
+        pytest.param(
+            {"include": ["dir1/*"]}, ["dir1/b.mkv", "dir1/dir2/c.avi"], id="path"
+        ),
+        pytest.param(
+            {"exclude": ["skip", "*.avi"]}, ["a.mp4", "dir1/b.mkv"], id="exclude"
+        ),
+        pytest.param(
+            {"include_regex": [r"\.(mkv|avi)$"]},
+            ["dir1/b.mkv", "dir1/dir2/c.avi"],
+            id="regex",
+        ),
+        pytest.param(
+            {"exclude_regex": ["^dir1"]}, ["a.mp4", "skip/d.mp4"], id="exclude regex"
+        ),
+        pytest.param({"min_size": 50, "max_size": 500}, ["dir1/dir2/c.avi"], id="size"),
+        pytest.param({"older": 2_000_000}, ["dir1/b.mkv"], id="older"),
+        pytest.param({"newer": 2_000_000, "include": ["*.mkv"]}, [], id="newer"),
+        pytest.param({"max_depth": 0}, ["a.mp4"], id="depth 0"),
+        pytest.param(
+            {"max_depth": 1}, ["a.mp4", "dir1/b.mkv", "skip/d.mp4"], id="depth 1"
+        ),
+        pytest.param(
+            {"one_file_system": True},
+            ["a.mp4", "dir1/b.mkv", "dir1/dir2/c.avi", "skip/d.mp4"],
+            id="one file system",
+        ),
+    ),
+)
+def test_walk_filter(tree, options, expected):
+    files = walker.walk(os.curdir, 2, WalkFilter(**options))
+    assert sorted(os.path.normpath(file) for file in files) == expected
+
+
+@pytest.mark.parametrize(
+    "walk_filter",
+    (
+        pytest.param(WalkFilter(exclude=["dir2/*"]), id="glob"),
+        pytest.param(WalkFilter(exclude_regex=["^dir2/"]), id="regex"),
+    ),
+)
+def test_paths_are_relative_to_the_root(tree, walk_filter):
+    assert list(walker.walk("dir1", 2, walk_filter)) == [os.path.join("dir1", "b.mkv")]
+
+
+def test_excluded_directories_are_not_listed(tree, monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def recording(path):
+        listed.append(os.path.normpath(path))
+        return scandir(path)
+
+    monkeypatch.setattr(walker.os, "scandir", recording)
+    list(walker.walk(os.curdir, 1, WalkFilter(exclude=["dir1"])))
+    assert sorted(listed) == [".", "skip"]
+
+
+def test_excluded_files_are_not_stated(tree, monkeypatch):
+    def stat(*_, **__):
+        raise AssertionError("stat'ed")
+
+    monkeypatch.setattr(os.DirEntry, "stat", stat, raising=False)
+    walk_filter = WalkFilter(include=["nothing*"], min_size=1)
+    assert list(walker.list_files(os.curdir, walk_filter)) == []
+
+
+def test_expand_filters_given_files(tree):
+    walk_filter = WalkFilter(exclude=["*.mkv"], min_size=50)
+    files = ["a.mp4", "dir1/b.mkv", "dir1/dir2/c.avi", "missing.mp4"]
+    assert list(walker.expand(files, walk_filter=walk_filter)) == [
+        "dir1/dir2/c.avi",
+        "missing.mp4",  # Examining it reports the error.
+    ]
+
+
+def test_make_filter(mocked_raw_args):
+    assert make_filter(mocked_raw_args) is None
+    mocked_raw_args.walk_depth = 0
+    assert make_filter(mocked_raw_args).max_depth == 0
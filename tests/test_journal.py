@@ -0,0 +1,43 @@
+from viddur.journal import Journal, read_journal
+from viddur.results import Result, Status
+
+RESULTS = [
+    Result("a.mp4", 10.0, Status.OK, 0.1),
+    Result("dir/b.mkv", 0.0, Status.FAILED, 0.1),
+    Result("c.txt", 0.0, Status.NOT_MEDIA),
+]
+
+
+def test_journal_and_resume(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "journal.jsonl")
+    with Journal(path) as journal:
+        for result in RESULTS:
+            journal.record(result)
+    assert list(read_journal(path)) == [
+        result._replace(path=str(tmp_path / result.path)) for result in RESULTS[:2]
+    ]
+
+    with open(path, "a") as fp:
+        fp.write('{"path": "torn.mp4", "dura')  # Killed in the middle of a write.
+    (tmp_path / "dir").mkdir()
+    monkeypatch.chdir(tmp_path / "dir")  # Resumed from elsewhere.
+    with Journal(path, resume=True) as journal:
+        assert set(journal.done) == {str(tmp_path / "a.mp4")}
+        pending = list(journal.pending(["../a.mp4", "b.mkv", "../c.txt", "d.mp4"]))
+        assert pending == ["b.mkv", "../c.txt", "d.mp4"]  # The failure is retried.
+        journal.record(Result("d.mp4", 5.0, Status.OK))
+    assert [result.path for result in read_journal(path)] == [
+        str(tmp_path / "a.mp4"),
+        str(tmp_path / "dir/b.mkv"),
+        str(tmp_path / "dir/d.mp4"),
+    ]
+
+
+def test_journal_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with Journal(path) as journal:
+        journal.record(RESULTS[0])
+    with Journal(path) as journal:
+        assert not journal.done
+    assert not list(read_journal(path))
@@ -3,13 +3,21 @@ from unittest.mock import AsyncMock, Mock
 import pytest
 from conftest import (
     MockedParser,
+    args_gen,
     checking_args_params,
     find_duration_params,
     format_params,
     handle_params,
+    probe_duration_params,
+    semaphore_params,
+    verbose_args,
 )
+from test_containers import mp4
 
 import viddur.source as viddur
+from viddur.api import make_args
+from viddur.playlists import SegmentIndex
+from viddur.results import ResultStore, Status
 
 
 def test_default_terminal_width():
@@ -42,6 +50,15 @@ def test_format_time(mocked_raw_args, seconds, f, expected):
     assert out == expected
 
 
+@pytest.mark.parametrize(("value", "expected"), semaphore_params)
+def test_semaphore_type(value, expected):
+    if expected is None:
+        with pytest.raises(viddur.argparse.ArgumentTypeError):
+            viddur.semaphore_type(value)
+    else:
+        assert viddur.semaphore_type(value) == expected
+
+
 @pytest.mark.parametrize(
     ("verbose", "sort", "reverse", "expected"), checking_args_params
 )
@@ -73,6 +90,21 @@ async def test_find_duration(monkeypatch, return_value, return_code, expected):
     assert result == expected
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("prober", "native", "ffprobe", "expected", "spawned"), probe_duration_params
+)
+async def test_probe_duration(
+    monkeypatch, mocked_raw_args, prober, native, ffprobe, expected, spawned
+):
+    mocked_raw_args.prober = prober
+    mocked_find_duration = AsyncMock(return_value=ffprobe)
+    monkeypatch.setattr(viddur, "native_duration", Mock(return_value=native))
+    monkeypatch.setattr(viddur, "find_duration", mocked_find_duration)
+    assert await viddur.probe_duration("test", mocked_raw_args) == expected
+    assert mocked_find_duration.called == spawned
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     (
@@ -97,21 +129,25 @@ async def test_handle(
 ):
     semaphore = viddur.asyncio.Semaphore(1)
     monkeypatch.setattr(viddur, "find_duration", AsyncMock(return_value=result))
-    return_code = await viddur.handle(file_name, semaphore, args)
+    store = ResultStore()
+    return_code = viddur.report(
+        await viddur.handle(file_name, semaphore, args), args, store
+    )
+    saved = {item.path: item for item in store}
     assert return_code == expected_return_code
     if expected_to_saved:
         if return_code == 0:
             if "bad" in file_name and not args.all and not (args.sort or args.reverse):
-                assert file_name not in viddur.FILES_DUR.keys()
+                assert file_name not in saved.keys()
             else:
                 if "bad" in file_name and not args.all:
-                    assert viddur.FILES_DUR[file_name] == 0.0
+                    assert saved[file_name].duration == 0.0
                 else:
-                    assert viddur.FILES_DUR[file_name] == result
+                    assert saved[file_name].duration == result
         else:
-            assert viddur.FILES_DUR[file_name] == 0.0
+            assert saved[file_name].duration == 0.0
     else:
-        assert file_name not in viddur.FILES_DUR.keys()
+        assert file_name not in saved.keys()
     out, _ = capsys.readouterr()
     if expected_output:
         assert out != ""
@@ -123,7 +159,7 @@ async def test_handle(
 def test_cleanup_inputs_without_argument(mocked_directory, mocked_raw_args):
     mocked_raw_args.path_file = [viddur.os.getcwd()]
     result = viddur.cleanup_inputs(mocked_raw_args)
-    assert list(result) == [
+    assert sorted(result) == [
         "pwd_bad_1.mp3",
         "pwd_bad_2.pdf",
         "pwd_correct_1.mp4",
@@ -172,24 +208,26 @@ def test_cleanup_inputs_with_recursive(mocked_directory, mocked_raw_args):
     mocked_raw_args.recursive = True
     mocked_raw_args.path_file = [viddur.os.getcwd()]
     result = viddur.cleanup_inputs(mocked_raw_args)
-    assert list(result) == [
-        "./pwd_bad_1.mp3",
-        "./pwd_bad_2.pdf",
-        "./pwd_correct_1.mp4",
-        "./pwd_correct_2.mkv",
-        "dir2/dir2_correct_2.mkv",
-        "dir2/dir2_correct_1.mp4",
-        "dir2/dir2_bad_2.pdf",
-        "dir2/dir2_bad_1.mp3",
-        "dir1/dir1_bad_1.mp3",
-        "dir1/dir1_bad_2.pdf",
-        "dir1/dir1_correct_1.mp4",
-        "dir1/dir1_correct_2.mkv",
-        "dir1/dir3/dir3_correct_2.mkv",
-        "dir1/dir3/dir3_bad_1.mp3",
-        "dir1/dir3/dir3_bad_2.pdf",
-        "dir1/dir3/dir3_correct_1.mp4",
-    ]
+    assert sorted(result) == sorted(
+        [
+            "./pwd_bad_1.mp3",
+            "./pwd_bad_2.pdf",
+            "./pwd_correct_1.mp4",
+            "./pwd_correct_2.mkv",
+            "dir2/dir2_correct_2.mkv",
+            "dir2/dir2_correct_1.mp4",
+            "dir2/dir2_bad_2.pdf",
+            "dir2/dir2_bad_1.mp3",
+            "dir1/dir1_bad_1.mp3",
+            "dir1/dir1_bad_2.pdf",
+            "dir1/dir1_correct_1.mp4",
+            "dir1/dir1_correct_2.mkv",
+            "dir1/dir3/dir3_correct_2.mkv",
+            "dir1/dir3/dir3_bad_1.mp3",
+            "dir1/dir3/dir3_bad_2.pdf",
+            "dir1/dir3/dir3_correct_1.mp4",
+        ]
+    )
 
 
 @pytest.mark.cleanup_inputs
@@ -197,16 +235,18 @@ def test_cleanup_inputs_with_recursive_with_dir(mocked_directory, mocked_raw_arg
     mocked_raw_args.recursive = True
     mocked_raw_args.path_file = ["dir1"]
     result = viddur.cleanup_inputs(mocked_raw_args)
-    assert list(result) == [
-        "dir1/dir1_bad_1.mp3",
-        "dir1/dir1_bad_2.pdf",
-        "dir1/dir1_correct_1.mp4",
-        "dir1/dir1_correct_2.mkv",
-        "dir1/dir3/dir3_correct_2.mkv",
-        "dir1/dir3/dir3_bad_1.mp3",
-        "dir1/dir3/dir3_bad_2.pdf",
-        "dir1/dir3/dir3_correct_1.mp4",
-    ]
+    assert sorted(result) == sorted(
+        [
+            "dir1/dir1_bad_1.mp3",
+            "dir1/dir1_bad_2.pdf",
+            "dir1/dir1_correct_1.mp4",
+            "dir1/dir1_correct_2.mkv",
+            "dir1/dir3/dir3_correct_2.mkv",
+            "dir1/dir3/dir3_bad_1.mp3",
+            "dir1/dir3/dir3_bad_2.pdf",
+            "dir1/dir3/dir3_correct_1.mp4",
+        ]
+    )
 
 
 @pytest.mark.cleanup_inputs
@@ -215,3 +255,319 @@ def test_cleanup_inputs_with_bad_input(mocked_directory, mocked_raw_args):
     mocked_raw_args.path_file = ["unknown"]
     with pytest.raises(NotADirectoryError):
         viddur.cleanup_inputs(mocked_raw_args)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("results", "expected"),
+    (
+        pytest.param([], (0, 0), id="No files"),
+        pytest.param([100.0] * 50, (50, 0), id="All good"),
+        pytest.param([100.0] * 49 + [False], (50, 1), id="One failure"),
+    ),
+)
+async def test_iter_results(monkeypatch, mocked_raw_args, results, expected):
+    mocked_raw_args.sem = 2
+    monkeypatch.setattr(viddur, "QUEUE_SIZE", 3)
+    monkeypatch.setattr(viddur, "find_duration", AsyncMock(side_effect=results))
+    files = (f"{i}_correct.mp4" for i in range(len(results)))
+    got = [result async for result in viddur.iter_results(files, mocked_raw_args)]
+    assert (len(got), int(any(result.failed for result in got))) == expected
+    assert sorted(result.path for result in got) == sorted(
+        f"{i}_correct.mp4" for i in range(len(results))
+    )
+
+
+@pytest.mark.asyncio
+async def test_iter_results_error(monkeypatch, mocked_raw_args):
+    mocked_raw_args.sem = 2
+    monkeypatch.setattr(viddur, "find_duration", AsyncMock(side_effect=OSError))
+    with pytest.raises(OSError):
+        _ = [
+            result
+            async for result in viddur.iter_results(["1.mp4", "2.mp4"], mocked_raw_args)
+        ]
+
+
+@pytest.mark.asyncio
+async def test_iter_results_closed_early(monkeypatch, mocked_raw_args):
+    mocked_raw_args.sem = 2
+    running, started = set(), []
+
+    async def find_duration(file, timeout=None):
+        started.append(file)
+        running.add(file)
+        try:
+            await viddur.asyncio.sleep(0.01)
+        finally:
+            running.discard(file)
+        return 10.0
+
+    monkeypatch.setattr(viddur, "find_duration", find_duration)
+    files = (f"{i}_correct.mp4" for i in range(10_000))
+    results = viddur.iter_results(files, mocked_raw_args)
+    assert (await results.__anext__()).duration == 10.0
+    await results.aclose()  # Like "viddur ... | head -1".
+    assert not running  # Nothing is left behind ...
+    count = len(started)
+    await viddur.asyncio.sleep(0.05)
+    assert len(started) == count  # ... and nothing starts later.
+
+
+@pytest.mark.asyncio
+async def test_find_duration_timeout(monkeypatch):
+    async def stuck():
+        await viddur.asyncio.sleep(10)
+
+    process = Mock(pid=-1)
+    process.communicate = stuck
+    process.wait = AsyncMock()
+    monkeypatch.setattr(
+        viddur.asyncio, "create_subprocess_shell", AsyncMock(return_value=process)
+    )
+    killed = Mock()
+    monkeypatch.setattr(viddur, "kill", killed)
+    with pytest.raises(viddur.asyncio.TimeoutError):
+        await viddur.find_duration("test", timeout=0.01)
+    killed.assert_called_once_with(process)
+    process.wait.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("retries", "hangs", "expected_return_code", "expected_calls"),
+    (
+        pytest.param(0, 1, 1, 1, id="timed out"),
+        pytest.param(2, 1, 0, 2, id="retried"),
+        pytest.param(2, 3, 1, 3, id="retries exhausted"),
+    ),
+)
+async def test_handle_timeout(
+    monkeypatch, capsys, retries, hangs, expected_return_code, expected_calls
+):
+    calls = 0
+
+    async def probe(*_):
+        nonlocal calls
+        calls += 1
+        if calls <= hangs:
+            await viddur.asyncio.sleep(10)
+        return 100.0
+
+    args = verbose_args()
+    args.timeout = 0.01
+    args.retries = retries
+    monkeypatch.setattr(viddur, "probe_duration", probe)
+    file_name = f"timeout_{retries}_{hangs}.mp4"
+    sem = viddur.asyncio.Semaphore(1)
+    result = await viddur.handle(file_name, sem, args)
+    assert viddur.report(result, args, None) == expected_return_code
+    assert calls == expected_calls
+    out, _ = capsys.readouterr()
+    assert ("timed out." in out) == bool(expected_return_code)
+    assert (result.status is Status.TIMED_OUT) == bool(expected_return_code)
+
+
+def test_checking_args_depth(mocked_raw_args):
+    mocked_raw_args.depth = 2
+    assert viddur.checking_args(MockedParser(mocked_raw_args)).tree
+    mocked_raw_args.depth = -1
+    with pytest.raises(SystemExit):
+        viddur.checking_args(MockedParser(mocked_raw_args))
+
+
+@pytest.mark.parametrize(
+    ("top", "bottom", "sort", "reverse", "descending"),
+    (
+        pytest.param(5, None, False, False, True, id="top"),
+        pytest.param(5, None, True, False, False, id="top sorted"),
+        pytest.param(None, 5, False, False, False, id="bottom"),
+        pytest.param(None, 5, False, True, True, id="bottom reversed"),
+    ),
+)
+def test_checking_args_ranking(mocked_raw_args, top, bottom, sort, reverse, descending):
+    mocked_raw_args.top, mocked_raw_args.bottom = top, bottom
+    mocked_raw_args.sort, mocked_raw_args.reverse = sort, reverse
+    args = viddur.checking_args(MockedParser(mocked_raw_args))
+    assert args.descending == descending
+    assert not args.sort and not args.reverse
+
+
+@pytest.mark.parametrize(("top", "bottom"), ((0, None), (None, 0), (-1, None)))
+def test_checking_args_ranking_errors(mocked_raw_args, top, bottom):
+    mocked_raw_args.top, mocked_raw_args.bottom = top, bottom
+    with pytest.raises(SystemExit):
+        viddur.checking_args(MockedParser(mocked_raw_args))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("name", "content", "all_files", "expected"),
+    (
+        pytest.param(
+            "video.bin", b"\x1a\x45\xdf\xa3", False, Status.OK, id="mislabeled"
+        ),
+        pytest.param("song.mp4", b"ID3\x04", True, Status.NOT_MEDIA, id="not a video"),
+        pytest.param("a.mp4", b"Some nonsense", False, Status.OK, id="by extension"),
+        pytest.param("a.txt", b"Some nonsense", False, Status.NOT_MEDIA, id="unknown"),
+    ),
+)
+async def test_handle_sniff(
+    monkeypatch, tmp_path, mocked_raw_args, name, content, all_files, expected
+):
+    (tmp_path / name).write_bytes(content)
+    mocked_raw_args.sniff = True
+    mocked_raw_args.all = all_files
+    mocked_raw_args.prober = "ffprobe"
+    monkeypatch.setattr(viddur, "find_duration", AsyncMock(return_value=10.0))
+    sem = viddur.asyncio.Semaphore(1)
+    result = await viddur.handle(str(tmp_path / name), sem, mocked_raw_args)
+    assert result.status is expected
+
+
+def test_cleanup_inputs_files_from(tmp_path, mocked_raw_args):
+    (tmp_path / "list").write_bytes(b"a.mp4\0missing.mkv\0")
+    mocked_raw_args.files_from = str(tmp_path / "list")
+    mocked_raw_args.null = True
+    assert list(viddur.cleanup_inputs(mocked_raw_args)) == ["a.mp4", "missing.mkv"]
+
+
+def test_cleanup_inputs_claims_given_files(tmp_path, mocked_raw_args):
+    (tmp_path / "index.m3u8").write_text("#EXTM3U\n#EXTINF:10,\nseg0.ts\n")
+    (tmp_path / "seg0.ts").touch()
+    (tmp_path / "other.mp4").touch()
+    paths = [str(tmp_path / name) for name in ("seg0.ts", "index.m3u8", "other.mp4")]
+    mocked_raw_args.path_file = paths
+    mocked_raw_args.playlists = True
+    assert list(viddur.cleanup_inputs(mocked_raw_args)) == paths[1:]
+
+
+@pytest.mark.parametrize(
+    ("argv", "valid"),
+    (
+        pytest.param(["--files-from", "list", "-0"], True, id="with --files-from"),
+        pytest.param(["-0"], False, id="alone"),
+    ),
+)
+def test_checking_args_null(monkeypatch, argv, valid):
+    monkeypatch.setattr(viddur.sys, "argv", ["viddur", *argv])
+    parser = viddur.build_parser()
+    monkeypatch.setattr(parser, "error", MockedParser.error)
+    if valid:
+        assert viddur.checking_args(parser).null
+    else:
+        with pytest.raises(SystemExit):
+            viddur.checking_args(parser)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    (
+        pytest.param(["--journal", "j", "--estimate"], id="estimate"),
+        pytest.param(["--journal", "j", "--target-error", "0.05"], id="target error"),
+        pytest.param(["--journal", "j", "--time-budget", "10"], id="time budget"),
+        pytest.param(["--group-by", "codec", "--time-budget", "10"], id="group by"),
+    ),
+)
+def test_checking_args_implied_estimate(monkeypatch, argv):
+    monkeypatch.setattr(viddur.sys, "argv", ["viddur", *argv])
+    parser = viddur.build_parser()
+    monkeypatch.setattr(parser, "error", MockedParser.error)
+    with pytest.raises(SystemExit):
+        viddur.checking_args(parser)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    (
+        pytest.param(["--timeout", "0"], id="zero timeout"),
+        pytest.param(["--timeout=-1"], id="negative timeout"),
+        pytest.param(["--retries=-1"], id="negative retries"),
+        pytest.param(["--backoff=-0.5"], id="negative backoff"),
+        pytest.param(["--cache-max-entries", "0"], id="no cache entries"),
+    ),
+)
+def test_checking_args_limits(monkeypatch, argv):
+    monkeypatch.setattr(viddur.sys, "argv", ["viddur", *argv])
+    parser = viddur.build_parser()
+    monkeypatch.setattr(parser, "error", MockedParser.error)
+    with pytest.raises(SystemExit, match="(positive|negative)"):
+        viddur.checking_args(parser)
+
+
+def test_checking_args_filters(mocked_raw_args):
+    mocked_raw_args.min_size, mocked_raw_args.max_size = 10, 5
+    with pytest.raises(SystemExit):
+        viddur.checking_args(MockedParser(mocked_raw_args))
+    mocked_raw_args.min_size = None
+    mocked_raw_args.watch = True
+    with pytest.raises(SystemExit):
+        viddur.checking_args(MockedParser(mocked_raw_args))
+
+
+@pytest.mark.asyncio
+async def test_examine_fields(monkeypatch):
+    process = Mock(returncode=0)
+    process.communicate = AsyncMock(
+        return_value=(
+            b'{"streams": [{"codec_name": "vp9"}], "format": {"duration": "3"}}',
+            None,
+        )
+    )
+    spawn = AsyncMock(return_value=process)
+    monkeypatch.setattr(viddur.asyncio, "create_subprocess_shell", spawn)
+    args = args_gen()
+    args.fields = ("codec",)
+    result = await viddur.examine("a.webm", viddur.asyncio.Semaphore(1), args, None)
+    assert (result.duration, result.status) == (3.0, Status.OK)
+    assert result.metadata == {"codec": "vp9"}
+    assert spawn.await_count == 1  # The duration comes with the fields.
+    assert "codec_name" in spawn.await_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_handle_no_playlists(tmp_path):
+    playlist = tmp_path / "title.m3u8"
+    playlist.write_text("#EXTM3U\n#EXTINF:4.5,\nseg.ts\n")
+    args = args_gen()
+    args.prober = "native"
+    sem = viddur.asyncio.Semaphore(1)
+    result = await viddur.handle(str(playlist), sem, args)
+    assert (result.duration, result.status) == (4.5, Status.OK)
+    args.playlists = False
+    assert (await viddur.handle(str(playlist), sem, args)).status is Status.NOT_MEDIA
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "changes",
+    (
+        pytest.param([{"seg1.mp4", "title.m3u8"}], id="together"),
+        pytest.param([{"seg1.mp4"}, {"title.m3u8"}], id="segment first"),
+    ),
+)
+async def test_watch_segments(monkeypatch, tmp_path, capsys, changes):
+    monkeypatch.chdir(tmp_path)
+    for name in ("seg0.mp4", "seg1.mp4"):
+        (tmp_path / name).write_bytes(mp4(1_000, 3_000))
+    playlist = "#EXTM3U\n" + "#EXTINF:3.0,\nseg{}.mp4\n"
+    (tmp_path / "title.m3u8").write_text(playlist.format(0))
+
+    async def fake_changes():
+        for changed in changes:
+            if "title.m3u8" in changed:  # The new segment is appended.
+                (tmp_path / "title.m3u8").write_text(
+                    playlist.format(0) + playlist.format(1)[8:]
+                )
+            yield changed, set()
+
+    monkeypatch.setattr(
+        viddur, "make_watcher", Mock(return_value=Mock(changes=fake_changes))
+    )
+    args = make_args(prober="native", format="s", quiet=True, sem=2)
+    segments = SegmentIndex()
+    files = segments.claim(["title.m3u8", "seg0.mp4"])
+    sem = viddur.make_semaphore(args)
+    assert await viddur.watch(files, args, None, sem, segments) == 0
+    totals = capsys.readouterr().out.split()
+    assert (totals[0], totals[-1]) == ("3.000s", "6.000s")
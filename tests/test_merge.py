@@ -0,0 +1,107 @@
+import io
+import json
+import os
+
+import pytest
+from conftest import sort_args
+
+import viddur.source as source
+from viddur import merge
+from viddur.output import RecordWriter
+from viddur.results import Result, Status
+from viddur.walker import in_shard
+
+RESULTS = [
+    Result("a.mp4", 30.0, Status.OK, 0.1),
+    Result("dir/b.mkv", 10.0, Status.OK, 0.1),
+    Result("dir/c.avi", 0.0, Status.FAILED, 0.1),
+    Result("dir/d.mp4", 20.0, Status.OK, 0.1),
+    Result("e.mp4", 0.0, Status.TIMED_OUT, 0.1),
+]
+
+
+def partial(tmp_path, name, results, shard):
+    stream = io.StringIO()
+    writer = RecordWriter("jsonl", stream)
+    for result in results:
+        writer.record(result)
+    writer.summary(sum(item.duration for item in results), 0.5, shard=shard)
+    (tmp_path / name).write_text(stream.getvalue())
+    return str(tmp_path / name)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        pytest.param("1/3", (1, 3), id="first"),
+        pytest.param("3/3", (3, 3), id="last"),
+        pytest.param("0/3", None, id="zero"),
+        pytest.param("4/3", None, id="too big"),
+        pytest.param("1-3", None, id="nonsense"),
+    ),
+)
+def test_shard_type(value, expected):
+    if expected is None:
+        with pytest.raises(source.argparse.ArgumentTypeError):
+            source.shard_type(value)
+    else:
+        assert source.shard_type(value) == expected
+
+
+def test_in_shard(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    files = [f"dir{i % 7}/{i}.mp4" for i in range(1_000)]
+    shards = [list(in_shard(files, index, 4)) for index in range(1, 5)]
+    assert sorted(file for shard in shards for file in shard) == sorted(
+        str(tmp_path / file) for file in files
+    )
+    assert all(shard for shard in shards)
+    assert [list(in_shard(["./dir0/0.mp4"], i, 4)) for i in range(1, 5)] == [
+        list(in_shard(["dir0/0.mp4"], i, 4)) for i in range(1, 5)
+    ]
+    # The same file from another working directory.
+    monkeypatch.chdir(tmp_path / "..")
+    relative = os.path.join(tmp_path.name, "dir0/0.mp4")
+    assert [list(in_shard([relative], i, 4)) for i in range(1, 5)] == [
+        list(in_shard([str(tmp_path / "dir0/0.mp4")], i, 4)) for i in range(1, 5)
+    ]
+
+
+def test_merge(tmp_path, capsys):
+    paths = [
+        partial(tmp_path, "1.jsonl", RESULTS[:2], "1/2"),
+        partial(tmp_path, "2.jsonl", RESULTS[2:], "2/2"),
+    ]
+    args = sort_args()
+    assert merge.merge(paths, args) == 1  # Like a run with failures.
+    merged, _ = capsys.readouterr()
+
+    store = source.ResultStore()
+    for result in RESULTS:
+        source.report(result, args, store)
+    source.sorted_msgs(store, args)
+    print("\nTotal Time is: " + source.format_time(60.0, args))
+    print("1 files timed out.")
+    single, _ = capsys.readouterr()
+    assert merged == single
+
+
+def test_merge_incomplete(tmp_path, capsys):
+    paths = [partial(tmp_path, "1.jsonl", RESULTS[:2], "1/3")]
+    (tmp_path / "2.jsonl").write_text(
+        json.dumps({"path": "f.mp4", "duration": 5.0, "status": "ok"})
+    )
+    paths.append(str(tmp_path / "2.jsonl"))
+    args = sort_args()
+    args.s = args.sort = args.v = args.verbose = False
+    args.format = None
+    assert merge.merge(paths, args) == 1
+    out, err = capsys.readouterr()
+    assert "incomplete" in err and "missing" in err
+    assert "00:00:45" in out
+
+
+def test_read_partial_bad_record(tmp_path):
+    (tmp_path / "bad.jsonl").write_text('{"path": "a.mp4"}\n')
+    with pytest.raises(ValueError):
+        merge.read_partial(str(tmp_path / "bad.jsonl"))
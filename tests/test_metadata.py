@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from viddur import metadata
+from viddur.results import Result, Status
+
+OUTPUT = json.dumps(
+    {
+        "streams": [
+            {
+                "codec_name": "h264",
+                "width": 1920,
+                "height": 1080,
+                "avg_frame_rate": "30000/1001",
+            }
+        ],
+        "format": {"duration": "12.500000", "bit_rate": "N/A"},
+    }
+).encode()
+
+
+def test_parse_fields():
+    assert metadata.parse_fields("duration, codec,width,codec") == ("codec", "width")
+    with pytest.raises(ValueError):
+        metadata.parse_fields("codec,colour")
+
+
+def test_probe_command():
+    command = metadata.probe_command(("bit_rate", "codec", "width"))
+    assert "-show_entries format=duration,bit_rate:stream=codec_name,width" in command
+    assert "-show_entries format=duration -of" in metadata.probe_command(())
+
+
+@pytest.mark.parametrize(
+    ("stdout", "expected"),
+    (
+        pytest.param(
+            OUTPUT,
+            (
+                12.5,
+                {
+                    "codec": "h264",
+                    "width": 1920,
+                    "fps": 29.97,
+                    "bit_rate": None,
+                    "pix_fmt": None,
+                },
+            ),
+            id="fields",
+        ),
+        pytest.param(b'{"format": {"duration": "N/A"}}', None, id="no duration"),
+        pytest.param(b'{"format": {"duration": "0"}}', None, id="zero"),
+        pytest.param(b"", None, id="empty"),
+    ),
+)
+def test_parse_output(stdout, expected):
+    fields = ("codec", "width", "fps", "bit_rate", "pix_fmt")
+    assert metadata.parse_output(stdout, fields) == expected
+
+
+def test_breakdown():
+    breakdown = metadata.Breakdown("resolution")
+    breakdown.add(Result("a", 10.0, Status.OK, metadata={"width": 640, "height": 480}))
+    breakdown.add(Result("b", 30.0, Status.OK, metadata={"width": 640, "height": None}))
+    breakdown.add(Result("c", 5.0, Status.OK, metadata={"width": 640, "height": 480}))
+    breakdown.add(Result("d", 0.0, Status.FAILED))
+    assert breakdown.rows() == [("unknown", 1, 30.0), ("640x480", 2, 15.0)]
@@ -0,0 +1,101 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from viddur import output
+from viddur.results import Result, Status
+
+RESULTS = (
+    Result("a.mp4", 12.5, Status.OK, 0.25),
+    Result('bad, "name".mkv', 0.0, Status.FAILED, 0.5),
+)
+
+
+def test_jsonl():
+    stream = io.StringIO()
+    writer = output.make_writer("jsonl", stream)
+    for result in RESULTS:
+        writer.record(result)
+    writer.summary(12.5, 0.75, count=2, failed=1)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records == [
+        {"path": "a.mp4", "duration": 12.5, "status": "ok", "elapsed": 0.25},
+        {
+            "path": 'bad, "name".mkv',
+            "duration": 0.0,
+            "status": "failed",
+            "elapsed": 0.5,
+        },
+        {"summary": True, "total": 12.5, "count": 2, "failed": 1, "elapsed": 0.75},
+    ]
+
+
+@pytest.mark.parametrize(
+    ("kind", "expected"),
+    (
+        pytest.param(
+            "csv",
+            'path,duration,status,elapsed\na.mp4,12.5,ok,0.25\n"bad, ""name"".mkv",0.0,'
+            "failed,0.5\n,12.5,total,0.75\n",
+            id="csv",
+        ),
+        pytest.param(
+            "tsv",
+            'path\tduration\tstatus\telapsed\na.mp4\t12.5\tok\t0.25\n"bad, ""name"".mkv"\t0.0'
+            "\tfailed\t0.5\n\t12.5\ttotal\t0.75\n",
+            id="tsv",
+        ),
+    ),
+)
+def test_delimited(kind, expected):
+    stream = io.StringIO()
+    writer = output.make_writer(kind, stream)
+    for result in RESULTS:
+        writer.record(result)
+    writer.summary(12.5, 0.75, count=2)
+    assert stream.getvalue() == expected
+
+
+def test_buffering(monkeypatch):
+    monkeypatch.setattr(output, "FLUSH_EVERY", 3)
+    monkeypatch.setattr(output, "FLUSH_SECONDS", 60.0)
+    stream = io.StringIO()
+    writer = output.make_writer("jsonl", stream)
+    writer.record(RESULTS[0])
+    writer.record(RESULTS[0])
+    assert not stream.getvalue()
+    writer.record(RESULTS[0])
+    assert len(stream.getvalue().splitlines()) == 3
+
+
+@pytest.mark.asyncio
+async def test_buffering_timer(monkeypatch):
+    monkeypatch.setattr(output, "FLUSH_SECONDS", 0.01)
+    stream = io.StringIO()
+    writer = output.make_writer("jsonl", stream)
+    writer.record(RESULTS[0])
+    assert not stream.getvalue()
+    await asyncio.sleep(0.05)  # No more records are coming for a while.
+    assert len(stream.getvalue().splitlines()) == 1
+
+
+def test_text_and_unknown():
+    assert output.make_writer("text", io.StringIO()) is None
+    with pytest.raises(ValueError):
+        output.RecordWriter("xml", io.StringIO())
+
+
+def test_fields():
+    stream = io.StringIO()
+    writer = output.make_writer("csv", stream, ("codec", "width"))
+    writer.record(
+        Result("a.mp4", 1.0, Status.OK, metadata={"codec": "av1", "width": 720})
+    )
+    writer.record(Result("b.mp4", 0.0, Status.FAILED))
+    writer.summary(1.0, 0.0)
+    assert stream.getvalue() == (
+        "path,duration,status,elapsed,codec,width\na.mp4,1.0,ok,0.0,av1,720\n"
+        "b.mp4,0.0,failed,0.0,,\n,1.0,total,0.0,,\n"
+    )
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from viddur import playlists, walker
+from viddur.containers import media_kind, native_duration
+
+MASTER = '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1\n720p/index.m3u8\n#EXT-X-MEDIA:URI="audio.m3u8"\n'
+VARIANT = (
+    '#EXTM3U\n#EXT-X-MAP:URI="init.mp4"\n#EXTINF:10.0,\nseg0.ts\n#EXTINF:5.5,title\n'
+    "seg%201.ts\n#EXTINF:1,\nhttps://cdn.example.com/remote.ts\n#EXT-X-ENDLIST\n"
+)
+MPD = """<?xml version="1.0"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" {duration}>
+  <Period duration="PT30S">
+    <AdaptationSet>
+      <SegmentTemplate media="video/$RepresentationID$/$Number%05d$.m4s"
+          initialization="video/$RepresentationID$/init.mp4" timescale="1000">
+        <SegmentTimeline><S d="2000" r="4"/><S d="500"/></SegmentTimeline>
+      </SegmentTemplate>
+      <Representation id="720p"/>
+    </AdaptationSet>
+    <AdaptationSet>
+      <BaseURL>audio/</BaseURL>
+      <SegmentList><SegmentURL media="a1.m4a"/></SegmentList>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+@pytest.fixture()
+def streams(tmp_path):
+    (tmp_path / "hls" / "720p").mkdir(parents=True)
+    (tmp_path / "hls" / "master.m3u8").write_text(MASTER)
+    (tmp_path / "hls" / "audio.m3u8").write_text("#EXTM3U\n#EXTINF:16,\na.aac\n")
+    (tmp_path / "hls" / "720p" / "index.m3u8").write_text(VARIANT)
+    for name in ("a.aac", "720p/init.mp4", "720p/seg0.ts", "720p/seg 1.ts"):
+        (tmp_path / "hls" / name).touch()
+    (tmp_path / "dash" / "video" / "720p").mkdir(parents=True)
+    (tmp_path / "dash" / "audio").mkdir()
+    (tmp_path / "dash" / "stream.mpd").write_text(MPD.format(duration=""))
+    for name in ("video/720p/00001.m4s", "video/720p/init.mp4", "audio/a1.m4a"):
+        (tmp_path / "dash" / name).touch()
+    (tmp_path / "dash" / "video" / "other.mp4").touch()
+    os.chdir(tmp_path)
+    return tmp_path
+
+
+def test_parse_hls(streams):
+    manifest = playlists.parse_hls(os.path.join("hls", "720p", "index.m3u8"))
+    assert manifest.duration == 16.5
+    assert manifest.files == {
+        "hls/720p/init.mp4",
+        "hls/720p/seg0.ts",
+        "hls/720p/seg 1.ts",
+    }
+    master = playlists.parse_hls(os.path.join("hls", "master.m3u8"))
+    assert master.duration == 16.5  # The longest variant.
+    assert {"hls/720p/index.m3u8", "hls/audio.m3u8", "hls/a.aac"} < master.files
+
+
+def test_parse_hls_invalid(streams):
+    with pytest.raises(ValueError):
+        playlists.parse_hls(os.path.join("dash", "stream.mpd"))
+
+
+@pytest.mark.parametrize(
+    ("attribute", "expected"),
+    (
+        pytest.param('mediaPresentationDuration="PT1H2M3.5S"', 3723.5, id="mpd"),
+        pytest.param("", 30.0, id="period"),
+    ),
+)
+def test_parse_dash(streams, attribute, expected):
+    (streams / "dash" / "stream.mpd").write_text(MPD.format(duration=attribute))
+    manifest = playlists.parse_dash(os.path.join("dash", "stream.mpd"))
+    assert manifest.duration == expected
+    assert manifest.files == {"dash/audio/a1.m4a"}
+    assert len(manifest.patterns) == 2
+
+
+def test_parse_dash_timeline(streams):
+    (streams / "dash" / "stream.mpd").write_text(
+        MPD.format(duration="").replace(' duration="PT30S"', "")
+    )
+    assert playlists.playlist_duration(os.path.join("dash", "stream.mpd")) == 10.5
+
+
+def test_native_duration(streams):
+    assert media_kind("a.M3U8") == "video"
+    assert native_duration(os.path.join("hls", "master.m3u8")) == 16.5
+    (streams / "broken.mpd").write_text("<MPD")
+    assert native_duration("broken.mpd") is None
+
+
+@pytest.mark.parametrize("threads", (1, 4))
+def test_walk_skips_segments(streams, threads):
+    files = walker.walk(os.curdir, threads, segments=playlists.SegmentIndex())
+    assert sorted(os.path.normpath(file) for file in files) == [
+        "dash/stream.mpd",
+        "dash/video/other.mp4",
+        "hls/master.m3u8",
+    ]
+
+
+def test_list_files_skips_segments(streams):
+    segments = playlists.SegmentIndex()
+    assert sorted(walker.list_files("hls", segments=segments)) == ["hls/master.m3u8"]
+
+
+def test_select_skips_segments_after_their_manifest(streams):
+    files = ["hls/720p/seg0.ts", "hls/master.m3u8", "hls/720p/index.m3u8", "hls/a.aac"]
+    segments = playlists.SegmentIndex()
+    assert list(segments.select(files)) == ["hls/720p/seg0.ts", "hls/master.m3u8"]
+    assert segments.claim(files) == ["hls/master.m3u8"]
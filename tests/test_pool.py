@@ -0,0 +1,59 @@
+import pytest
+from test_containers import mp4
+
+from viddur import pool
+from viddur.api import make_args
+from viddur.cache import DurationCache
+from viddur.results import Status
+
+
+@pytest.fixture()
+def videos(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.mp4"
+        path.write_bytes(mp4(1_000, 1_000 * (i + 1)))
+        paths.append(str(path))
+    (tmp_path / "broken.mp4").write_bytes(b"Some nonsense")
+    return paths + [str(tmp_path / "broken.mp4")]
+
+
+def test_worker_state(videos, tmp_path):
+    args = make_args(prober="native", sem="auto", cache=str(tmp_path / "cache.sqlite3"))
+    state = pool.WorkerState(args)
+    try:
+        batch = state.probe(videos)
+        assert sorted(row[1] for row in batch.rows)[1:] == [
+            float(i) for i in range(1, 11)
+        ]
+        assert (batch.hits, batch.misses, len(batch.puts)) == (0, 11, 10)
+        sem = state.sem
+        batch = state.probe(videos[:3])
+        assert state.sem is sem  # The limiter outlives a batch.
+        assert (batch.hits, batch.misses) == (
+            0,
+            3,
+        )  # Nothing was written by the worker.
+    finally:
+        state.close()
+
+
+@pytest.mark.asyncio
+async def test_iter_pool_results(videos, monkeypatch):
+    monkeypatch.setattr(pool, "POOL_BATCH", 3)
+    args = make_args(prober="native", workers=2)
+    results = [result async for result in pool.iter_pool_results(videos, args)]
+    assert sorted(result.path for result in results) == sorted(videos)
+    assert sum(result.duration for result in results) == 55.0
+    assert [result.status for result in results].count(Status.FAILED) == 1
+
+
+@pytest.mark.asyncio
+async def test_iter_pool_results_cache(videos, monkeypatch, tmp_path):
+    monkeypatch.setattr(pool, "POOL_BATCH", 3)
+    args = make_args(prober="native", workers=2, cache=str(tmp_path / "cache.sqlite3"))
+    for expected in ((0, 11), (10, 1)):
+        with DurationCache(args.cache) as cache:
+            async for _ in pool.iter_pool_results(videos, args, cache):
+                pass
+            assert (cache.hits, cache.misses) == expected
@@ -0,0 +1,105 @@
+import pytest
+
+from viddur.results import DurationTree, Result, ResultStore, Status, TopK
+
+
+@pytest.fixture()
+def tree():
+    tree = DurationTree("videos")
+    tree.add("videos/a.mp4", 10.0)
+    tree.add("videos/dir1/b.mp4", 20.0)
+    tree.add("videos/dir1/dir3/c.mkv", 30.0)
+    tree.add("videos/dir2/d.avi", 40.0)
+    return tree
+
+
+def test_result_failed():
+    assert Result("a.mp4", 0.0, Status.TIMED_OUT).failed
+    assert Result("a.mp4", 0.0, Status.FAILED).failed
+    assert not Result("a.mp4", 0.0, Status.NOT_MEDIA).failed
+
+
+def test_subtotal(tree):
+    assert tree.subtotal("videos") == 100.0
+    assert tree.subtotal("videos/dir1") == 50.0
+    assert tree.subtotal("videos/dir1/dir3") == 30.0
+    assert tree.subtotal("videos/missing") == 0.0
+
+
+@pytest.mark.parametrize(
+    ("depth", "expected"),
+    (
+        pytest.param(
+            None,
+            [
+                ("videos/dir1/dir3", 30.0, 1),
+                ("videos/dir1", 50.0, 2),
+                ("videos/dir2", 40.0, 1),
+                ("videos", 100.0, 4),
+            ],
+            id="all",
+        ),
+        pytest.param(
+            1,
+            [("videos/dir1", 50.0, 2), ("videos/dir2", 40.0, 1), ("videos", 100.0, 4)],
+            id="depth 1",
+        ),
+        pytest.param(0, [("videos", 100.0, 4)], id="depth 0"),
+    ),
+)
+def test_totals(tree, depth, expected):
+    assert list(tree.totals(depth)) == expected
+
+
+def test_totals_of_current_directory():
+    tree = DurationTree()
+    tree.add("a.mp4", 1.0)
+    tree.add("dir1/b.mp4", 2.0)
+    assert list(tree.totals()) == [("./dir1", 2.0, 1), (".", 3.0, 2)]
+
+
+@pytest.mark.parametrize(
+    ("largest", "descending", "expected"),
+    (
+        pytest.param(True, True, [9.0, 8.0, 7.0], id="top"),
+        pytest.param(True, False, [7.0, 8.0, 9.0], id="top ascending"),
+        pytest.param(False, False, [0.0, 1.0, 2.0], id="bottom"),
+        pytest.param(False, True, [2.0, 1.0, 0.0], id="bottom descending"),
+    ),
+)
+def test_top_k(largest, descending, expected):
+    ranking = TopK(3, largest)
+    for duration in (5.0, 9.0, 0.0, 7.0, 1.0, 8.0, 2.0, 6.0, 3.0, 4.0):
+        ranking.push(Result(f"{duration}.mp4", duration, Status.OK))
+    assert [item.duration for item in ranking.results(descending)] == expected
+    assert len(ranking._heap) == 3
+
+
+def test_result_store():
+    store = ResultStore()
+    results = [
+        Result("videos/a.mp4", 30.0, Status.OK),
+        Result("videos/dir1/b.mp4", 10.0, Status.OK),
+        Result("videos/dir1/c.mkv", 0.0, Status.FAILED),
+        Result("d.mp4", 20.0, Status.OK),
+    ]
+    for result in results:
+        store.add(result)
+    assert len(store) == 4
+    assert list(store) == results
+    assert store.total() == 60.0
+    assert store.counts() == {Status.OK: 3, Status.FAILED: 1}
+    assert [item.path for item in store.sorted()] == [
+        "videos/dir1/c.mkv",
+        "videos/dir1/b.mp4",
+        "d.mp4",
+        "videos/a.mp4",
+    ]
+    assert next(store.sorted(reverse=True)) == results[0]
+    tree = store.rollup()
+    assert tree.subtotal("videos") == 40.0
+    assert list(tree.totals()) == [
+        ("./videos/dir1", 10.0, 1),
+        ("./videos", 40.0, 2),
+        (".", 60.0, 3),
+    ]
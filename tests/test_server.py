@@ -0,0 +1,76 @@
+import asyncio
+import contextlib
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import viddur.source as source
+from viddur import server
+from viddur.api import make_args
+
+
+@pytest.fixture()
+def probe(monkeypatch):
+    monkeypatch.setattr(source, "check_ffprobe", lambda: True)
+    mocked = AsyncMock(return_value=10.0)
+    monkeypatch.setattr(source, "find_duration", mocked)
+    return mocked
+
+
+@contextlib.asynccontextmanager
+async def running(tmp_path):
+    path = str(tmp_path / "viddur.sock")
+    task = asyncio.create_task(server.serve(path, make_args(sem=2)))
+    while not (tmp_path / "viddur.sock").exists():
+        await asyncio.sleep(0.01)
+    yield path
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not (tmp_path / "viddur.sock").exists()
+
+
+@pytest.mark.asyncio
+async def test_query(probe, tmp_path, mocked_directory):
+    request = {"paths": [source.os.path.abspath("dir1")], "recursive": True}
+    async with running(tmp_path) as path:
+        response = await server.query(path, request)
+        assert response == {"total": 40.0, "count": 8, "failed": 0}
+        # Second time durations come from the index of the server.
+        response = await server.query(path, {**request, "files": True})
+    assert response["total"] == 40.0
+    assert len(response["files"]) == 8
+    assert probe.await_count == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "request_",
+    (
+        pytest.param({"paths": "dir1"}, id="not a list"),
+        pytest.param({"paths": ["/surely/missing"]}, id="missing"),
+        pytest.param([1, 2], id="not an object"),
+    ),
+)
+async def test_query_errors(probe, tmp_path, request_):
+    async with running(tmp_path) as path:
+        response = await server.query(path, request_)
+    assert "error" in response
+
+
+@pytest.mark.asyncio
+async def test_query_os_error(probe, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "expand", Mock(side_effect=PermissionError("Denied")))
+    async with running(tmp_path) as path:
+        response = await server.query(path, {"paths": [str(tmp_path)]})
+        assert response == {"error": "Denied"}
+        # The server is still answering.
+        assert "error" in await server.query(path, {"paths": "dir1"})
+
+
+@pytest.mark.asyncio
+async def test_query_main_without_server(tmp_path, monkeypatch, capsys):
+    socket = str(tmp_path / "missing.sock")
+    monkeypatch.setattr(server.sys, "argv", ["viddur query", "--socket", socket])
+    assert await server.query_main() == 1
+    assert f"No server on {socket!r}" in capsys.readouterr().err
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from viddur import walker
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    (tmp_path / "a.mp4").write_bytes(b"Some nonsense")
+    (tmp_path / "dir1" / "dir2").mkdir(parents=True)
+    (tmp_path / "dir1" / "b.mkv").write_bytes(b"Some nonsense")
+    (tmp_path / "dir1" / "dir2" / "c.avi").write_bytes(b"Some nonsense")
+    os.symlink(tmp_path / "dir1", tmp_path / "link")
+    os.chdir(tmp_path)
+    return tmp_path
+
+
+def test_scan_dir(tree):
+    files, directories = walker.scan_dir(os.curdir)
+    assert files == ["./a.mp4"]
+    assert directories == ["dir1"]  # Links to directories are not followed.
+
+
+def test_scan_dir_missing_directory(tree):
+    assert walker.scan_dir("missing") == ([], [])
+
+
+@pytest.mark.parametrize("threads", (1, 4))
+def test_walk(tree, threads):
+    assert sorted(walker.walk(os.curdir, threads)) == [
+        "./a.mp4",
+        "dir1/b.mkv",
+        "dir1/dir2/c.avi",
+    ]
+
+
+def test_list_files(tree):
+    assert list(walker.list_files(os.curdir)) == ["a.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_threaded(monkeypatch):
+    monkeypatch.setattr(walker, "BATCH_SIZE", 7)
+    assert [item async for item in walker.threaded(range(100))] == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_threaded_error():
+    def broken():
+        yield 1
+        raise NotADirectoryError("broken")
+
+    with pytest.raises(NotADirectoryError):
+        _ = [item async for item in walker.threaded(broken())]
+
+
+@pytest.mark.asyncio
+async def test_threaded_early_exit():
+    async for item in walker.threaded(iter(range(10**6))):
+        if item == 10:
+            break
+
+
+@pytest.mark.asyncio
+async def test_threaded_blocked_input():
+    written = threading.Event()
+
+    def waiting():
+        yield 1
+        written.wait(5)  # Like reading a pipe that nobody writes to.
+        yield 2
+
+    items = walker.threaded(waiting())
+    assert await items.__anext__() == 1
+    try:
+        await asyncio.wait_for(items.aclose(), 1)  # Not waiting for the input.
+    finally:
+        written.set()
+
+
+def test_list_files_of_other_directory(tree):
+    assert list(walker.list_files("dir1")) == ["dir1/b.mkv"]
+
+
+@pytest.mark.parametrize(
+    ("content", "null", "expected"),
+    (
+        pytest.param(
+            b"a.mp4\nb c.mkv\n\nd.avi", False, ["a.mp4", "b c.mkv", "d.avi"], id="lines"
+        ),
+        pytest.param(b"a\nb.mp4\0c.mkv\0", True, ["a\nb.mp4", "c.mkv"], id="null"),
+        pytest.param(
+            b"\xff.mp4\n", False, [os.fsdecode(b"\xff.mp4")], id="undecodable"
+        ),
+    ),
+)
+def test_read_paths(tmp_path, monkeypatch, content, null, expected):
+    monkeypatch.setattr(walker, "READ_SIZE", 3)
+    path = tmp_path / "list"
+    path.write_bytes(content)
+    assert list(walker.read_paths(str(path), null)) == expected
+    with open(path) as stdin:
+        monkeypatch.setattr(walker.sys, "stdin", stdin)
+        assert list(walker.read_paths("-", null)) == expected
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+from viddur import watch
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    (tmp_path / "dir1").mkdir()
+    (tmp_path / "a.mp4").write_bytes(b"Some nonsense")
+    (tmp_path / "dir1" / "b.mkv").write_bytes(b"Some nonsense")
+    os.chdir(tmp_path)
+    return tmp_path
+
+
+async def next_change(watcher):
+    changes = watcher.changes()
+    try:
+        return await asyncio.wait_for(changes.__anext__(), timeout=5)
+    finally:
+        await changes.aclose()
+
+
+def test_remove():
+    durations = {"a.mp4": 1.0, "dir1/b.mkv": 2.0, "dir1/c.mkv": 3.0, "dir10/d.mp4": 4.0}
+    watch.remove(durations, {"dir1", "missing.mp4"})
+    assert durations == {"a.mp4": 1.0, "dir10/d.mp4": 4.0}
+    watch.remove(durations, {"."})
+    assert not durations
+
+
+def test_remove_files_without_a_scan():
+    class Keys(dict):
+        def __iter__(self):
+            raise AssertionError("Scanned the keys.")
+
+    durations = Keys({"a.mp4": 1.0, "dir1/b.mkv": 2.0})
+    watch.remove(durations, ["dir1/b.mkv"])
+    assert dict(durations) == {"a.mp4": 1.0}
+
+
+def test_polling_snapshot(tree):
+    watcher = watch.PollingWatcher(["."], recursive=True)
+    assert set(watcher.snapshot()) == {"a.mp4", "dir1/b.mkv"}
+    watcher = watch.PollingWatcher(["."], recursive=False, only={"a.mp4"})
+    assert set(watcher.snapshot()) == {"a.mp4"}
+
+
+@pytest.mark.asyncio
+async def test_polling_changes(tree):
+    watcher = watch.PollingWatcher(["."], recursive=True, interval=0.05)
+    task = asyncio.create_task(next_change(watcher))
+    await asyncio.sleep(0.02)
+    (tree / "dir1" / "c.avi").write_bytes(b"Some nonsense")
+    os.remove(tree / "a.mp4")
+    assert await task == ({"dir1/c.avi"}, {"a.mp4"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not watch.InotifyWatcher.available(), reason="No inotify.")
+async def test_inotify_changes(tree, monkeypatch):
+    monkeypatch.setattr(watch, "DEBOUNCE", 0.1)
+    watcher = watch.InotifyWatcher(["."], recursive=True)
+    task = asyncio.create_task(next_change(watcher))
+    await asyncio.sleep(0.02)
+    (tree / "dir2").mkdir()
+    (tree / "dir2" / "c.avi").write_bytes(b"Some nonsense")
+    (tree / "a.mp4").write_bytes(b"Modified nonsense")
+    os.remove(tree / "dir1" / "b.mkv")
+    changed, deleted = await task
+    assert changed == {"a.mp4", "dir2/c.avi"}
+    assert deleted == {"dir1/b.mkv"}
+
+
+def test_make_watcher_for_files(tree):
+    watcher = watch.make_watcher(["a.mp4", "dir1/b.mkv"], False, poll=True)
+    assert isinstance(watcher, watch.PollingWatcher)
+    assert watcher.roots == [".", "dir1"]
+    assert watcher.only == {"a.mp4", "dir1/b.mkv"}
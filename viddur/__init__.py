@@ -0,0 +1,17 @@
+"""
+Calculating and viewing the durations of videos.
+"""
+
+from .api import aprobe_paths, probe_paths
+from .cache import DurationCache
+from .results import DurationTree, Result, ResultStore, Status
+
+__all__ = [
+    "DurationCache",
+    "DurationTree",
+    "Result",
+    "ResultStore",
+    "Status",
+    "aprobe_paths",
+    "probe_paths",
+]
@@ -8,13 +8,33 @@ Mahyar@Mahyar24.com, Fri 11 Jun 2021.
 import asyncio
 import sys
 
-from .source import check_ffprobe, main
+from .bench import bench_main
+from .merge import merge_main
+from .server import query_main, serve_main
+from .source import main
+
+try:  # If there is uvloop available, use it as event loop.
+    import uvloop
+except ImportError:
+    pass
+else:
+    uvloop.install()
+
+# Subcommands; anything else is a path for the main program.
+COMMANDS = {
+    "serve": serve_main,
+    "query": query_main,
+    "merge": merge_main,
+    "bench": bench_main,
+}
 
 
 def entry_point():
-    assert check_ffprobe(), '"ffprobe" is not found.'
+    command = main
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        command = COMMANDS[sys.argv.pop(1)]
     try:
-        exit_code = asyncio.run(main())
+        exit_code = asyncio.run(command())
     except KeyboardInterrupt:
         print("Exiting ...")
         sys.exit(1)
@@ -0,0 +1,88 @@
+#! /usr/bin/python3.9
+
+"""
+Library API of viddur; the CLI is a thin layer over the same machinery.
+    >>> from viddur import probe_paths
+    >>> results = probe_paths(["videos/"], recursive=True, concurrency=8)
+    >>> sum(result.duration for result in results)
+Every call has its own state (there are no module-level globals), so a long-lived process could
+serve any number of requests, even concurrently, without re-importing or re-spawning anything.
+"""
+
+import argparse
+import asyncio
+from typing import AsyncIterator, Iterable, Union
+
+from .cache import DurationCache
+from .filters import make_filter
+from .playlists import SegmentIndex
+from .results import Result
+from .source import (
+    SEM_NUM,
+    build_parser,
+    iter_results,
+    resolve_prober,
+    semaphore_type,
+)
+from .walker import expand
+
+__all__ = ["aprobe_paths", "make_args", "probe_paths"]
+
+
+def make_args(**options) -> argparse.Namespace:
+    """
+    Namespace of the CLI defaults, overridden by the options (named like the long CLI options).
+    """
+    args = build_parser().parse_args([])
+    for name, value in options.items():
+        if not hasattr(args, name):
+            raise TypeError(f"Unknown option: {name!r}.")
+        setattr(args, name, value)
+    return args
+
+
+async def aprobe_paths(
+    paths: Union[str, Iterable[str]],
+    *,
+    recursive: bool = False,
+    concurrency: Union[int, str] = SEM_NUM,
+    cache: Union[str, DurationCache, None] = None,
+    **options,
+) -> AsyncIterator[Result]:
+    """
+    Examine files and directories (walked if `recursive`) and yield the results as they complete.
+    `concurrency` is the number of simultaneous probes or "auto". `cache` is either a path of the
+    persistent cache or an open DurationCache to share between calls. The rest of the options are
+    the same as the CLI ones, e.g. `all=True`, `prober="native"` or `timeout=10`.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    try:  # Like "--sem" of the CLI.
+        concurrency = semaphore_type(str(concurrency))
+    except argparse.ArgumentTypeError as error:
+        raise ValueError(f"Bad concurrency: {error}") from None
+    args = make_args(recursive=recursive, sem=concurrency, **options)
+    resolve_prober(args)
+    db = DurationCache(cache) if isinstance(cache, str) else cache
+    try:
+        segments = SegmentIndex() if args.playlists else None
+        files = expand(paths, recursive, args.walk_threads, make_filter(args), segments)
+        async for result in iter_results(files, args, db):
+            yield result
+    finally:
+        if db is not None:
+            if isinstance(cache, str):
+                db.close()
+            else:
+                db.commit()
+
+
+def probe_paths(paths: Union[str, Iterable[str]], **options) -> list[Result]:
+    """
+    Synchronous version of aprobe_paths; it can't be called from a running event loop.
+    """
+
+    async def collect() -> list[Result]:
+        return [result async for result in aprobe_paths(paths, **options)]
+
+    return asyncio.run(collect())
@@ -0,0 +1,435 @@
+#! /usr/bin/python3.9
+
+"""
+"viddur bench" measures the pipeline on a synthetic corpus, so concurrency settings and prober
+changes can be compared objectively and regressions are caught:
+    $ viddur bench --files 1000,10000 --sem 4,16,64 --latency 0.02 --output jsonl > base.jsonl
+    $ viddur bench --files 1000,10000 --sem 4,16,64 --latency 0.02 --baseline base.jsonl
+The corpus is a tree of tiny but valid MP4 and Matroska files mixed with non-media files. Unless
+--real-ffprobe is given, "ffprobe" is a stub with a configurable latency and failure rate.
+For every file count and --sem, it reports files per second, the median and the 99th percentile
+of the probe times, the walk time and the peak RSS; each configuration runs in a fresh process, so
+the peak is its own and not the largest one so far.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+import time
+from typing import Iterator, NamedTuple, Optional, Union
+
+from .api import make_args
+from .source import iter_results, semaphore_type
+from .walker import WALK_THREADS, walk
+
+try:  # Only on Unix.
+    import resource
+except ImportError:
+    resource = None  # type: ignore[assignment]
+
+__all__ = [
+    "Run",
+    "bench",
+    "bench_in_child",
+    "bench_main",
+    "make_corpus",
+    "stub_ffprobe",
+]
+
+# Files of a directory of the corpus; directories are grouped by ten.
+FILES_PER_DIRECTORY = 100
+# Settings of the stub "ffprobe"; read from the environment, as it's spawned by a shell.
+ENVIRONMENT = ("VIDDUR_BENCH_LATENCY", "VIDDUR_BENCH_FAILURE_RATE")
+# Stand-in of "ffprobe"; a shell script, spawning it costs little more than the shell itself.
+STUB = """#! /bin/sh
+sleep "${VIDDUR_BENCH_LATENCY:-0}"
+if [ "${VIDDUR_BENCH_FAILURE_RATE:-0}" != 0 ] && awk -v seed=$$ \\
+    -v rate="$VIDDUR_BENCH_FAILURE_RATE" 'BEGIN { srand(seed); exit !(rand() < rate) }'; then
+    exit 1
+fi
+case " $* " in
+    *" json "*)  # --fields
+        echo '{"streams": [{"codec_name": "h264", "width": 1280, "height": 720}],' \\
+            '"format": {"duration": "60.0", "bit_rate": "1000000"}}' ;;
+    *) echo 60.0 ;;
+esac
+"""
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def tiny_mp4(seconds: float) -> bytes:
+    """
+    Smallest MP4 that has a duration; "ftyp" and "moov/mvhd" (in milliseconds).
+    """
+    mvhd = bytes(4) + struct.pack(">IIII", 0, 0, 1_000, round(seconds * 1_000))
+    return _box(b"ftyp", b"isom\x00\x00\x02\x00isommp41") + _box(
+        b"moov", _box(b"mvhd", mvhd + bytes(80))
+    )
+
+
+def _element(element_id: int, payload: bytes) -> bytes:
+    size = len(payload) | (1 << 56)  # 8 bytes size.
+    return (
+        element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+        + size.to_bytes(8, "big")
+        + payload
+    )
+
+
+def tiny_mkv(seconds: float) -> bytes:
+    """
+    Smallest Matroska file that has a duration; "EBML" and "Segment/Info" (in milliseconds).
+    """
+    info = _element(
+        0x1549A966,
+        _element(0x2AD7B1, (1_000_000).to_bytes(3, "big"))
+        + _element(0x4489, struct.pack(">d", seconds * 1_000)),
+    )
+    return _element(0x1A45DFA3, _element(0x4282, b"matroska")) + _element(
+        0x18538067, info
+    )
+
+
+def make_corpus(
+    root: str, count: int, video_ratio: float = 0.8, seed: Optional[int] = 0
+) -> float:
+    """
+    Write `count` files under `root`; return the total duration of the videos among them.
+    """
+    rng = random.Random(seed)
+    total = 0.0
+    for index in range(count):
+        group, directory = divmod(index // FILES_PER_DIRECTORY, 10)
+        path = os.path.join(root, f"{group:04d}", f"{directory:02d}")
+        if not index % FILES_PER_DIRECTORY:
+            os.makedirs(path, exist_ok=True)
+        if rng.random() < video_ratio:
+            seconds = rng.randint(1, 7_200)
+            total += seconds
+            name, content = (
+                (f"{index}.mp4", tiny_mp4(seconds))
+                if index % 2
+                else (f"{index}.mkv", tiny_mkv(seconds))
+            )
+        else:
+            name, content = f"{index}.txt", b"Not a video.\n"
+        with open(os.path.join(path, name), "wb") as fp:
+            fp.write(content)
+    return total
+
+
+@contextlib.contextmanager
+def stub_ffprobe(latency: float = 0.0, failure_rate: float = 0.0) -> Iterator[str]:
+    """
+    Put a stub "ffprobe" first in $PATH while in the context; yield its path.
+    """
+    directory = tempfile.mkdtemp(prefix="viddur-bench-")
+    path = os.path.join(directory, "ffprobe")
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(STUB)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    saved = {name: os.environ.get(name) for name in ("PATH", *ENVIRONMENT)}
+    os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+    os.environ["VIDDUR_BENCH_LATENCY"] = f"{latency:f}"
+    os.environ["VIDDUR_BENCH_FAILURE_RATE"] = (
+        f"{failure_rate:f}" if failure_rate else "0"
+    )
+    try:
+        yield path
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def peak_rss() -> Optional[float]:
+    """
+    Peak resident memory of this process in MiB; None where it can't be told.
+    Read from /proc where there is one; getrusage keeps the peak from before an exec, so a spawned
+    process would report at least the size of its parent.
+    """
+    with contextlib.suppress(OSError):
+        with open("/proc/self/status", encoding="ascii") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / (1 << 10)  # In kB.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of sorted values; zero for none.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+class Run(NamedTuple):
+    """
+    Measurements of a configuration; times in seconds, memory in MiB.
+    """
+
+    files: int
+    sem: Union[int, str]
+    prober: str
+    walk: float
+    wall: float
+    probed: int
+    failed: int
+    rate: float
+    p50: float
+    p99: float
+    peak_rss: Optional[float]
+
+
+async def bench(
+    root: str, sem: Union[int, str], prober: str, walk_threads: int = WALK_THREADS
+) -> Run:
+    """
+    Walk and examine the corpus under `root` once.
+    """
+    start = time.perf_counter()
+    files = list(walk(root, walk_threads))
+    walked = time.perf_counter() - start
+
+    args = make_args(sem=sem, prober=prober, walk_threads=walk_threads)
+    latencies: list[float] = []
+    failed = 0
+    start = time.perf_counter()
+    async for result in iter_results(files, args):
+        if result.elapsed:
+            latencies.append(result.elapsed)
+        failed += result.failed
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return Run(
+        len(files),
+        sem,
+        prober,
+        walked,
+        wall,
+        len(latencies),
+        failed,
+        len(files) / wall if wall else 0.0,
+        percentile(latencies, 0.5),
+        percentile(latencies, 0.99),
+        peak_rss(),
+    )
+
+
+def _bench(root: str, sem: Union[int, str], prober: str, walk_threads: int) -> Run:
+    return asyncio.run(bench(root, sem, prober, walk_threads))
+
+
+async def bench_in_child(
+    root: str, sem: Union[int, str], prober: str, walk_threads: int = WALK_THREADS
+) -> Run:
+    """
+    `bench` in a new process; the peak RSS is of that configuration alone, as it's a lifetime peak.
+    """
+    # Spawned; a forked child would start with the memory of this process.
+    executor = concurrent.futures.ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, _bench, root, sem, prober, walk_threads
+        )
+    finally:
+        await asyncio.to_thread(executor.shutdown)
+
+
+def print_run(run: Run) -> None:
+    rss = "-" if run.peak_rss is None else f"{run.peak_rss:,.1f}"
+    print(
+        f"{run.files:>9,} {str(run.sem):>5} {run.prober:>8} {run.rate:>11,.1f} "
+        f"{run.p50 * 1_000:>8.2f} {run.p99 * 1_000:>8.2f} {run.walk * 1_000:>9.1f} "
+        f"{rss:>9} {run.failed:>7,}"
+    )
+
+
+def regressions(runs: list[Run], baseline: str, tolerance: float) -> list[str]:
+    """
+    Configurations that are slower than in the baseline (an "--output jsonl" of bench) by more
+    than `tolerance`.
+    """
+    with open(baseline, encoding="utf-8") as fp:
+        previous = {
+            (record["files"], str(record["sem"]), record["prober"]): record["rate"]
+            for record in map(json.loads, fp)
+        }
+    slower = []
+    for run in runs:
+        rate = previous.get((run.files, str(run.sem), run.prober))
+        if rate and run.rate < rate * (1 - tolerance):
+            slower.append(
+                f"{run.files:,} files, --sem {run.sem}, --prober {run.prober}: "
+                f"{run.rate:,.1f} files/s, was {rate:,.1f}."
+            )
+    return slower
+
+
+def _counts(value: str) -> list[int]:
+    try:
+        counts = [int(part) for part in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{value!r} isn't like '1000,10000'."
+        ) from None
+    if min(counts) < 1:
+        raise argparse.ArgumentTypeError("File counts must be positive.")
+    return counts
+
+
+def _sems(value: str) -> list[Union[int, str]]:
+    return [semaphore_type(part) for part in value.split(",")]
+
+
+def bench_main_args() -> argparse.Namespace:
+    """
+    Parsing the arguments of "viddur bench".
+    """
+    parser = argparse.ArgumentParser(
+        prog="viddur bench",
+        description="Benchmark the scan of a synthetic corpus across file counts and --sem.",
+    )
+    parser.add_argument(
+        "--files",
+        help="Comma-separated sizes of the corpus. (default: 1000)",
+        type=_counts,
+        default=[1_000],
+        metavar="N,...",
+    )
+    parser.add_argument(
+        "--sem",
+        help="Comma-separated --sem values to compare. (default: 4,16,64)",
+        type=_sems,
+        default=[4, 16, 64],
+        metavar="SEM,...",
+    )
+    parser.add_argument(
+        "--prober",
+        help="Prober under test; with 'native' the stub is only a fallback. (default: ffprobe)",
+        choices=["native", "ffprobe", "auto"],
+        default="ffprobe",
+    )
+    parser.add_argument(
+        "--latency",
+        help="Seconds the stub ffprobe takes per file (on top of spawning it). (default: 0.01)",
+        type=float,
+        default=0.01,
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        help="Fraction of the probes the stub ffprobe fails. (default: 0)",
+        type=float,
+        default=0.0,
+        metavar="FRACTION",
+    )
+    parser.add_argument(
+        "--video-ratio",
+        help="Fraction of the corpus that are videos; the rest aren't media. (default: 0.8)",
+        type=float,
+        default=0.8,
+        metavar="FRACTION",
+    )
+    parser.add_argument(
+        "--real-ffprobe",
+        help="Use the installed 'ffprobe' instead of the stub.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--corpus",
+        help="Directory to generate the corpora in and keep; a removed temporary one otherwise.",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--walk-threads",
+        help=f"Number of threads listing directories simultaneously. (default: {WALK_THREADS})",
+        type=int,
+        default=WALK_THREADS,
+    )
+    parser.add_argument(
+        "--output",
+        help="Format of the measurements; 'jsonl' can be a later --baseline. (default: text)",
+        choices=["text", "jsonl"],
+        default="text",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Fail if a configuration is slower than in this earlier '--output jsonl' run.",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--tolerance",
+        help="With --baseline, the fraction of slowdown that isn't a regression. (default: 0.2)",
+        type=float,
+        default=0.2,
+        metavar="FRACTION",
+    )
+    args = parser.parse_args()
+    for name in ("failure_rate", "video_ratio", "tolerance"):
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error(f"--{name.replace('_', '-')} must be between 0 and 1.")
+    if args.latency < 0:
+        parser.error("--latency can't be negative.")
+    if args.real_ffprobe and not shutil.which("ffprobe"):
+        parser.error('"ffprobe" is not found.')
+    return args
+
+
+async def bench_main() -> int:
+    """
+    Entry point of "viddur bench".
+    """
+    args = bench_main_args()
+    corpus = args.corpus or tempfile.mkdtemp(prefix="viddur-corpus-")
+    with contextlib.ExitStack() as stack:
+        if not args.real_ffprobe:
+            stack.enter_context(stub_ffprobe(args.latency, args.failure_rate))
+        if args.corpus is None:
+            stack.callback(shutil.rmtree, corpus, ignore_errors=True)
+        runs = []
+        if args.output == "text":
+            print(
+                f"{'files':>9} {'sem':>5} {'prober':>8} {'files/s':>11} {'p50 ms':>8} "
+                f"{'p99 ms':>8} {'walk ms':>9} {'RSS MiB':>9} {'failed':>7}"
+            )
+        for count in args.files:
+            root = os.path.join(corpus, str(count))
+            if not os.path.isdir(root):
+                make_corpus(root, count, args.video_ratio)
+            for sem in args.sem:
+                run = await bench_in_child(root, sem, args.prober, args.walk_threads)
+                runs.append(run)
+                if args.output == "text":
+                    print_run(run)
+                else:
+                    print(json.dumps(run._asdict()), flush=True)
+
+    if args.baseline is not None:
+        if slower := regressions(runs, args.baseline, args.tolerance):
+            print("Regressions:", *slower, sep="\n", file=sys.stderr)
+            return 1
+    return 0
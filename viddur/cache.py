@@ -0,0 +1,167 @@
+#! /usr/bin/python3.9
+
+"""
+Persistent on-disk cache of durations, so a warm rescan only needs to stat the files.
+Entries are keyed on (st_dev, st_ino, size, mtime_ns); if any of them changes, the file is probed again.
+Everything is stored in a single SQLite database, which is part of the standard library.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+__all__ = ["DEFAULT_CACHE_PATH", "DurationCache", "Key", "stat_key"]
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "viddur",
+    "durations.sqlite3",
+)
+# Number of pending writes before committing them to the database.
+COMMIT_EVERY = 1_000
+
+Key = tuple[int, int, int, int]
+
+
+def _signed(number: int) -> int:
+    """
+    SQLite integers are signed 64-bit; some filesystems hand out inode numbers above 2 ** 63.
+    """
+    return number - (1 << 64) if number >= (1 << 63) else number
+
+
+def stat_key(file: str) -> Optional[Key]:
+    """
+    Build the cache key of a file; None if the file cannot be stat'ed.
+    """
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return None
+    return _signed(stat.st_dev), _signed(stat.st_ino), stat.st_size, stat.st_mtime_ns
+
+
+class DurationCache:
+    """
+    Mapping of stat keys to durations. Only successful probes are stored.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, max_entries: Optional[int] = None
+    ) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._touched: list[tuple[float, int, int, int, int]] = []
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS durations ("
+            "dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, "
+            "path TEXT, duration REAL, last_used REAL, "
+            "PRIMARY KEY (dev, ino, size, mtime_ns)) WITHOUT ROWID"
+        )
+
+    def __enter__(self) -> "DurationCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def get(self, key: Key) -> Optional[float]:
+        """
+        Return the cached duration of the key, or None on a miss.
+        """
+        row = self._db.execute(
+            "SELECT duration FROM durations "
+            "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((time.time(), *key))
+        return row[0]
+
+    def put(self, key: Key, file: str, duration: float) -> None:
+        """
+        Store a freshly probed duration. Writes are committed in batches.
+        """
+        self._db.execute(
+            "INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*key, os.path.abspath(file), duration, time.time()),
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def touch(self, entries: Iterable[tuple[float, int, int, int, int]]) -> None:
+        """
+        Add "last used" timestamps of hits elsewhere, e.g. in worker processes.
+        """
+        self._touched.extend(entries)
+
+    def commit(self) -> None:
+        """
+        Flush the pending inserts and the "last used" timestamps of the hits.
+        """
+        if self._touched:
+            self._db.executemany(
+                "UPDATE durations SET last_used = ? "
+                "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                self._touched,
+            )
+            self._touched.clear()
+        self._db.commit()
+        self._pending = 0
+
+    def prune(self) -> int:
+        """
+        Remove entries whose file is gone or has changed since it was probed.
+        Return the number of removed entries.
+        """
+        stale = [
+            row[:4]
+            for row in self._db.execute(
+                "SELECT dev, ino, size, mtime_ns, path FROM durations"
+            )
+            if stat_key(row[4]) != row[:4]
+        ]
+        self._db.executemany(
+            "DELETE FROM durations "
+            "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            stale,
+        )
+        self._db.commit()
+        return len(stale)
+
+    def evict(self, max_entries: int) -> int:
+        """
+        Keep only the `max_entries` most recently used entries.
+        Return the number of removed entries.
+        """
+        cursor = self._db.execute(
+            "DELETE FROM durations WHERE (dev, ino, size, mtime_ns) IN ("
+            "SELECT dev, ino, size, mtime_ns FROM durations "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        )
+        self._db.commit()
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM durations").fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Commit everything, apply the size limit and close the database.
+        """
+        self.commit()
+        if self.max_entries is not None:
+            self.evict(self.max_entries)
+        self._db.close()
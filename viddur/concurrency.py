@@ -0,0 +1,197 @@
+#! /usr/bin/python3.9
+
+"""
+Concurrency controllers used instead of a fixed "asyncio.Semaphore" (--sem auto).
+The limit of in-flight probes is tuned at runtime with an AIMD controller: it's increased
+additively while latency stays close to the best observed and throughput doesn't drop, and it's
+decreased multiplicatively when latency inflates (i.e. the disk or CPU is saturated) or the system
+load average is higher than the number of CPUs.
+DeviceScheduler gives each device (st_dev) its own budget, so one slow disk can't starve the others,
+and releases the waiting probes of a device in inode order to keep the reads sequential.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import multiprocessing
+import os
+import time
+from typing import AsyncContextManager, AsyncIterator, Optional, Union
+
+__all__ = ["MAX_LIMIT", "AdaptiveLimiter", "DeviceScheduler", "Limiter", "acquire"]
+
+CPU_COUNT = multiprocessing.cpu_count()
+# Upper bound of an adaptive limit.
+MAX_LIMIT = CPU_COUNT * 16
+# Latency this many times worse than the baseline is considered as congestion.
+LATENCY_TOLERANCE = 1.5
+# Limit isn't increased if throughput drops below this fraction of the previous window's.
+THROUGHPUT_TOLERANCE = 0.9
+# Multiplicative decrease factor.
+BACKOFF = 0.8
+# Minimum number of probes in each measurement window.
+MIN_WINDOW = 8
+# Baseline latency is forgotten slowly, so the controller can adapt to a changed workload.
+BASELINE_DECAY = 1.01
+
+
+class AdaptiveLimiter:
+    """
+    An asynchronous context manager like "asyncio.Semaphore" with a self-tuning limit.
+    """
+
+    def __init__(
+        self,
+        initial: int = CPU_COUNT * 2,
+        minimum: int = 1,
+        maximum: int = MAX_LIMIT,
+        use_load: bool = True,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.lowest = self.highest = self.limit
+        self.use_load = use_load and hasattr(os, "getloadavg")
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        self._started: dict[Optional[asyncio.Task], float] = {}
+        self._latencies: list[float] = []
+        self._window_start = time.monotonic()
+        self._baseline: Optional[float] = None
+        self._throughput = 0.0
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        self._started[asyncio.current_task()] = time.monotonic()
+
+    async def __aexit__(self, *_) -> None:
+        now = time.monotonic()
+        self.record(now - self._started.pop(asyncio.current_task()), now)
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify(max(self.limit - self._in_flight, 0))
+
+    def _overloaded(self) -> bool:
+        """
+        Check the 1 minute load average against the number of CPUs.
+        """
+        return self.use_load and os.getloadavg()[0] > CPU_COUNT
+
+    def record(self, latency: float, now: float) -> None:
+        """
+        Account a finished probe and adjust the limit at the end of each window.
+        """
+        self._latencies.append(latency)
+        if len(self._latencies) < max(self.limit, MIN_WINDOW):
+            return
+
+        average = sum(self._latencies) / len(self._latencies)
+        throughput = len(self._latencies) / max(now - self._window_start, 1e-9)
+        self._latencies.clear()
+        self._window_start = now
+
+        if self._baseline is None or average < self._baseline:
+            self._baseline = average
+        else:
+            self._baseline *= BASELINE_DECAY
+
+        if average > self._baseline * LATENCY_TOLERANCE or self._overloaded():
+            self.limit = max(self.minimum, int(self.limit * BACKOFF))
+        elif throughput >= self._throughput * THROUGHPUT_TOLERANCE:
+            # Latency is fine and the last increase didn't hurt the throughput.
+            self.limit = min(self.maximum, self.limit + 1)
+        self._throughput = throughput
+        self.lowest = min(self.lowest, self.limit)
+        self.highest = max(self.highest, self.limit)
+
+
+class _Device:
+    """
+    Budget and waiting probes of a single device.
+    """
+
+    def __init__(self, limit: Union[int, AdaptiveLimiter]) -> None:
+        self.controller = limit if isinstance(limit, AdaptiveLimiter) else None
+        self.fixed_limit = limit if isinstance(limit, int) else 0
+        self.in_flight = 0
+        self.waiting: list[tuple[int, str, asyncio.Future]] = []
+
+    @property
+    def limit(self) -> int:
+        return self.controller.limit if self.controller else self.fixed_limit
+
+    def release(self) -> None:
+        """
+        Free a slot and hand the free slots over to the waiting probes with the lowest inodes.
+        """
+        self.in_flight -= 1
+        while self.waiting and self.in_flight < self.limit:
+            *_, future = heapq.heappop(self.waiting)
+            if future.cancelled():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+
+class DeviceScheduler:
+    """
+    Per device concurrency budgets; each one is either a fixed number or "auto" (adaptive).
+    """
+
+    def __init__(self, limit: Union[int, str]) -> None:
+        self.limit = limit
+        self.devices: dict[int, _Device] = {}
+
+    def _device(self, dev: int) -> _Device:
+        if (device := self.devices.get(dev)) is None:
+            limit = AdaptiveLimiter() if self.limit == "auto" else int(self.limit)
+            device = self.devices[dev] = _Device(limit)
+        return device
+
+    @contextlib.asynccontextmanager
+    async def slot(self, file: str) -> AsyncIterator[None]:
+        """
+        Wait for a free slot on the device of the file.
+        """
+        try:
+            stat = os.stat(file)
+        except OSError:  # Probe would fail anyway; no need for a real device.
+            dev, ino = -1, 0
+        else:
+            dev, ino = stat.st_dev, stat.st_ino
+        device = self._device(dev)
+
+        if device.in_flight < device.limit and not device.waiting:
+            device.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(device.waiting, (ino, file, future))
+            try:
+                await future  # The slot is taken on our behalf by the releaser.
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    device.release()
+                raise
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            if device.controller is not None:
+                now = time.monotonic()
+                device.controller.record(now - start, now)
+            device.release()
+
+
+Limiter = Union[asyncio.Semaphore, AdaptiveLimiter, DeviceScheduler]
+
+
+def acquire(limiter: Limiter, file: str) -> AsyncContextManager:
+    """
+    Slot of the file from any kind of limiter.
+    """
+    if isinstance(limiter, DeviceScheduler):
+        return limiter.slot(file)
+    return limiter
@@ -0,0 +1,334 @@
+#! /usr/bin/python3.9
+
+"""
+Native container header parsers; the fast path before spawning "ffprobe".
+Only the few boxes/elements holding the duration are read, everything else is skipped with seeks:
+- MP4/MOV: "moov/mvhd" (wherever "moov" is, beginning or the end of the file).
+- Matroska/WebM: "Segment/Info/Duration" (scaled by "TimecodeScale").
+- AVI: "avih" header (and "odml/dmlh" for OpenDML files bigger than 1GB).
+- HLS/DASH manifests: see "playlists".
+Every parser returns None when it can't be sure, so the caller could fall back to "ffprobe".
+Media types are classified here too; by a table of extensions built once at import, and with
+--sniff by the magic numbers at the beginning of the file.
+"""
+
+import mimetypes
+import os
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+from .playlists import PLAYLIST_EXTENSIONS, is_playlist, playlist_duration
+
+__all__ = [
+    "avi_duration",
+    "media_kind",
+    "mkv_duration",
+    "mp4_duration",
+    "native_duration",
+    "sniff",
+]
+
+# Top level boxes that an MP4/MOV file might start with.
+MP4_FIRST_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+
+EBML_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+INFO_ID = 0x1549A966
+CLUSTER_ID = 0x1F43B675
+TIMECODE_SCALE_ID = 0x2AD7B1
+DURATION_ID = 0x4489
+# Giving up after this number of top level elements in a segment.
+MAX_EBML_ELEMENTS = 4_096
+
+# Video extensions that some systems' mime.types lack.
+EXTRA_VIDEO_EXTENSIONS = (
+    ".mkv",
+    ".webm",
+    ".m2ts",
+    ".mts",
+    ".3gp",
+    ".flv",
+    ".wmv",
+    ".ogv",
+)
+# Enough to see the second sync byte of an MPEG-TS packet.
+SNIFF_SIZE = 189
+TS_PACKET_SIZE = 188
+# "ftyp" brands of audio-only MP4 files.
+AUDIO_BRANDS = {b"M4A ", b"M4B ", b"M4P ", b"F4A ", b"F4B "}
+# "ftyp" brands of HEIF/AVIF images and image sequences; the same box structure as MP4.
+IMAGE_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1", b"avif", b"avis"}
+VIDEO_MAGICS = (
+    b"\x00\x00\x01\xba",  # MPEG program stream.
+    b"\x00\x00\x01\xb3",  # MPEG video elementary stream.
+    b"FLV\x01",
+)
+NOT_VIDEO_MAGICS = (
+    b"%PDF",
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # JPEG
+    b"GIF8",
+    b"PK\x03\x04",  # ZIP (and everything based on it)
+    b"ID3",  # MP3
+    b"fLaC",
+    b"\x7fELF",
+    b"\x1f\x8b",  # gzip
+    b"Rar!",
+    b"7z\xbc\xaf",
+)
+
+
+def _extension_kinds() -> dict[str, str]:
+    """
+    Map extensions to the top level of their mime types; the same database "mimetypes" uses.
+    """
+    mimetypes.init()
+    kinds = {
+        extension: mime_type.split("/")[0]
+        for extension, mime_type in mimetypes.types_map.items()
+    }
+    kinds.update(dict.fromkeys(EXTRA_VIDEO_EXTENSIONS, "video"))
+    kinds.update(dict.fromkeys(PLAYLIST_EXTENSIONS, "video"))  # A manifest is a title.
+    return kinds
+
+
+EXTENSION_KINDS = _extension_kinds()
+
+
+def media_kind(path: str) -> Optional[str]:
+    """
+    Kind of the file by its extension, e.g. "video" or "audio"; a dict lookup per file.
+    """
+    extension = os.path.splitext(path)[1]
+    return EXTENSION_KINDS.get(extension) or EXTENSION_KINDS.get(extension.lower())
+
+
+def sniff(file: str) -> Optional[bool]:
+    """
+    Check the magic numbers of the file; True for a video container, False for something that's
+    surely not a video and None if it can't be told (then the extension decides).
+    """
+    try:
+        with open(file, "rb") as fp:
+            head = fp.read(SNIFF_SIZE)
+    except OSError:
+        return None
+    if head[4:8] == b"ftyp":
+        return head[8:12] not in AUDIO_BRANDS | IMAGE_BRANDS
+    if head[:4] == EBML_MAGIC:
+        return True
+    if head[:4] == b"RIFF":
+        return head[8:12] == b"AVI "  # Otherwise WAVE, WEBP and so on.
+    if len(head) > TS_PACKET_SIZE and head[0] == head[TS_PACKET_SIZE] == 0x47:
+        return True
+    if head.startswith(VIDEO_MAGICS):
+        return True
+    if head.startswith(NOT_VIDEO_MAGICS):
+        return False
+    return None
+
+
+def _boxes(fp: BinaryIO, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Iterate over MP4 boxes between `start` and `end`; yielding (type, payload start, box end).
+    """
+    offset = start
+    while offset + 8 <= end:
+        fp.seek(offset)
+        header = fp.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:  # 64-bit "largesize" follows the type.
+            large = fp.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        elif size == 0:  # Box extends to the end of the file.
+            size = end - offset
+        if size < header_size:
+            return
+        yield kind, offset + header_size, offset + size
+        offset += size
+
+
+def mp4_duration(fp: BinaryIO, file_size: int) -> Optional[float]:
+    """
+    Read the duration from the "mvhd" box of an MP4/MOV file.
+    """
+    for index, (kind, start, end) in enumerate(_boxes(fp, 0, file_size)):
+        if index == 0 and kind not in MP4_FIRST_BOXES:
+            return None
+        if kind != b"moov":
+            continue
+        for child, child_start, _ in _boxes(fp, start, end):
+            if child != b"mvhd":
+                continue
+            fp.seek(child_start)
+            version = fp.read(1)
+            if version == b"\x01":
+                fp.seek(child_start + 4 + 16)
+                timescale, duration = struct.unpack(">IQ", fp.read(12))
+                unknown = 0xFFFFFFFFFFFFFFFF
+            else:
+                fp.seek(child_start + 4 + 8)
+                timescale, duration = struct.unpack(">II", fp.read(8))
+                unknown = 0xFFFFFFFF
+            # Fragmented files usually have a zero (or all ones) duration here.
+            if not timescale or duration in (0, unknown):
+                return None
+            return duration / timescale
+        return None
+    return None
+
+
+def _read_vint(fp: BinaryIO, keep_marker: bool) -> Optional[tuple[int, int]]:
+    """
+    Read an EBML variable length integer; return (value, length) or None.
+    The value of an "unknown" size (all ones) is -1.
+    """
+    first = fp.read(1)
+    if not first or first == b"\x00":
+        return None
+    byte = first[0]
+    length = 8 - byte.bit_length() + 1
+    rest = fp.read(length - 1)
+    if len(rest) < length - 1:
+        return None
+    value = byte if keep_marker else byte & ((1 << (8 - length)) - 1)
+    for extra in rest:
+        value = (value << 8) | extra
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1, length
+    return value, length
+
+
+def _read_element(fp: BinaryIO) -> Optional[tuple[int, int, int]]:
+    """
+    Read an EBML element header at the current position; return (id, data start, size).
+    """
+    element_id = _read_vint(fp, keep_marker=True)
+    size = _read_vint(fp, keep_marker=False)
+    if element_id is None or size is None:
+        return None
+    return element_id[0], fp.tell(), size[0]
+
+
+def _info_duration(fp: BinaryIO, start: int, size: int) -> Optional[float]:
+    """
+    Parse the children of "Segment/Info" for the duration in seconds.
+    """
+    fp.seek(start)
+    timecode_scale = 1_000_000  # Default value; nanoseconds per tick.
+    duration = None
+    while fp.tell() < start + size:
+        element = _read_element(fp)
+        if element is None or element[2] < 0:
+            return None
+        element_id, data_start, data_size = element
+        data = fp.read(data_size)
+        if element_id == TIMECODE_SCALE_ID and data:
+            timecode_scale = int.from_bytes(data, "big")
+        elif element_id == DURATION_ID and data_size in (4, 8):
+            duration = struct.unpack(">f" if data_size == 4 else ">d", data)[0]
+        fp.seek(data_start + data_size)
+    if not duration or duration < 0 or not timecode_scale:
+        return None
+    return duration * timecode_scale / 1_000_000_000
+
+
+def mkv_duration(fp: BinaryIO) -> Optional[float]:
+    """
+    Read the duration from "Segment/Info" of a Matroska/WebM file.
+    """
+    fp.seek(0)
+    header = _read_element(fp)
+    if header is None or header[0] != EBML_ID or header[2] < 0:
+        return None
+    fp.seek(header[1] + header[2])
+    segment = _read_element(fp)
+    if segment is None or segment[0] != SEGMENT_ID:
+        return None
+    for _ in range(MAX_EBML_ELEMENTS):
+        element = _read_element(fp)
+        if element is None:
+            return None
+        element_id, data_start, data_size = element
+        if element_id == INFO_ID and data_size >= 0:
+            return _info_duration(fp, data_start, data_size)
+        if data_size < 0:  # e.g. live streamed clusters; can't skip over them.
+            return None
+        fp.seek(data_start + data_size)
+    return None
+
+
+def _riff_chunks(
+    fp: BinaryIO, start: int, end: int
+) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Iterate over RIFF chunks between `start` and `end`; yielding (id, data start, data size).
+    """
+    offset = start
+    while offset + 8 <= end:
+        fp.seek(offset)
+        header = fp.read(8)
+        if len(header) < 8:
+            return
+        chunk_id, size = struct.unpack("<4sI", header)
+        yield chunk_id, offset + 8, size
+        offset += 8 + size + (size & 1)  # Chunks are padded to even sizes.
+
+
+def avi_duration(fp: BinaryIO) -> Optional[float]:
+    """
+    Read the duration from the "avih" main header of an AVI file.
+    """
+    fp.seek(0)
+    head = fp.read(24)
+    if len(head) < 24 or head[:4] != b"RIFF" or head[8:12] != b"AVI ":
+        return None
+    if head[12:16] != b"LIST" or head[20:24] != b"hdrl":
+        return None
+    hdrl_end = 20 + struct.unpack("<I", head[16:20])[0]
+    micro_sec_per_frame = total_frames = None
+    for chunk_id, start, size in _riff_chunks(fp, 24, hdrl_end):
+        if chunk_id == b"avih" and size >= 20:
+            fp.seek(start)
+            micro_sec_per_frame, *_, total_frames = struct.unpack("<5I", fp.read(20))
+        elif chunk_id == b"LIST" and size >= 4:
+            fp.seek(start)
+            if fp.read(4) != b"odml":
+                continue
+            for sub_id, sub_start, sub_size in _riff_chunks(
+                fp, start + 4, start + size
+            ):
+                if sub_id == b"dmlh" and sub_size >= 4:
+                    fp.seek(sub_start)
+                    # Total frames of the whole file, not just the first RIFF.
+                    total_frames = struct.unpack("<I", fp.read(4))[0]
+                    break
+    if not micro_sec_per_frame or not total_frames:
+        return None
+    return micro_sec_per_frame * total_frames / 1_000_000
+
+
+def native_duration(file: str) -> Optional[float]:
+    """
+    Detect the container of the file and parse its duration in pure python.
+    Return None for unsupported containers and anything suspicious.
+    """
+    if is_playlist(file):
+        return playlist_duration(file)
+    try:
+        with open(file, "rb") as fp:
+            magic = fp.read(12)
+            if magic[:4] == EBML_MAGIC:
+                return mkv_duration(fp)
+            if magic[:4] == b"RIFF":
+                return avi_duration(fp)
+            return mp4_duration(fp, os.fstat(fp.fileno()).st_size)
+    except (OSError, ValueError, struct.error):
+        return None
@@ -0,0 +1,112 @@
+#! /usr/bin/python3.9
+
+"""
+Deduplication of files before probing (--dedup); a file with the same bytes as an already examined
+one reuses its result instead of being probed again, and its duration is excluded from the totals
+unless --count-duplicates is used.
+- inode: hardlinks, i.e. the same (st_dev, st_ino). Only files with more than one link are tracked.
+- content: same size and the same hash of the first and the last blocks. Files are hashed only when
+  another file of the same size shows up, so most of them are never read.
+"""
+
+import asyncio
+import hashlib
+import os
+from typing import Awaitable, Callable, Hashable, Optional
+
+from .results import Result, Status
+
+__all__ = ["Deduplicator", "fingerprint"]
+
+# Bytes hashed from each end of a file.
+BLOCK_SIZE = 1 << 16
+
+
+def fingerprint(file: str) -> Optional[bytes]:
+    """
+    Hash of the head and the tail blocks of the file; None if it can't be read.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(file, "rb") as fp:
+            digest.update(fp.read(BLOCK_SIZE))
+            size = os.fstat(fp.fileno()).st_size
+            if size > BLOCK_SIZE:
+                fp.seek(max(size - BLOCK_SIZE, BLOCK_SIZE))
+                digest.update(fp.read(BLOCK_SIZE))
+    except OSError:
+        return None
+    return digest.digest()
+
+
+class Deduplicator:
+    """
+    Results of the first file of every identity; the duplicates wait for it and reuse it.
+    """
+
+    def __init__(self, mode: str, count_duplicates: bool = False) -> None:
+        if mode not in ("inode", "content"):
+            raise ValueError(f"Unknown deduplication mode: {mode!r}.")
+        self.mode = mode
+        self.count_duplicates = count_duplicates
+        self.duplicates = 0
+        self._firsts: dict[Hashable, asyncio.Future] = {}
+        # Content mode; the first file of each size and, once there is a second one, its hash.
+        self._sizes: dict[int, str] = {}
+        self._hashing: dict[int, asyncio.Future] = {}
+
+    async def _key(self, file: str) -> Optional[Hashable]:
+        """
+        Identity of the file's content; None if it can't be a duplicate (as far as we know).
+        """
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return None
+        if self.mode == "inode":
+            return (stat.st_dev, stat.st_ino) if stat.st_nlink > 1 else None
+
+        size = stat.st_size
+        if (first := self._sizes.setdefault(size, file)) is file:
+            return size  # Unique so far; it's keyed by the size until a twin arrives.
+        if (hashing := self._hashing.get(size)) is None:
+            hashing = self._hashing[size] = asyncio.ensure_future(
+                asyncio.to_thread(fingerprint, first)
+            )
+        first_hash = await asyncio.shield(hashing)
+        if first_hash is not None and size in self._firsts:
+            self._firsts.setdefault((size, first_hash), self._firsts[size])
+        if (own_hash := await asyncio.to_thread(fingerprint, file)) is None:
+            return None
+        return size, own_hash
+
+    async def run(self, file: str, examine: Callable[[], Awaitable[Result]]) -> Result:
+        """
+        Examine the file unless its content has already been examined.
+        """
+        if (key := await self._key(file)) is None:
+            return await examine()
+        if (first := self._firsts.get(key)) is None:
+            future = self._firsts[key] = asyncio.get_running_loop().create_future()
+            try:
+                result = await examine()
+            except BaseException:
+                future.cancel()
+                raise
+            future.set_result(result)
+            return result
+
+        try:
+            original = await asyncio.shield(first)
+        except asyncio.CancelledError:
+            if not first.cancelled():  # We are cancelled ourselves.
+                raise
+            return await examine()  # The original's examination was interrupted.
+        if original.status is not Status.OK:
+            return Result(file, original.duration, original.status)
+        self.duplicates += 1
+        if self.count_duplicates:
+            return Result(
+                file, original.duration, Status.OK, metadata=original.metadata
+            )
+        return Result(file, 0.0, Status.DUPLICATE)
@@ -0,0 +1,208 @@
+#! /usr/bin/python3.9
+
+"""
+Estimation mode (--estimate); probe a random sample of the files instead of all of them and
+extrapolate by their sizes, which are cheap to stat.
+Duration per byte is fitted for each extension (a ratio estimator, post-stratified by extension;
+rare extensions share a pooled ratio) and the total is reported with a 95% confidence interval.
+With a target relative error or a time budget, the sample keeps growing (doubling) until the
+interval is narrow enough, the time is up or every file is probed (when the estimate is exact).
+"""
+
+import math
+import os
+import random
+import time
+from array import array
+from typing import AsyncIterator, Callable, Iterable, NamedTuple, Optional
+
+from .containers import media_kind
+from .results import Result, Status
+
+__all__ = ["Estimate", "Estimator", "Population", "collect", "estimate"]
+
+# Two-sided 95% quantile of the normal distribution.
+Z_95 = 1.96
+# Extensions with fewer sampled files than this share a pooled ratio.
+MIN_STRATUM = 5
+# Files probed in the first round.
+SAMPLE_SIZE = 200
+
+
+class Population:
+    """
+    The discovered media files with their sizes and extensions (the strata).
+    """
+
+    def __init__(self) -> None:
+        self.paths: list[str] = []
+        self.sizes = array("Q")
+        self.strata = array("H")
+        self.extensions: list[str] = []
+        self._stratum_ids: dict[str, int] = {}
+
+    def add(self, path: str, size: int) -> None:
+        extension = os.path.splitext(path)[1].lower()
+        if (stratum := self._stratum_ids.get(extension)) is None:
+            stratum = self._stratum_ids[extension] = len(self.extensions)
+            self.extensions.append(extension)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.strata.append(stratum)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+def collect(files: Iterable[str], all_files: bool) -> Population:
+    """
+    Stat the media files among `files`; the others are skipped like in a normal run.
+    """
+    population = Population()
+    for file in files:
+        if not (all_files or media_kind(file) == "video"):
+            continue
+        try:
+            population.add(file, os.stat(file).st_size)
+        except OSError:
+            continue
+    return population
+
+
+class Estimate(NamedTuple):
+    """
+    Estimated total seconds, the half width of its 95% confidence interval and the sample size.
+    """
+
+    total: float
+    error: float
+    probed: int
+    population: int
+
+
+def _ratio(samples: list[tuple[int, float]]) -> float:
+    """
+    Seconds per byte of the samples.
+    """
+    sampled_size = sum(size for size, _ in samples)
+    if not sampled_size:
+        return 0.0
+    return sum(duration for _, duration in samples) / sampled_size
+
+
+def _ratio_total(
+    samples: list[tuple[int, float]],
+    count: int,
+    size: int,
+    ratio: Optional[float] = None,
+) -> tuple[float, float]:
+    """
+    Ratio estimate of the total of a stratum and its variance; `ratio` overrides the fitted one.
+    """
+    if ratio is None:
+        ratio = _ratio(samples)
+    n = len(samples)
+    if n < 2:
+        return ratio * size, 0.0
+    residuals = sum(
+        (duration - ratio * sample_size) ** 2 for sample_size, duration in samples
+    )
+    variance = count**2 * (1 - n / count) * residuals / (n - 1) / n
+    return ratio * size, max(variance, 0.0)
+
+
+class Estimator:
+    """
+    Accumulate the probed samples and estimate the total of the population.
+    """
+
+    def __init__(self, population: Population) -> None:
+        self.population = population
+        self.samples: dict[int, list[tuple[int, float]]] = {}
+        self.probed = 0
+        counts = [0] * len(population.extensions)
+        sizes = [0] * len(population.extensions)
+        for stratum, size in zip(population.strata, population.sizes):
+            counts[stratum] += 1
+            sizes[stratum] += size
+        self._counts = counts
+        self._sizes = sizes
+
+    def add(self, index: int, duration: float) -> None:
+        stratum = self.population.strata[index]
+        self.samples.setdefault(stratum, []).append(
+            (self.population.sizes[index], duration)
+        )
+        self.probed += 1
+
+    def estimate(self) -> Estimate:
+        total = variance = 0.0
+        pooled: list[tuple[int, float]] = []
+        pooled_count = pooled_size = 0
+        for stratum, (count, size) in enumerate(zip(self._counts, self._sizes)):
+            samples = self.samples.get(stratum, [])
+            if len(samples) >= MIN_STRATUM:
+                stratum_total, stratum_variance = _ratio_total(samples, count, size)
+                total += stratum_total
+                variance += stratum_variance
+            else:
+                pooled.extend(samples)
+                pooled_count += count
+                pooled_size += size
+        if pooled_count:
+            ratio = None
+            # Nothing is sampled from the rare extensions; the overall ratio is used.
+            if not pooled:
+                ratio = _ratio(
+                    [item for items in self.samples.values() for item in items]
+                )
+            pooled_total, pooled_variance = _ratio_total(
+                pooled, pooled_count, pooled_size, ratio
+            )
+            total += pooled_total
+            variance += pooled_variance
+        return Estimate(
+            total, Z_95 * math.sqrt(variance), self.probed, len(self.population)
+        )
+
+
+async def estimate(
+    population: Population,
+    probe: Callable[[list[str]], AsyncIterator[Result]],
+    sample_size: int = SAMPLE_SIZE,
+    target_error: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    rng: Optional[random.Random] = None,
+) -> Estimate:
+    """
+    Probe random rounds of files with `probe` until the estimate is good enough.
+    Without a target error or a time budget, only one round of `sample_size` files is probed.
+    """
+    order = list(range(len(population)))
+    (rng or random.Random()).shuffle(order)
+    estimator = Estimator(population)
+    start = time.monotonic()
+    position = 0
+    round_size = min(sample_size, len(order))
+    while True:
+        batch = order[position : position + round_size]
+        position += len(batch)
+        indexes = {population.paths[index]: index for index in batch}
+        async for result in probe(list(indexes)):
+            duration = result.duration if result.status is Status.OK else 0.0
+            estimator.add(indexes[result.path], duration)
+        current = estimator.estimate()
+
+        if position >= len(order):
+            return current  # Exact.
+        if target_error is None and time_budget is None:
+            return current
+        if target_error is not None and current.error <= target_error * current.total:
+            return current
+        round_size = position  # Doubling the sample.
+        if time_budget is not None:
+            elapsed = time.monotonic() - start
+            if elapsed >= time_budget:
+                return current
+            rate = position / max(elapsed, 1e-9)
+            round_size = max(1, min(round_size, int(rate * (time_budget - elapsed))))
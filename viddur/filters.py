@@ -0,0 +1,241 @@
+#! /usr/bin/python3.9
+
+"""
+Pruning filters of the walk (--include, --exclude, --min-size, --newer, --walk-depth, ...).
+They are evaluated by the walker while listing: an excluded directory is never listed, name filters
+come before anything else, and a file is stat'ed only if a size or mtime filter needs it (the
+"d_type" of the entries is enough for the rest).
+Globs without a "/" match names, the ones with it match paths relative to the walked directory;
+regexes are searched in those paths too. Excludes apply to directories too, includes only to files.
+"""
+
+import argparse
+import copy
+import datetime
+import fnmatch
+import os
+import re
+import time
+from typing import Iterable, Iterator, Optional
+
+__all__ = ["WalkFilter", "make_filter", "parse_size", "parse_time"]
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?", re.IGNORECASE)
+AGE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([smhdw])")
+
+
+def parse_size(value: str) -> int:
+    """
+    Bytes of a size like "700", "10M" or "1.5GiB" (binary units).
+    """
+    if not (match := SIZE_PATTERN.fullmatch(value.strip())):
+        raise ValueError(f"{value!r} is not a size (e.g. 500K, 10M or 1.5G).")
+    return int(float(match[1]) * SIZE_UNITS[match[2].upper()])
+
+
+def parse_time(value: str, now: Optional[float] = None) -> float:
+    """
+    Timestamp of an age like "30m", "12h" or "7d" (before `now`), or of an ISO date (and time).
+    """
+    if match := AGE_PATTERN.fullmatch(value.strip()):
+        return (time.time() if now is None else now) - float(match[1]) * AGE_UNITS[
+            match[2]
+        ]
+    try:
+        return datetime.datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise ValueError(
+            f"{value!r} is neither an age (e.g. 12h or 7d) nor a date (e.g. 2026-01-31)."
+        ) from None
+
+
+def _globs(
+    patterns: Iterable[str],
+) -> tuple[Optional[re.Pattern], Optional[re.Pattern]]:
+    """
+    One regex for the globs of names and one for the globs of paths; None when there is no glob.
+    """
+    names: list[str] = []
+    paths: list[str] = []
+    for pattern in patterns:
+        (paths if "/" in pattern else names).append(fnmatch.translate(pattern))
+    return tuple(  # type: ignore[return-value]
+        re.compile("|".join(globs)) if globs else None for globs in (names, paths)
+    )
+
+
+def _regex(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    patterns = list(patterns)
+    return (
+        re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+        if patterns
+        else None
+    )
+
+
+class WalkFilter:
+    """
+    Which entries of a walk are kept. Every criterion is optional; an empty filter keeps everything.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+        include_regex: Iterable[str] = (),
+        exclude_regex: Iterable[str] = (),
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        newer: Optional[float] = None,
+        older: Optional[float] = None,
+        max_depth: Optional[int] = None,
+        one_file_system: bool = False,
+    ) -> None:
+        self._include_names, self._include_paths = _globs(include)
+        self._exclude_names, self._exclude_paths = _globs(exclude)
+        self._include_regex = _regex(include_regex)
+        self._exclude_regex = _regex(exclude_regex)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.newer = newer
+        self.older = older
+        self.max_depth = max_depth
+        self.one_file_system = one_file_system
+        self.device: Optional[int] = None  # Of the walked root, with one_file_system.
+        self._prefix = ""  # Of the paths under the walked root.
+        self.needs_stat = any(
+            limit is not None for limit in (min_size, max_size, newer, older)
+        )
+
+    def rooted(self, top: str) -> "WalkFilter":
+        """
+        Copy of the filter for a walk of `top`; it knows the device of the root and matches the
+        paths relative to it.
+        """
+        walk_filter = copy.copy(self)
+        top = os.path.normpath(top)
+        walk_filter._prefix = "" if top == os.curdir else os.path.join(top, "")
+        if self.one_file_system:
+            try:
+                walk_filter.device = os.stat(top).st_dev
+            except OSError:
+                pass
+        return walk_filter
+
+    def _relative(self, path: str) -> str:
+        path = os.path.normpath(path)
+        return path[len(self._prefix) :] if path.startswith(self._prefix) else path
+
+    def _excluded(self, name: str, path: str) -> bool:
+        if self._exclude_names is not None and self._exclude_names.match(name):
+            return True
+        if self._exclude_paths is not None and self._exclude_paths.match(path):
+            return True
+        return self._exclude_regex is not None and bool(
+            self._exclude_regex.search(path)
+        )
+
+    def _included(self, name: str, path: str) -> bool:
+        if self._include_names is not None or self._include_paths is not None:
+            if not (
+                (self._include_names is not None and self._include_names.match(name))
+                or (self._include_paths is not None and self._include_paths.match(path))
+            ):
+                return False
+        return self._include_regex is None or bool(self._include_regex.search(path))
+
+    def _stat_ok(self, stat: os.stat_result) -> bool:
+        if self.min_size is not None and stat.st_size < self.min_size:
+            return False
+        if self.max_size is not None and stat.st_size > self.max_size:
+            return False
+        if self.newer is not None and stat.st_mtime < self.newer:
+            return False
+        return self.older is None or stat.st_mtime <= self.older
+
+    def accept_directory(self, entry: os.DirEntry, depth: int) -> bool:
+        """
+        Whether a subdirectory at `depth` (the root's children are at 1) is walked.
+        """
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self._excluded(entry.name, self._relative(entry.path)):
+            return False
+        if self.device is not None:
+            try:
+                return entry.stat(follow_symlinks=False).st_dev == self.device
+            except OSError:
+                return False
+        return True
+
+    def accept_file(self, entry: os.DirEntry) -> bool:
+        """
+        Whether a listed file is kept; it's stat'ed only if the names are accepted.
+        """
+        path = self._relative(entry.path)
+        if self._excluded(entry.name, path) or not self._included(entry.name, path):
+            return False
+        if not self.needs_stat:
+            return True
+        try:
+            return self._stat_ok(entry.stat())
+        except OSError:
+            return False
+
+    def accept_path(self, path: str) -> bool:
+        """
+        Whether a file given by its path (not listed by the walker) is kept.
+        """
+        name, path = os.path.basename(path), os.path.normpath(path)
+        if self._excluded(name, path) or not self._included(name, path):
+            return False
+        if not self.needs_stat:
+            return True
+        try:
+            return self._stat_ok(os.stat(path))
+        except OSError:
+            return True  # Let examining it report the error.
+
+    def select(self, paths: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the accepted ones of the given paths.
+        """
+        return (path for path in paths if self.accept_path(path))
+
+
+def make_filter(args: argparse.Namespace) -> Optional[WalkFilter]:
+    """
+    Filter of the filtering options of the arguments; None if no filter is requested.
+    """
+    include = getattr(args, "include", None) or ()
+    exclude = getattr(args, "exclude", None) or ()
+    include_regex = getattr(args, "include_regex", None) or ()
+    exclude_regex = getattr(args, "exclude_regex", None) or ()
+    min_size = getattr(args, "min_size", None)
+    max_size = getattr(args, "max_size", None)
+    newer = getattr(args, "newer", None)
+    older = getattr(args, "older", None)
+    max_depth = getattr(args, "walk_depth", None)
+    one_file_system = getattr(args, "one_file_system", False)
+    if not (
+        any((include, exclude, include_regex, exclude_regex))
+        or any(
+            limit is not None for limit in (min_size, max_size, newer, older, max_depth)
+        )
+        or one_file_system
+    ):
+        return None
+    return WalkFilter(
+        include=include,
+        exclude=exclude,
+        include_regex=include_regex,
+        exclude_regex=exclude_regex,
+        min_size=min_size,
+        max_size=max_size,
+        newer=newer,
+        older=older,
+        max_depth=max_depth,
+        one_file_system=one_file_system,
+    )
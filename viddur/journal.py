@@ -0,0 +1,96 @@
+#! /usr/bin/python3.9
+
+"""
+Checkpoint journal of a scan (--journal PATH); results are appended as JSON lines in batches while
+scanning, and with --resume an interrupted (or crashed, or killed) scan replays them and probes only
+the files that are left. At most the last unflushed batch is lost.
+The records are the same as the ones of "--output jsonl", with absolute paths; a scan can be resumed
+from another working directory.
+"""
+
+import json
+import os
+from typing import Iterable, Iterator
+
+from .output import FIELDS, RecordWriter
+from .results import Result, Status
+
+__all__ = ["Journal", "read_journal"]
+
+DONE = (Status.OK, Status.NOT_MEDIA)
+
+
+def read_journal(path: str) -> Iterator[Result]:
+    """
+    Yield the results recorded in a journal; a torn line (e.g. of a crash) is skipped.
+    """
+    with open(path, encoding="utf-8", errors="surrogateescape") as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+                metadata = {
+                    key: value for key, value in record.items() if key not in FIELDS
+                }
+                yield Result(
+                    record["path"],
+                    record["duration"],
+                    Status(record["status"]),
+                    record.get("elapsed", 0.0),
+                    metadata or None,
+                )
+            except (ValueError, KeyError, TypeError):
+                continue
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as fp:
+        fp.seek(-1, os.SEEK_END)
+        return fp.read(1) == b"\n"
+
+
+class Journal:
+    """
+    Results of the finished files; loaded from the journal if resuming, and appended to it.
+    Failed and timed out files aren't done; a resumed scan tries them again.
+    """
+
+    def __init__(
+        self, path: str, resume: bool = False, fields: Iterable[str] = ()
+    ) -> None:
+        self.path = path
+        self.done: dict[str, Result] = {}
+        if resume and os.path.exists(path):
+            for result in read_journal(path):
+                if result.status in DONE:
+                    self.done[os.path.abspath(result.path)] = result
+        stream = open(
+            path, "a" if resume else "w", encoding="utf-8", errors="surrogateescape"
+        )
+        if stream.tell() and not _ends_with_newline(path):
+            stream.write("\n")  # Don't glue the next record to a torn one.
+        self._writer = RecordWriter("jsonl", stream, fields)
+
+    def pending(self, files: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the files that aren't done yet.
+        """
+        for file in files:
+            if os.path.abspath(file) not in self.done:
+                yield file
+
+    def record(self, result: Result) -> None:
+        """
+        Journal a finished file; non-media files aren't worth it, telling them is cheap.
+        """
+        if result.status is not Status.NOT_MEDIA:
+            self._writer.record(result._replace(path=os.path.abspath(result.path)))
+
+    def close(self) -> None:
+        self._writer.flush()
+        self._writer.stream.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
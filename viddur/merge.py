@@ -0,0 +1,117 @@
+#! /usr/bin/python3.9
+
+"""
+"viddur merge" combines the partial results of sharded runs (--shard i/N) into the output of a
+single run; the sorted listing, the total and the timed out files.
+The partial results are the JSON lines of "--output jsonl", e.g.
+    node1$ viddur -r --shard 1/2 --output jsonl > part1.jsonl
+    node2$ viddur -r --shard 2/2 --output jsonl > part2.jsonl
+    $ viddur merge -v -s part1.jsonl part2.jsonl
+"""
+
+import argparse
+import json
+import sys
+
+from .results import Result, ResultStore, Status
+from .source import (
+    add_output_arguments,
+    checking_args,
+    format_time,
+    report,
+    shard_type,
+    sorted_msgs,
+)
+
+__all__ = ["merge", "merge_main", "read_partial"]
+
+
+def read_partial(path: str) -> tuple[list[Result], dict]:
+    """
+    Read a partial result; return its file records and its summary (empty if it's incomplete).
+    """
+    results, summary = [], {}
+    with open(path, encoding="utf-8") as fp:
+        for number, line in enumerate(fp, 1):
+            try:
+                record = json.loads(line)
+                if record.get("summary"):
+                    summary = record
+                else:
+                    results.append(
+                        Result(
+                            record["path"],
+                            record["duration"],
+                            Status(record["status"]),
+                            record.get("elapsed", 0.0),
+                        )
+                    )
+            except (ValueError, KeyError, AttributeError) as error:
+                raise ValueError(f"{path}:{number}: bad record ({error}).") from None
+    return results, summary
+
+
+def merge(paths: list[str], args: argparse.Namespace) -> int:
+    """
+    Print the combined output of the partials like a single run would; return the exit code.
+    """
+    results = ResultStore() if args.sort or args.reverse else None
+    exit_code = count = timed_out = 0
+    total = 0.0
+    shards: dict[int, list[int]] = {}
+    for path in paths:
+        partial, summary = read_partial(path)
+        if not summary:
+            print(f"{path!r} is incomplete; its run didn't finish.", file=sys.stderr)
+            exit_code = 1
+        elif "shard" in summary:
+            index, shard_count = shard_type(summary["shard"])
+            shards.setdefault(shard_count, []).append(index)
+        for result in partial:
+            count += 1
+            total += result.duration
+            timed_out += result.status is Status.TIMED_OUT
+            exit_code |= report(result, args, results)
+    for shard_count, indexes in shards.items():
+        if sorted(indexes) != list(range(1, shard_count + 1)):
+            print(
+                f"Shards of {shard_count} are missing or repeated: {sorted(indexes)}.",
+                file=sys.stderr,
+            )
+            exit_code = 1
+
+    if count:
+        if results is not None:
+            sorted_msgs(results, args)
+    else:
+        exit_code = 1
+    prefix = "" if args.quiet else "\nTotal Time is: "
+    print(prefix + format_time(total, args))
+    if timed_out and not args.quiet:
+        print(f"{timed_out:,} files timed out.")
+    return exit_code
+
+
+def merge_main_args() -> argparse.Namespace:
+    """
+    Parsing the arguments of "viddur merge".
+    """
+    parser = argparse.ArgumentParser(
+        prog="viddur merge",
+        description="Combine the partial results (--output jsonl) of sharded runs.",
+    )
+    parser.add_argument("partials", nargs="+", help="Partial result files.")
+    add_output_arguments(parser)
+    return checking_args(parser)
+
+
+async def merge_main() -> int:
+    """
+    Entry point of "viddur merge".
+    """
+    args = merge_main_args()
+    try:
+        return merge(args.partials, args)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
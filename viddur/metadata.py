@@ -0,0 +1,176 @@
+#! /usr/bin/python3.9
+
+"""
+Rich metadata (--fields); the entries of the format and of the first video stream are requested
+from the same "ffprobe" run as the duration, so codecs or resolutions don't cost a second spawn.
+--group-by sums the durations per value of a field, e.g. per codec or per resolution.
+"""
+
+import json
+from typing import Any, Callable, Iterable, Optional, Union
+
+from .results import Result, Status
+
+__all__ = [
+    "FIELDS",
+    "GROUPS",
+    "Breakdown",
+    "describe",
+    "group_fields",
+    "parse_fields",
+    "parse_output",
+    "probe_command",
+]
+
+# Name of a field -> (section, entry) of its "ffprobe" output.
+FIELDS = {
+    "duration": ("format", "duration"),
+    "size": ("format", "size"),
+    "bit_rate": ("format", "bit_rate"),
+    "format": ("format", "format_name"),
+    "codec": ("stream", "codec_name"),
+    "profile": ("stream", "profile"),
+    "width": ("stream", "width"),
+    "height": ("stream", "height"),
+    "fps": ("stream", "avg_frame_rate"),
+    "pix_fmt": ("stream", "pix_fmt"),
+}
+# Fields that durations can be grouped by; "resolution" is width x height.
+GROUPS = (*(field for field in FIELDS if field != "duration"), "resolution")
+
+
+def _rate(value: str) -> Optional[float]:
+    """
+    Frames per second of a rational like "30000/1001"; None for "0/0".
+    """
+    numerator, _, denominator = value.partition("/")
+    if float(denominator or 1) == 0:
+        return None
+    return round(float(numerator) / float(denominator or 1), 3)
+
+
+CONVERTERS: dict[str, Callable[[str], Any]] = {
+    "size": int,
+    "bit_rate": int,
+    "width": int,
+    "height": int,
+    "fps": _rate,
+}
+
+
+def parse_fields(value: str) -> tuple[str, ...]:
+    """
+    Fields of a comma-separated list; the duration is always probed, so it isn't among them.
+    """
+    fields = []
+    for field in (name.strip() for name in value.split(",")):
+        if field not in FIELDS:
+            raise ValueError(
+                f"Unknown field {field!r}; choose from {', '.join(FIELDS)}."
+            )
+        if field != "duration" and field not in fields:
+            fields.append(field)
+    return tuple(fields)
+
+
+def group_fields(group: str) -> tuple[str, ...]:
+    """
+    Fields needed for grouping by `group`.
+    """
+    return ("width", "height") if group == "resolution" else (group,)
+
+
+def probe_command(fields: Iterable[str]) -> str:
+    """
+    "ffprobe" command (to be formatted with the path) printing the duration and the fields as JSON.
+    """
+    entries: dict[str, list[str]] = {"format": ["duration"], "stream": []}
+    for field in fields:
+        section, entry = FIELDS[field]
+        if entry not in entries[section]:
+            entries[section].append(entry)
+    show = f"format={','.join(entries['format'])}"
+    if entries["stream"]:
+        show += f":stream={','.join(entries['stream'])}"
+    return f'ffprobe -hide_banner -v error -select_streams v:0 -show_entries {show} -of json "{{}}"'
+
+
+def parse_output(
+    stdout: bytes, fields: Iterable[str]
+) -> Optional[tuple[float, dict[str, Any]]]:
+    """
+    Duration and fields of the JSON output of "probe_command"; None if there is no (non-zero) duration.
+    A field that "ffprobe" doesn't report is None.
+    """
+    try:
+        data = json.loads(stdout)
+        duration = float(data["format"]["duration"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not duration:
+        return None
+    sections = {"format": data["format"], "stream": (data.get("streams") or [{}])[0]}
+    metadata: dict[str, Any] = {}
+    for field in fields:
+        section, entry = FIELDS[field]
+        value = sections[section].get(entry)
+        if value is not None and field in CONVERTERS:
+            try:
+                value = CONVERTERS[field](value)
+            except (ValueError, ZeroDivisionError):
+                value = None
+        metadata[field] = value
+    return duration, metadata
+
+
+def _key(group: str, metadata: dict[str, Any]) -> str:
+    if group == "resolution":
+        if metadata.get("width") and metadata.get("height"):
+            return f"{metadata['width']}x{metadata['height']}"
+        return "unknown"
+    value = metadata.get(group)
+    return "unknown" if value is None else str(value)
+
+
+def describe(metadata: dict[str, Any]) -> str:
+    """
+    Human readable form of the fields, e.g. "codec=h264 width=1920 height=1080".
+    """
+    return " ".join(
+        f"{field}={value}" for field, value in metadata.items() if value is not None
+    )
+
+
+class Breakdown:
+    """
+    Number of files and total duration per value of a field (--group-by).
+    """
+
+    def __init__(self, group: str) -> None:
+        if group not in GROUPS:
+            raise ValueError(f"Can't group by {group!r}.")
+        self.group = group
+        self.counts: dict[str, int] = {}
+        self.totals: dict[str, float] = {}
+
+    def add(self, result: Result) -> None:
+        if result.status is not Status.OK:
+            return
+        key = _key(self.group, result.metadata or {})
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.totals[key] = self.totals.get(key, 0.0) + result.duration
+
+    def rows(self) -> list[tuple[str, int, float]]:
+        """
+        (value, number of files, total duration) of every group; the longest first.
+        """
+        return sorted(
+            ((key, self.counts[key], total) for key, total in self.totals.items()),
+            key=lambda row: row[2],
+            reverse=True,
+        )
+
+    def as_dict(self) -> dict[str, dict[str, Union[int, float]]]:
+        return {
+            key: {"count": count, "total": total} for key, count, total in self.rows()
+        }
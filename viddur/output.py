@@ -0,0 +1,135 @@
+#! /usr/bin/python3.9
+
+"""
+Machine-readable output (--output jsonl|csv|tsv); one record per file, written as soon as the
+result is ready and followed by a summary record, so pipelines can consume it while it's streaming.
+Records are collected in memory and written in batches instead of a "print" call per file; within
+an event loop, a timer flushes them even while no new result arrives.
+    jsonl: {"path": "a.mp4", "duration": 12.5, "status": "ok", "elapsed": 0.01}
+           ... and finally {"summary": true, "total": 12.5, "count": 1, ...}
+    csv/tsv: a header of path,duration,status,elapsed; the summary row has an empty path and
+           "total" as its status.
+With --fields, the requested fields follow the common ones (and are columns of csv/tsv).
+"""
+
+import asyncio
+import csv
+import json
+import time
+from typing import Any, Iterable, Optional, TextIO
+
+from .results import Result
+
+__all__ = ["FORMATS", "RecordWriter", "make_writer"]
+
+FORMATS = ("jsonl", "csv", "tsv")
+FIELDS = ("path", "duration", "status", "elapsed")
+# Records are flushed when this many are pending ...
+FLUSH_EVERY = 256
+# ... or the oldest pending one has waited this many seconds.
+FLUSH_SECONDS = 0.5
+
+
+class RecordWriter:
+    """
+    Buffered writer of the records in one of FORMATS.
+    """
+
+    def __init__(self, kind: str, stream: TextIO, fields: Iterable[str] = ()) -> None:
+        if kind not in FORMATS:
+            raise ValueError(f"Unknown output format: {kind!r}.")
+        self.kind = kind
+        self.stream = stream
+        self.fields = tuple(fields)
+        self._pending: list[str] = []
+        self._since: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        if kind != "jsonl":
+            # csv.writer only needs an object with a "write" method; that's the buffer here.
+            self._csv = csv.writer(
+                self, delimiter="," if kind == "csv" else "\t", lineterminator="\n"
+            )
+            self._csv.writerow(FIELDS + self.fields)
+
+    def write(self, line: str) -> None:
+        """
+        Add a formatted line to the buffer; flushing it if it's due.
+        """
+        self._pending.append(line)
+        now = time.monotonic()
+        if self._since is None:
+            self._since = now
+            try:  # Not waiting for the next record, which may be far away.
+                self._timer = asyncio.get_running_loop().call_later(
+                    FLUSH_SECONDS, self.flush
+                )
+            except RuntimeError:  # Without a loop; checked on the next write only.
+                pass
+        if len(self._pending) >= FLUSH_EVERY or now - self._since >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the pending lines with a single call.
+        """
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending.clear()
+        self.stream.flush()
+        self._since = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def record(self, result: Result) -> None:
+        """
+        Write the record of a file.
+        """
+        metadata = result.metadata or {}
+        if self.kind == "jsonl":
+            self.write(
+                json.dumps(
+                    {
+                        "path": result.path,
+                        "duration": result.duration,
+                        "status": result.status.value,
+                        "elapsed": round(result.elapsed, 6),
+                        **{field: metadata.get(field) for field in self.fields},
+                    }
+                )
+                + "\n"
+            )
+        else:
+            self._csv.writerow(
+                (
+                    result.path,
+                    result.duration,
+                    result.status.value,
+                    round(result.elapsed, 6),
+                    *(metadata.get(field, "") for field in self.fields),
+                )
+            )
+
+    def summary(self, total: float, elapsed: float, **counts: Any) -> None:
+        """
+        Write the final record and flush everything.
+        """
+        if self.kind == "jsonl":
+            record = {"summary": True, "total": total, **counts}
+            self.write(json.dumps({**record, "elapsed": round(elapsed, 6)}) + "\n")
+        else:
+            self._csv.writerow(
+                ("", total, "total", round(elapsed, 6), *("" for _ in self.fields))
+            )
+        self.flush()
+
+
+def make_writer(
+    kind: str, stream: TextIO, fields: Iterable[str] = ()
+) -> Optional[RecordWriter]:
+    """
+    Writer of the --output format; None for the human readable text.
+    """
+    if kind == "text":
+        return None
+    return RecordWriter(kind, stream, fields)
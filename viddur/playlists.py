@@ -0,0 +1,303 @@
+#! /usr/bin/python3.9
+
+"""
+Segmented streams; HLS (.m3u8) and DASH (.mpd) manifests are read natively, so a title with thousands
+of ".ts"/".m4s" segments is a single file with the summed durations instead of thousands of probes.
+- HLS: the "#EXTINF" durations of a media playlist; a master playlist takes its longest variant.
+- DASH: "mediaPresentationDuration", or the Period durations, or the first SegmentTimeline.
+While walking, the files a manifest references (segments, init segments and variant playlists)
+are skipped; that works for the ones beside or below the manifest, which are listed after it.
+Given files are claimed the same way; a --files-from list is read lazily, so only the files listed
+after their manifest are skipped.
+With --no-playlists, manifests are ignored and segments are probed one by one as before.
+"""
+
+import os
+import re
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+__all__ = [
+    "PLAYLIST_EXTENSIONS",
+    "Manifest",
+    "SegmentIndex",
+    "is_playlist",
+    "parse_dash",
+    "parse_hls",
+    "playlist_duration",
+]
+
+PLAYLIST_EXTENSIONS = (".m3u8", ".mpd")
+# Manifests are small; anything bigger than this isn't read.
+MAX_MANIFEST_SIZE = 64 << 20
+# Levels of playlists referencing playlists (master -> variant) that are followed.
+MAX_NESTING = 2
+ISO_DURATION = re.compile(
+    r"P(?:(?P<days>[\d.]+)D)?"
+    r"(?:T(?:(?P<hours>[\d.]+)H)?(?:(?P<minutes>[\d.]+)M)?(?:(?P<seconds>[\d.]+)S)?)?"
+)
+HLS_URI = re.compile(r'URI="([^"]*)"')
+# "$RepresentationID$", "$Number%05d$", "$Time$" ... of the segment templates.
+TEMPLATE_IDENTIFIER = re.compile(r"\$\w+(?:%\w+)?\$")
+# Stands for the identifiers in the patterns; it can't be in a path.
+WILDCARD = "\0"
+
+
+class Manifest(NamedTuple):
+    """
+    Duration of a manifest, the files it references and the patterns of its templated segments.
+    """
+
+    duration: Optional[float]
+    files: frozenset[str]
+    patterns: tuple[str, ...]
+
+
+def is_playlist(path: str) -> bool:
+    return path.lower().endswith(PLAYLIST_EXTENSIONS)
+
+
+def _read(path: str) -> str:
+    if os.path.getsize(path) > MAX_MANIFEST_SIZE:
+        raise ValueError(f"{path!r} is too big for a manifest.")
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        return fp.read()
+
+
+def _local(uri: str, directory: str) -> Optional[str]:
+    """
+    Path of a URI relative to the manifest; None for remote ones.
+    """
+    parsed = urllib.parse.urlsplit(uri)
+    if parsed.scheme not in ("", "file") or not parsed.path:
+        return None
+    path = urllib.parse.unquote(parsed.path)
+    return os.path.normpath(os.path.join(directory, path))
+
+
+def parse_hls(path: str, nesting: int = 0) -> Manifest:
+    """
+    Parse an HLS playlist; variants of a master playlist are parsed too.
+    """
+    lines = _read(path).splitlines()
+    if not lines or not lines[0].lstrip("\ufeff").startswith("#EXTM3U"):
+        raise ValueError(f"{path!r} isn't an HLS playlist.")
+    directory = os.path.dirname(path)
+    duration = 0.0
+    files: set[str] = set()
+    variants: list[str] = []
+    variant_next = False
+    for line in map(str.strip, lines):
+        if line.startswith("#EXTINF:"):
+            duration += float(line[8:].split(",")[0])
+        elif line.startswith("#EXT-X-STREAM-INF"):
+            variant_next = True
+        elif line.startswith(("#EXT-X-MEDIA", "#EXT-X-I-FRAME-STREAM-INF")):
+            if (match := HLS_URI.search(line)) and (uri := _local(match[1], directory)):
+                variants.append(uri)
+        elif line.startswith("#EXT-X-MAP"):
+            if (match := HLS_URI.search(line)) and (uri := _local(match[1], directory)):
+                files.add(uri)
+        elif line and not line.startswith("#"):
+            if (uri := _local(line, directory)) is not None:
+                if variant_next:
+                    variants.append(uri)
+                else:
+                    files.add(uri)
+            variant_next = False
+
+    if not variants:
+        return Manifest(duration, frozenset(files), ())
+    durations = []
+    patterns: list[str] = []
+    for variant in variants:
+        files.add(variant)
+        if nesting >= MAX_NESTING:
+            continue
+        try:
+            manifest = parse_hls(variant, nesting + 1)
+        except (OSError, ValueError):
+            continue
+        files.update(manifest.files)
+        patterns.extend(manifest.patterns)
+        if manifest.duration is not None:
+            durations.append(manifest.duration)
+    return Manifest(max(durations, default=None), frozenset(files), tuple(patterns))
+
+
+def _iso_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds of an ISO 8601 duration like "PT1H2M3.5S"; None if it's missing or malformed.
+    """
+    if not value or not (match := ISO_DURATION.fullmatch(value.strip())):
+        return None
+    days, hours, minutes, seconds = (
+        float(match[name] or 0) for name in ("days", "hours", "minutes", "seconds")
+    )
+    return days * 86_400 + hours * 3_600 + minutes * 60 + seconds
+
+
+def _tag(element: ElementTree.Element) -> str:
+    return element.tag.rpartition("}")[2]  # Without the namespace.
+
+
+def _children(element: ElementTree.Element, tag: str) -> list[ElementTree.Element]:
+    return [child for child in element if _tag(child) == tag]
+
+
+def _timeline_seconds(template: ElementTree.Element) -> Optional[float]:
+    """
+    Total duration of the SegmentTimeline of a SegmentTemplate.
+    """
+    for timeline in _children(template, "SegmentTimeline"):
+        timescale = int(template.get("timescale", "1"))
+        units = sum(
+            int(segment.get("d", "0")) * (1 + max(int(segment.get("r", "0")), 0))
+            for segment in _children(timeline, "S")
+        )
+        return units / timescale if timescale else None
+    return None
+
+
+def parse_dash(path: str) -> Manifest:
+    """
+    Parse a DASH MPD; the identifiers of templated segment names become wildcards.
+    """
+    root = ElementTree.fromstring(_read(path))
+    if _tag(root) != "MPD":
+        raise ValueError(f"{path!r} isn't a DASH manifest.")
+    files: set[str] = set()
+    patterns: list[str] = []
+    timelines: list[float] = []
+
+    def visit(element: ElementTree.Element, base: str) -> None:
+        for url in _children(element, "BaseURL"):
+            if url.text and (local := _local(url.text.strip(), base)) is not None:
+                if url.text.strip().endswith("/"):
+                    base = local
+                else:
+                    files.add(local)  # A single file with a SegmentBase.
+        for template in _children(element, "SegmentTemplate"):
+            for attribute in ("media", "initialization"):
+                if (name := template.get(attribute)) and (
+                    local := _local(TEMPLATE_IDENTIFIER.sub(WILDCARD, name), base)
+                ) is not None:
+                    patterns.append(local)
+            if (seconds := _timeline_seconds(template)) is not None:
+                timelines.append(seconds)
+        for segments in _children(element, "SegmentList"):
+            for segment in _children(segments, "SegmentURL"):
+                if (name := segment.get("media")) and (local := _local(name, base)):
+                    files.add(local)
+            for initialization in _children(segments, "Initialization"):
+                if (name := initialization.get("sourceURL")) and (
+                    local := _local(name, base)
+                ):
+                    files.add(local)
+        for tag in ("Period", "AdaptationSet", "Representation"):
+            for child in _children(element, tag):
+                visit(child, base)
+
+    visit(root, os.path.dirname(path))
+    duration = _iso_seconds(root.get("mediaPresentationDuration"))
+    if duration is None:
+        periods = [
+            _iso_seconds(period.get("duration")) for period in _children(root, "Period")
+        ]
+        if periods and None not in periods:
+            duration = sum(periods)  # type: ignore[arg-type]
+    if duration is None and timelines:
+        duration = timelines[0]
+    return Manifest(duration, frozenset(files), tuple(patterns))
+
+
+def parse_manifest(path: str) -> Manifest:
+    """
+    Parse a manifest by its extension; raise OSError or ValueError if it can't be read or parsed.
+    """
+    if path.lower().endswith(".mpd"):
+        try:
+            return parse_dash(path)
+        except ElementTree.ParseError as error:
+            raise ValueError(str(error)) from None
+    return parse_hls(path)
+
+
+def playlist_duration(path: str) -> Optional[float]:
+    """
+    Duration of the title of a manifest; None for anything unreadable or without a duration.
+    """
+    try:
+        duration = parse_manifest(path).duration
+    except (OSError, ValueError):
+        return None
+    return duration or None
+
+
+def _pattern(template: str) -> re.Pattern:
+    """
+    Regex of the paths of a segment template; every wildcard matches within a path component.
+    """
+    return re.compile("[^/]*".join(map(re.escape, template.split(WILDCARD))))
+
+
+class SegmentIndex:
+    """
+    Files referenced by the manifests found so far in a walk; they are skipped, as their
+    manifest stands for them.
+    """
+
+    def __init__(self) -> None:
+        self._files: set[str] = set()
+        self._patterns: dict[str, list[re.Pattern]] = {}  # By the manifest's directory.
+
+    def _add(self, path: str) -> None:
+        try:
+            manifest = parse_manifest(path)
+        except (OSError, ValueError):
+            return
+        self._files.update(manifest.files)
+        if manifest.patterns:
+            self._patterns.setdefault(os.path.dirname(path), []).extend(
+                map(_pattern, manifest.patterns)
+            )
+
+    def referenced(self, path: str) -> bool:
+        """
+        Whether the (normalized) path is referenced by a known manifest.
+        """
+        if path in self._files:
+            return True
+        if not self._patterns:
+            return False
+        directory = os.path.dirname(path)
+        while True:  # Templates can be in any directory below their manifest.
+            for pattern in self._patterns.get(directory, ()):
+                if pattern.fullmatch(path):
+                    return True
+            if not directory or (parent := os.path.dirname(directory)) == directory:
+                return False
+            directory = parent
+
+    def claim(self, files: Iterable[str]) -> list[str]:
+        """
+        Index the manifests of a directory listing and return its files that aren't referenced;
+        a variant playlist beside its master playlist is dropped too.
+        """
+        files = list(files)
+        for file in files:
+            if is_playlist(file):
+                self._add(os.path.normpath(file))
+        return [file for file in files if not self.referenced(os.path.normpath(file))]
+
+    def select(self, files: Iterable[str]) -> Iterator[str]:
+        """
+        Like `claim`, lazily; a file is only dropped if its manifest came before it.
+        """
+        for file in files:
+            path = os.path.normpath(file)
+            if is_playlist(file):
+                self._add(path)
+            if not self.referenced(path):
+                yield file
@@ -0,0 +1,201 @@
+#! /usr/bin/python3.9
+
+"""
+Process-pool backend (--workers N); batches of paths are sharded across worker processes, each one
+running its own event loop, limiter and prober over its slice, so in-process work (header parsing,
+hashing, sniffing) isn't bound to a single core. Workers send compact rows back and the results
+are aggregated in the parent like the ones of "iter_results".
+--sem applies to each worker, whose loop and limiter live as long as the process. Workers only read
+the persistent cache; their new durations are written by the parent.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import multiprocessing
+import multiprocessing.util
+from typing import AsyncGenerator, Iterable, NamedTuple, Optional
+
+from .cache import DurationCache, Key
+from .concurrency import Limiter
+from .results import STATUS_CODES, STATUSES, Result
+from .walker import threaded
+
+__all__ = ["Batch", "WorkerCache", "WorkerState", "iter_pool_results", "probe_batch"]
+
+# Number of paths sent to a worker at once.
+POOL_BATCH = 128
+# Batches in flight per worker; one being probed and one waiting.
+BATCHES_PER_WORKER = 2
+
+Row = tuple[
+    str, float, int, float, Optional[dict]
+]  # path, duration, code, elapsed, metadata
+
+
+class Batch(NamedTuple):
+    """
+    What a worker sends back for a batch: the rows, and the cache traffic for the parent.
+    """
+
+    rows: list[Row]
+    hits: int
+    misses: int
+    puts: list[tuple[Key, str, float]]
+    touched: list[tuple[float, int, int, int, int]]
+
+
+class WorkerCache(DurationCache):
+    """
+    Cache of a worker process. It's only read; the new durations and the "last used" timestamps
+    are sent to the parent, so a single connection writes to the database.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.puts: list[tuple[Key, str, float]] = []
+
+    def put(self, key: Key, file: str, duration: float) -> None:
+        self.puts.append((key, file, duration))
+
+    def commit(self) -> None:
+        pass  # Nothing is written here.
+
+    def drain(self) -> tuple[int, int, list, list]:
+        """
+        Take the hits, misses, new durations and touched entries since the last call.
+        """
+        drained = self.hits, self.misses, self.puts, self._touched
+        self.hits = self.misses = 0
+        self.puts, self._touched = [], []
+        return drained
+
+
+class WorkerState:
+    """
+    What a worker process keeps between batches: its event loop, its limiter (so "--sem auto"
+    keeps the limit it settled on) and its cache connection.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.loop = asyncio.new_event_loop()
+        self.sem: Optional[Limiter] = None  # Made in the loop.
+        self.cache = WorkerCache(args.cache) if args.cache else None
+
+    def probe(self, paths: list[str]) -> Batch:
+        """
+        Examine a batch on the loop of the worker.
+        """
+        from .source import (  # "source" imports this module.
+            iter_results,
+            make_semaphore,
+        )
+
+        async def run() -> list[Row]:
+            if self.sem is None:
+                self.sem = make_semaphore(self.args)
+            return [
+                (
+                    result.path,
+                    result.duration,
+                    STATUS_CODES[result.status],
+                    result.elapsed,
+                    result.metadata,
+                )
+                async for result in iter_results(paths, self.args, self.cache, self.sem)
+            ]
+
+        rows = self.loop.run_until_complete(run())
+        if self.cache is None:
+            return Batch(rows, 0, 0, [], [])
+        return Batch(rows, *self.cache.drain())
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+        self.loop.close()
+
+
+_state: Optional[WorkerState] = None  # Of this worker process.
+
+
+def start_worker(args: argparse.Namespace) -> None:
+    """
+    Initializer of the worker processes.
+    """
+    global _state  # pylint: disable=global-statement
+    _state = WorkerState(args)
+    # Workers leave with os._exit, which skips atexit; the finalizers of multiprocessing still run.
+    multiprocessing.util.Finalize(_state, _state.close, exitpriority=0)
+
+
+def probe_batch(paths: list[str]) -> Batch:
+    """
+    Examine a batch in a worker process.
+    """
+    assert _state is not None, "The worker isn't started."
+    return _state.probe(paths)
+
+
+async def iter_pool_results(
+    files: Iterable[str],
+    args: argparse.Namespace,
+    cache: Optional[DurationCache] = None,
+) -> AsyncGenerator[Result, None]:
+    """
+    Run files through `args.workers` processes and yield the results as batches complete.
+    The hits and misses and the new durations of the workers go to `cache`, if it's given.
+    """
+    loop = asyncio.get_running_loop()
+    worker_args = argparse.Namespace(**vars(args))
+    worker_args.cache_prune = False  # Done once, in the parent.
+    # Not forking; the parent has threads (the walker's) running.
+    executor = concurrent.futures.ProcessPoolExecutor(
+        args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=start_worker,
+        initargs=(worker_args,),
+    )
+    pending: set[asyncio.Future] = set()
+
+    def submit(batch: list[str]) -> None:
+        pending.add(loop.run_in_executor(executor, probe_batch, batch))
+
+    async def completed() -> list[Result]:
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        results: list[Result] = []
+        for future in done:
+            probed = future.result()
+            if cache is not None:
+                cache.hits += probed.hits
+                cache.misses += probed.misses
+                for key, file, duration in probed.puts:
+                    cache.put(key, file, duration)
+                cache.touch(probed.touched)
+            results.extend(
+                Result(path, duration, STATUSES[code], elapsed, metadata)
+                for path, duration, code, elapsed, metadata in probed.rows
+            )
+        return results
+
+    try:
+        batch: list[str] = []
+        async for file in threaded(files):
+            batch.append(file)
+            if len(batch) < POOL_BATCH:
+                continue
+            submit(batch)
+            batch = []
+            while len(pending) >= args.workers * BATCHES_PER_WORKER:
+                for result in await completed():
+                    yield result
+        if batch:
+            submit(batch)
+        while pending:
+            for result in await completed():
+                yield result
+    finally:
+        # Waiting for the workers to exit in a thread; the loop keeps running meanwhile.
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
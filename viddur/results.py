@@ -0,0 +1,266 @@
+#! /usr/bin/python3.9
+
+"""
+Structured results of probing; what the library API yields and the CLI prints.
+ResultStore keeps many results compactly; a directory is stored once for all of its files, and the
+durations and statuses are packed in arrays instead of a tuple and a float object per file.
+DurationTree rolls the durations up the directory hierarchy as they arrive (--tree), so the subtotals
+of every level come out of a single scan.
+"""
+
+import enum
+import heapq
+import itertools
+import os
+from array import array
+from typing import Any, Iterator, NamedTuple, Optional
+
+__all__ = ["MESSAGES", "DurationTree", "Result", "ResultStore", "Status", "TopK"]
+
+
+class Status(str, enum.Enum):
+    """
+    Outcome of examining a single file.
+    """
+
+    OK = "ok"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    NOT_MEDIA = "not_media"
+    DUPLICATE = "duplicate"
+
+
+# Human readable form of the statuses other than OK.
+MESSAGES = {
+    Status.FAILED: "cannot get examined.",
+    Status.TIMED_OUT: "timed out.",
+    Status.NOT_MEDIA: "is not recognized as a media.",
+    Status.DUPLICATE: "is a duplicate.",
+}
+
+
+class Result(NamedTuple):
+    """
+    Duration of a file in seconds (zero unless the status is OK) and the seconds spent probing it.
+    With --fields, `metadata` has the requested fields.
+    """
+
+    path: str
+    duration: float
+    status: Status
+    elapsed: float = 0.0
+    metadata: Optional[dict[str, Any]] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.status in (Status.FAILED, Status.TIMED_OUT)
+
+
+class TopK:
+    """
+    The `size` longest (or shortest) results seen so far, kept in a heap; memory doesn't grow with
+    the number of results.
+    """
+
+    def __init__(self, size: int, largest: bool = True) -> None:
+        self.size = size
+        self.largest = largest
+        self._heap: list[tuple[float, int, Result]] = []
+        self._counter = (
+            itertools.count()
+        )  # Ties are broken by arrival; Results aren't compared.
+
+    def push(self, result: Result) -> None:
+        """
+        Keep the result if it's among the best ones.
+        """
+        key = result.duration if self.largest else -result.duration
+        item = (key, next(self._counter), result)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def results(self, descending: bool) -> list[Result]:
+        """
+        The kept results sorted by their duration.
+        """
+        return sorted(
+            (result for *_, result in self._heap),
+            key=lambda result: result.duration,
+            reverse=descending,
+        )
+
+
+class _Node:
+    """
+    A directory in the tree; totals include everything under it.
+    """
+
+    __slots__ = ("total", "count", "children")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+        self.children: dict[str, _Node] = {}
+
+
+class DurationTree:
+    """
+    Prefix tree of directories; adding a file updates the subtotals of all of its ancestors.
+    """
+
+    def __init__(self, root: str = os.curdir) -> None:
+        self.root = os.path.normpath(root)
+        self._top = _Node()
+
+    def add(self, path: str, duration: float) -> None:
+        """
+        Account the duration of a file in its directory and every directory above it.
+        """
+        self.add_directory(os.path.dirname(path) or os.curdir, duration)
+
+    def add_directory(self, directory: str, duration: float, count: int = 1) -> None:
+        """
+        Account the summed duration of `count` files directly in a directory.
+        """
+        node = self._top
+        node.total += duration
+        node.count += count
+        relative = os.path.relpath(directory, self.root)
+        for part in relative.split(os.sep) if relative != os.curdir else []:
+            if (child := node.children.get(part)) is None:
+                child = node.children[part] = _Node()
+            node = child
+            node.total += duration
+            node.count += count
+
+    def subtotal(self, directory: str) -> float:
+        """
+        Summed duration of the files under a directory; zero if there isn't any.
+        """
+        node = self._top
+        relative = os.path.relpath(directory, self.root)
+        for part in relative.split(os.sep) if relative != os.curdir else []:
+            if (child := node.children.get(part)) is None:
+                return 0.0
+            node = child
+        return node.total
+
+    def totals(self, depth: Optional[int] = None) -> Iterator[tuple[str, float, int]]:
+        """
+        Yield (directory, total, number of files) like "du --max-depth"; directories are listed
+        after their subdirectories and nothing deeper than `depth` levels under the root is.
+        """
+        yield from self._totals(self._top, self.root, depth)
+
+    def _totals(
+        self, node: _Node, path: str, depth: Optional[int]
+    ) -> Iterator[tuple[str, float, int]]:
+        if depth is None or depth > 0:
+            for name, child in sorted(node.children.items()):
+                yield from self._totals(
+                    child,
+                    os.path.join(path, name),
+                    None if depth is None else depth - 1,
+                )
+        yield path, node.total, node.count
+
+
+# Byte codes of the statuses in a ResultStore.
+STATUSES = list(Status)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+class ResultStore:
+    """
+    Columnar storage of results: interned directories, basenames packed in a single buffer,
+    durations in an array of doubles and statuses as bytes. Probe times aren't kept; metadata is
+    kept only for the results that have it.
+    """
+
+    def __init__(self) -> None:
+        self._directories: list[str] = []
+        self._directory_ids: dict[str, int] = {}
+        self._parents = array("I")
+        self._names = bytearray()
+        self._ends = array("Q")  # Where each basename ends in the buffer.
+        self._durations = array("d")
+        self._statuses = bytearray()
+        self._metadata: dict[int, dict[str, Any]] = {}
+
+    def add(self, result: Result) -> None:
+        directory, name = os.path.split(result.path)
+        if (parent := self._directory_ids.get(directory)) is None:
+            parent = self._directory_ids[directory] = len(self._directories)
+            self._directories.append(directory)
+        self._parents.append(parent)
+        self._names += os.fsencode(name)
+        self._ends.append(len(self._names))
+        self._durations.append(result.duration)
+        self._statuses.append(STATUS_CODES[result.status])
+        if result.metadata is not None:
+            self._metadata[len(self._statuses) - 1] = result.metadata
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def _result(self, index: int) -> Result:
+        start = self._ends[index - 1] if index else 0
+        name = os.fsdecode(bytes(self._names[start : self._ends[index]]))
+        return Result(
+            os.path.join(self._directories[self._parents[index]], name),
+            self._durations[index],
+            STATUSES[self._statuses[index]],
+            metadata=self._metadata.get(index),
+        )
+
+    def __iter__(self) -> Iterator[Result]:
+        return map(self._result, range(len(self)))
+
+    def total(self) -> float:
+        return sum(self._durations)
+
+    def counts(self) -> dict[Status, int]:
+        """
+        Number of the stored results of each status; the statuses without any are left out.
+        """
+        return {
+            STATUSES[code]: count
+            for code, count in enumerate(
+                map(self._statuses.count, range(len(STATUSES)))
+            )
+            if count
+        }
+
+    def sorted(self, reverse: bool = False) -> Iterator[Result]:
+        """
+        Results ordered by their duration; only the order of the indexes is built.
+        """
+        order = array(
+            "L",
+            sorted(range(len(self)), key=self._durations.__getitem__, reverse=reverse),
+        )
+        return map(self._result, order)
+
+    def rollup(self, root: str = os.curdir) -> DurationTree:
+        """
+        Subtotals of the directories under `root`; summed per stored directory first, so the tree
+        is walked once per directory instead of once per file.
+        """
+        totals = array("d", [0.0]) * len(self._directories)
+        counts = array("L", [0]) * len(self._directories)
+        ok = STATUS_CODES[Status.OK]
+        for parent, duration, code in zip(
+            self._parents, self._durations, self._statuses
+        ):
+            if code == ok:
+                totals[parent] += duration
+                counts[parent] += 1
+        tree = DurationTree(root)
+        for parent, directory in enumerate(self._directories):
+            if counts[parent]:
+                tree.add_directory(
+                    directory or os.curdir, totals[parent], counts[parent]
+                )
+        return tree
@@ -0,0 +1,262 @@
+#! /usr/bin/python3.9
+
+"""
+Daemon mode; "viddur serve" keeps the event loop, the concurrency limiter and an index of durations
+warm, and answers queries over a local Unix socket. "viddur query" is its thin client, so a repeated
+query costs a socket round trip and a few stats instead of a full scan.
+The protocol is one JSON object per line in each direction:
+    -> {"paths": ["/abs/dir"], "recursive": true, "all": false, "files": true}
+    <- {"total": 123.4, "count": 10, "failed": 0, "files": [{"path": ..., "duration": ..., "status": ...}]}
+Errors are answered as {"error": "..."}.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+from typing import Any
+
+from .cache import DurationCache
+from .concurrency import Limiter
+from .playlists import SegmentIndex
+from .results import Result, ResultStore, Status
+from .source import (
+    add_output_arguments,
+    add_probing_arguments,
+    checking_args,
+    format_time,
+    iter_results,
+    make_semaphore,
+    report,
+    resolve_prober,
+    sorted_msgs,
+)
+from .walker import expand
+
+__all__ = ["DEFAULT_SOCKET", "answer", "query", "query_main", "serve", "serve_main"]
+
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+    f"viddur-{os.getuid() if hasattr(os, 'getuid') else 0}.sock",
+)
+# Longest accepted request line.
+LINE_LIMIT = 1 << 24
+
+
+async def answer(
+    request: dict[str, Any],
+    base: argparse.Namespace,
+    cache: DurationCache,
+    sem: Limiter,
+) -> dict[str, Any]:
+    """
+    Examine the requested paths with the shared cache and limiter of the server.
+    """
+    paths = request.get("paths")
+    if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+        return {"error": '"paths" must be a list of strings.'}
+    if missing := [path for path in paths if not os.path.exists(path)]:
+        return {"error": f"{missing[0]!r} is not a valid directory or filename."}
+
+    args = argparse.Namespace(**vars(base))
+    args.recursive = bool(request.get("recursive"))
+    args.all = bool(request.get("all"))
+    total, count, failed, files = 0.0, 0, 0, []
+    async for result in iter_results(
+        expand(
+            paths,
+            args.recursive,
+            args.walk_threads,
+            segments=SegmentIndex() if args.playlists else None,
+        ),
+        args,
+        cache,
+        sem,
+    ):
+        count += 1
+        total += result.duration
+        failed += result.failed
+        if request.get("files"):
+            files.append(
+                {
+                    "path": result.path,
+                    "duration": result.duration,
+                    "status": result.status.value,
+                }
+            )
+    cache.commit()
+    response: dict[str, Any] = {"total": total, "count": count, "failed": failed}
+    if request.get("files"):
+        response["files"] = files
+    return response
+
+
+async def serve(path: str, args: argparse.Namespace) -> None:
+    """
+    Serve queries on the Unix socket until cancelled.
+    """
+    resolve_prober(args)
+    # In-memory index of durations, unless a persistent cache is given.
+    cache = DurationCache(args.cache or ":memory:", args.cache_max_entries)
+    if args.cache_prune:
+        cache.prune()
+    sem = make_semaphore(args)  # Shared by all the queries.
+
+    async def connection(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object.")
+                except ValueError as error:
+                    response: dict[str, Any] = {"error": f"Bad request: {error}"}
+                else:
+                    try:
+                        response = await answer(request, args, cache, sem)
+                    except OSError as error:  # E.g. a directory that can't be listed.
+                        response = {"error": str(error)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):  # A stale socket of a dead server.
+        os.remove(path)
+    server = await asyncio.start_unix_server(connection, path, limit=LINE_LIMIT)
+    os.chmod(path, 0o600)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        cache.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+async def query(path: str, request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Send a request to the server and return its response.
+    """
+    reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    try:
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+
+
+def serve_main_args() -> argparse.Namespace:
+    """
+    Parsing the arguments of "viddur serve".
+    """
+    parser = argparse.ArgumentParser(
+        prog="viddur serve",
+        description="Serve duration queries over a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"Path of the Unix socket. (default: {DEFAULT_SOCKET})",
+        default=DEFAULT_SOCKET,
+    )
+    add_probing_arguments(parser)
+    return parser.parse_args()
+
+
+async def serve_main() -> int:
+    """
+    Entry point of "viddur serve".
+    """
+    args = serve_main_args()
+    task = asyncio.current_task()
+    assert task is not None, "Not run as a task."
+    # Stopping gracefully (and removing the socket) with SIGTERM too.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    print(f"Serving on {args.socket!r} ...", file=sys.stderr)
+    try:
+        await serve(args.socket, args)
+    except asyncio.CancelledError:
+        pass
+    return 0
+
+
+def query_main_args() -> argparse.Namespace:
+    """
+    Parsing the arguments of "viddur query".
+    """
+    parser = argparse.ArgumentParser(
+        prog="viddur query",
+        description='Ask a running "viddur serve" for durations.',
+    )
+    parser.add_argument(
+        "path_file",
+        nargs="*",
+        default=[os.getcwd()],
+        help="Select desired directories or files, default is $PWD.",
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        help="Program doesn't suggest mime types and take all files as videos.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        help="Show duration of videos in directories and their contents recursively",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"Path of the Unix socket. (default: {DEFAULT_SOCKET})",
+        default=DEFAULT_SOCKET,
+    )
+    add_output_arguments(parser)
+    return checking_args(parser)
+
+
+async def query_main() -> int:
+    """
+    Entry point of "viddur query"; prints like a normal run of viddur.
+    """
+    args = query_main_args()
+    try:
+        response = await query(
+            args.socket,
+            {
+                "paths": [os.path.abspath(path) for path in args.path_file],
+                "recursive": args.recursive,
+                "all": args.all,
+                "files": args.verbose,
+            },
+        )
+    except OSError:
+        print(
+            f"No server on {args.socket!r}; start one with 'viddur serve'.",
+            file=sys.stderr,
+        )
+        return 1
+    if "error" in response:
+        print(response["error"], file=sys.stderr)
+        return 1
+
+    results = ResultStore() if args.sort or args.reverse else None
+    for item in response.get("files", []):
+        result = Result(
+            os.path.relpath(item["path"]), item["duration"], Status(item["status"])
+        )
+        report(result, args, results)
+    if results is not None:
+        sorted_msgs(results, args)
+
+    prefix = "" if args.quiet else "\nTotal Time is: "
+    print(prefix + format_time(response["total"], args))
+    return int(bool(response["failed"]) or not response["count"])
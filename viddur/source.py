@@ -5,35 +5,72 @@ Run this code for see the summed duration of videos.
 Compatible with python3.9+. No third-party library is required, implemented in pure python.
 Make sure that you have required permissions and "ffprobe" is already installed.
 -> https://ffmpeg.org/ffprobe.html
+MP4/MOV, Matroska/WebM and AVI headers are parsed natively; "ffprobe" is the fallback for the rest.
 If Some file has a length of zero, this program act with it as a failure.
 Consider using "uvloop" and increase the semaphore number to make the program runs faster.
+It's usable as a library too; see "iter_results" here and "probe_paths" in viddur/api.py.
 Mahyar@Mahyar24.com, Fri 11 Jun 2021.
 """
 
 import argparse
 import asyncio
-import mimetypes
+import contextlib
 import multiprocessing
 import os
+import re
 import shutil
+import signal
+import sys
 import textwrap
 import time
-from typing import Iterator, Literal, Union
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Iterable,
+    Literal,
+    Optional,
+    Union,
+)
 
-try:  # If there is uvloop available, use it as event loop.
-    import uvloop
-except ImportError:
-    pass
-else:
-    uvloop.install()
+from .cache import DEFAULT_CACHE_PATH, DurationCache, stat_key
+from .concurrency import (
+    MAX_LIMIT,
+    AdaptiveLimiter,
+    DeviceScheduler,
+    Limiter,
+    acquire,
+)
+from .containers import media_kind, native_duration, sniff
+from .dedup import Deduplicator
+from .estimate import SAMPLE_SIZE, collect, estimate
+from .filters import make_filter, parse_size, parse_time
+from .journal import Journal
+from .metadata import (
+    GROUPS,
+    Breakdown,
+    describe,
+    group_fields,
+    parse_fields,
+    parse_output,
+    probe_command,
+)
+from .output import FORMATS, make_writer
+from .playlists import SegmentIndex, is_playlist
+from .pool import iter_pool_results
+from .results import MESSAGES, DurationTree, Result, ResultStore, Status, TopK
+from .walker import WALK_THREADS, in_shard, list_files, read_paths, threaded, walk
+from .watch import POLL_INTERVAL, make_watcher, remove
 
-
-__all__ = ["main", "check_ffprobe"]
+__all__ = ["main", "check_ffprobe", "iter_results"]
 
 PLACEHOLDER = " ..."  # For pretty printing.
-FILES_DUR: dict[str, float] = {}
 # Semaphore number for limiting simultaneously open files.
 SEM_NUM = multiprocessing.cpu_count() * 2
+# With --per-device, the worker pool is sized for this many devices being busy simultaneously.
+BUSY_DEVICES = 4
+# Maximum number of discovered files waiting for a worker; keeps memory flat on huge trees.
+QUEUE_SIZE = 1_024
 # This Command is all this program based on. "ffprobe" extract the metadata of the file.
 COMMAND = 'ffprobe -hide_banner -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{}"'
 
@@ -68,10 +105,11 @@ def pretty_print(
     if args.simple_output:
         print(f"{file_name}: {detail}")
     else:
-        shorted_file_name = textwrap.shorten(
-            file_name,
-            width=max(args.width // 2, len(PLACEHOLDER)),
-            placeholder=PLACEHOLDER,
+        width = max(args.width // 2, len(PLACEHOLDER))
+        shorted_file_name = (
+            file_name  # Shortening is slow; most of the names fit anyway.
+            if len(file_name) <= width
+            else textwrap.shorten(file_name, width=width, placeholder=PLACEHOLDER)
         )
         print(f"{f'{shorted_file_name!r}:':<{max(args.width // 4, 20)}} {detail}")
 
@@ -97,74 +135,394 @@ def format_time(seconds: float, args: argparse.Namespace) -> str:
     return f"{seconds/86_400:,.3f}d"  # 24 * 60 * 60 = 86,400
 
 
+def semaphore_type(value: str) -> Union[int, Literal["auto"]]:
+    """
+    Semaphore number is either a positive integer or "auto" for adaptive concurrency.
+    """
+    if value.lower() == "auto":
+        return "auto"
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{value!r} is neither a number nor 'auto'."
+        ) from None
+    if number < 1:
+        raise argparse.ArgumentTypeError("Semaphore number must be at least 1.")
+    return number
+
+
+def shard_type(value: str) -> tuple[int, int]:
+    """
+    Shard is "i/N"; the i-th (starting from 1) of N partitions.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} isn't like 'i/N'.") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("Shard must be between 1/N and N/N.")
+    return index, count
+
+
+def size_type(value: str) -> int:
+    """
+    Size in bytes, e.g. "700", "500K" or "1.5G".
+    """
+    try:
+        return parse_size(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+
+def time_type(value: str) -> float:
+    """
+    Timestamp of an age (e.g. "12h", "7d") or of a date (e.g. "2026-01-31").
+    """
+    try:
+        return parse_time(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+
+def fields_type(value: str) -> tuple[str, ...]:
+    """
+    Comma-separated fields, e.g. "codec,width,height".
+    """
+    try:
+        return parse_fields(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+
+def regex_type(value: str) -> str:
+    """
+    A valid regular expression.
+    """
+    try:
+        re.compile(value)
+    except re.error as error:
+        raise argparse.ArgumentTypeError(f"{value!r}: {error}.") from None
+    return value
+
+
 def checking_args(parser: argparse.ArgumentParser) -> argparse.Namespace:
     """
     if Reversed or Sorted argument was passed without Verbose arg activated, throw an error.
     """
     args = parser.parse_args()
+    if getattr(args, "files_from", None) is not None:
+        if args.path_file != parser.get_default("path_file"):
+            parser.error(
+                "Paths can't be given both as arguments and with --files-from."
+            )
+        if args.recursive or args.watch:
+            parser.error("--files-from can't be used with --recursive or --watch.")
+    if getattr(args, "shard", None) and args.watch:
+        parser.error("--shard can't be used with --watch.")
+    if (
+        getattr(args, "cache_max_entries", None) is not None
+        and args.cache_max_entries < 1
+    ):
+        parser.error("--cache-max-entries needs a positive number.")
+    if getattr(args, "timeout", None) is not None and args.timeout <= 0:
+        parser.error("--timeout needs a positive number of seconds.")
+    if getattr(args, "retries", 0) < 0:
+        parser.error("--retries can't be negative.")
+    if getattr(args, "backoff", 0.0) < 0:
+        parser.error("--backoff can't be negative.")
+    if getattr(args, "walk_depth", None) is not None and args.walk_depth < 0:
+        parser.error("--walk-depth can't be negative.")
+    min_size, max_size = getattr(args, "min_size", None), getattr(
+        args, "max_size", None
+    )
+    if min_size is not None and max_size is not None:
+        if min_size > max_size:
+            parser.error("--min-size is larger than --max-size.")
+    if make_filter(args) is not None and args.watch:
+        parser.error("Filters can't be used with --watch.")
+    if getattr(args, "resume", False) and not args.journal:
+        parser.error("--resume needs a --journal to resume from.")
+    if getattr(args, "null", False) and getattr(args, "files_from", None) is None:
+        parser.error("-0 (--null) is only meaningful with --files-from.")
+    top, bottom = getattr(args, "top", None), getattr(args, "bottom", None)
+    if (ranked := top if top is not None else bottom) is not None:
+        if ranked < 1:
+            parser.error("--top and --bottom need a positive number.")
+        if getattr(args, "watch", False) or getattr(args, "output", "text") != "text":
+            parser.error("--top and --bottom can't be used with --watch or --output.")
+        # Sorting applies to the ranked files only; the rest are never stored.
+        args.descending = args.reverse or (top is not None and not args.sort)
+        args.sort = args.reverse = False
     if not args.verbose:
         if args.sort or args.reverse:
             parser.error(
                 "You should use -v (--verbose) argument first for getting the output sorted"
             )
+    elif getattr(args, "watch", False) and (args.sort or args.reverse):
+        parser.error("Output of --watch can't be sorted.")
+    if getattr(args, "depth", None) is not None:
+        if args.depth < 0:
+            parser.error("--depth can't be negative.")
+        args.tree = True
+    if getattr(args, "tree", False) and getattr(args, "watch", False):
+        parser.error("--tree can't be used with --watch.")
+    if getattr(args, "target_error", None) or getattr(args, "time_budget", None):
+        args.estimate = True
+    if getattr(args, "group_by", None):
+        if args.watch or args.estimate:
+            parser.error("--group-by can't be used with --watch or --estimate.")
+        args.fields = (*args.fields, *group_fields(args.group_by))
+        args.fields = tuple(dict.fromkeys(args.fields))  # Without repeats.
+    if getattr(args, "fields", ()) and args.prober == "native":
+        parser.error("--fields and --group-by need 'ffprobe'; not --prober native.")
+    if getattr(args, "journal", None) and (args.watch or args.estimate):
+        parser.error("--journal can't be used with --watch or --estimate.")
+    if getattr(args, "estimate", False):
+        if args.sample < 1:
+            parser.error("--sample needs a positive number.")
+        if (
+            args.watch
+            or args.tree
+            or args.top
+            or args.bottom
+            or args.sort
+            or args.reverse
+            or args.workers != 1
+            or args.output != "text"
+        ):
+            parser.error(
+                "--estimate prints only the estimated total; it can't be used with --watch, "
+                "--tree, --top, --bottom, sorting, --workers or --output."
+            )
+    if getattr(args, "workers", 1) != 1:
+        if args.workers < 1:
+            parser.error("--workers needs a positive number.")
+        if args.watch or args.dedup:
+            parser.error("--workers can't be used with --watch or --dedup.")
+    if getattr(args, "output", "text") != "text":
+        if args.sort or args.reverse or args.tree or args.watch:
+            parser.error(
+                "--output records are streamed; they can't be sorted, "
+                "used with --tree or --watch."
+            )
     return args
 
 
-def parsing_args() -> argparse.Namespace:
+def add_filter_arguments(parser: argparse.ArgumentParser) -> None:
     """
-    Parsing the passed arguments, read help (-h, --help) for further information.
+    Options pruning the walk; excluded directories aren't listed and excluded files aren't probed.
     """
-    parser = argparse.ArgumentParser(
-        epilog=textwrap.dedent(
-            """
-            Written by: Mahyar Mahdavi <Mahyar@Mahyar24.com>.
-            License: GNU GPLv3.
-            Source Code: <https://github.com/mahyar24/viddur>.
-            Reporting Bugs and PRs are welcomed. :)
-            """
-        )
+    parser.add_argument(
+        "--include",
+        help="Examine only the files matching this glob; globs with a '/' match the path, "
+        "others the name. (repeatable)",
+        action="append",
+        metavar="GLOB",
     )
-    group_vq = parser.add_mutually_exclusive_group()
-    group_sr = parser.add_mutually_exclusive_group()
 
     parser.add_argument(
-        "path_file",
-        nargs="*",
-        default=[os.getcwd()],
-        help="Select desired directory or files, default is $PWD.",
+        "--exclude",
+        help="Skip the files and the directories matching this glob. (repeatable)",
+        action="append",
+        metavar="GLOB",
     )
 
     parser.add_argument(
-        "-a",
-        "--all",
-        help="Program doesn't suggest mime types and take all files as videos. "
-        "(You should be aware of that 'ffprobe' might recognize weird files duration too)",
-        action="store_true",
+        "--include-regex",
+        help="Examine only the files whose path matches this regex. (repeatable)",
+        action="append",
+        type=regex_type,
+        metavar="REGEX",
     )
 
     parser.add_argument(
-        "-f",
-        "--format",
-        help="Format the duration of the file in [S]econds/[M]inutes/[H]ours/[D]ays or [default]",
-        type=lambda x: x.lower()[0] if x.lower() != "default" else "default",
-        choices=["default", "s", "m", "h", "d"],
+        "--exclude-regex",
+        help="Skip the files and the directories whose path matches this regex. (repeatable)",
+        action="append",
+        type=regex_type,
+        metavar="REGEX",
     )
 
     parser.add_argument(
-        "-r",
-        "--recursive",
-        help="Show duration of videos in directories and their contents recursively",
+        "--min-size",
+        help="Skip the files smaller than SIZE. (e.g. 500K, 10M, 1.5G)",
+        type=size_type,
+        metavar="SIZE",
+    )
+
+    parser.add_argument(
+        "--max-size",
+        help="Skip the files larger than SIZE.",
+        type=size_type,
+        metavar="SIZE",
+    )
+
+    parser.add_argument(
+        "--newer",
+        help="Skip the files modified before WHEN; an age (e.g. 12h, 7d, 2w) or a date "
+        "(e.g. 2026-01-31).",
+        type=time_type,
+        metavar="WHEN",
+    )
+
+    parser.add_argument(
+        "--older",
+        help="Skip the files modified after WHEN.",
+        type=time_type,
+        metavar="WHEN",
+    )
+
+    parser.add_argument(
+        "--walk-depth",
+        help="With --recursive, descend at most N directories below the given one; "
+        "0 is only its own files. (--depth only limits the --tree output)",
+        type=int,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "-x",
+        "--one-file-system",
+        help="With --recursive, don't descend into directories on other filesystems.",
         action="store_true",
     )
 
+
+def add_probing_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Options of how files are probed.
+    """
     parser.add_argument(
         "--sem",
         "--semaphore",
-        help="Limiting number of parallel open files.",
-        type=int,
+        help="Limiting number of parallel open files. "
+        "'auto' tunes it at runtime based on the observed latency and throughput.",
+        type=semaphore_type,
         default=SEM_NUM,
     )
 
+    parser.add_argument(
+        "--prober",
+        help="How durations are extracted: parsing the container headers natively, "
+        "running 'ffprobe', or 'auto' which tries the native parsers first and "
+        "falls back to 'ffprobe'. (default: auto)",
+        choices=["native", "ffprobe", "auto"],
+        default="auto",
+    )
+
+    parser.add_argument(
+        "--no-playlists",
+        help="Don't read HLS (.m3u8) and DASH (.mpd) manifests as titles; their segments are "
+        "examined one by one instead of being skipped. (with --files-from, only the segments "
+        "listed after their manifest are skipped)",
+        action="store_false",
+        dest="playlists",
+    )
+
+    parser.add_argument(
+        "--fields",
+        help="Comma-separated fields extracted by the same 'ffprobe' run as the duration, "
+        "shown with -v and in --output; from duration, size, bit_rate, format, codec, "
+        "profile, width, height, fps and pix_fmt. (forces 'ffprobe')",
+        type=fields_type,
+        default=(),
+        metavar="LIST",
+    )
+
+    parser.add_argument(
+        "--sniff",
+        help="Tell videos by the magic numbers of their containers, not only by extensions; "
+        "mislabeled videos are examined and other files are skipped even with --all.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--dedup",
+        help="Examine hardlinks ('inode') or files with identical content ('content', by size and "
+        "a hash of their head and tail) only once, and exclude the duplicates from the total.",
+        choices=["inode", "content"],
+    )
+
+    parser.add_argument(
+        "--count-duplicates",
+        help="With --dedup, count the duplicates in the total too (they still aren't probed).",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--cache",
+        help="Keep durations in a persistent cache and skip probing unchanged files. "
+        f"(default path: {DEFAULT_CACHE_PATH})",
+        nargs="?",
+        const=DEFAULT_CACHE_PATH,
+        metavar="PATH",
+    )
+
+    parser.add_argument(
+        "--cache-max-entries",
+        help="Evict the least recently used cache entries beyond this number.",
+        type=int,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--cache-prune",
+        help="Remove cache entries of deleted or modified files before scanning.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        help="Give up on (and kill) a probe after this many seconds.",
+        type=float,
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--retries",
+        help="Number of times a timed out probe is retried. (default: 0)",
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--backoff",
+        help="Seconds to wait before the first retry; doubled after each one. (default: 0.5)",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--per-device",
+        help="Give each storage device its own --sem budget and probe its files in inode order.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--walk-threads",
+        help="Number of threads listing directories in parallel with --recursive.",
+        type=int,
+        default=WALK_THREADS,
+    )
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Options of how results are printed.
+    """
+    group_vq = parser.add_mutually_exclusive_group()
+    group_sr = parser.add_mutually_exclusive_group()
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="Format the duration of the file in [S]econds/[M]inutes/[H]ours/[D]ays or [default]",
+        type=lambda x: x.lower()[0] if x.lower() != "default" else "default",
+        choices=["default", "s", "m", "h", "d"],
+    )
+
     parser.add_argument(
         "-w",
         "--width",
@@ -206,79 +564,427 @@ def parsing_args() -> argparse.Namespace:
         action="store_true",
     )
 
-    return checking_args(parser)
 
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Parser of all the options; read help (-h, --help) for further information.
+    """
+    parser = argparse.ArgumentParser(
+        epilog=textwrap.dedent(
+            """
+            Written by: Mahyar Mahdavi <Mahyar@Mahyar24.com>.
+            License: GNU GPLv3.
+            Source Code: <https://github.com/mahyar24/viddur>.
+            Reporting Bugs and PRs are welcomed. :)
+            """
+        )
+    )
+
+    parser.add_argument(
+        "path_file",
+        nargs="*",
+        default=[os.getcwd()],
+        help="Select desired directory or files, default is $PWD.",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--all",
+        help="Program doesn't suggest mime types and take all files as videos. "
+        "(You should be aware of that 'ffprobe' might recognize weird files duration too)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        help="Show duration of videos in directories and their contents recursively",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--files-from",
+        help="Read the paths of the files from FILE ('-' for stdin), one per line; they are "
+        "probed as they arrive, so the list can be arbitrarily long.",
+        metavar="FILE",
+    )
+
+    parser.add_argument(
+        "-0",
+        "--null",
+        help="With --files-from, paths are separated by NUL characters. (e.g. 'find -print0')",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--shard",
+        help="Examine only the i-th of N deterministic partitions of the files, for splitting "
+        "a scan across machines; combine their '--output jsonl' with 'viddur merge'.",
+        type=shard_type,
+        metavar="i/N",
+    )
+
+    parser.add_argument(
+        "--journal",
+        help="Append the results to this file as they complete, so an interrupted scan can be "
+        "continued with --resume.",
+        metavar="PATH",
+    )
+
+    parser.add_argument(
+        "--resume",
+        help="Take the results already in the --journal and examine only the rest of the files.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--watch",
+        help="After the scan, keep watching for changes; re-probe only created or modified "
+        "files, drop deleted ones and print the updated total.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--poll",
+        help="With --watch, poll the files' mtimes instead of using inotify. "
+        "(e.g. for network filesystems)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--watch-interval",
+        help=f"Seconds between polls with --poll. (default: {POLL_INTERVAL})",
+        type=float,
+        default=POLL_INTERVAL,
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Write a record per file (and a final summary) in a machine-readable format "
+        "instead of the human readable text. (default: text)",
+        choices=["text", *FORMATS],
+        default="text",
+    )
 
-async def find_duration(file: str) -> Union[float, Literal[False]]:
+    group_tb = parser.add_mutually_exclusive_group()
+
+    group_tb.add_argument(
+        "--top",
+        help="Show only the N longest videos at the end; in descending order unless -s is used.",
+        type=int,
+        metavar="N",
+    )
+
+    group_tb.add_argument(
+        "--bottom",
+        help="Show only the N shortest videos at the end; in ascending order unless --reverse "
+        "is used.",
+        type=int,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--tree",
+        help="Show the subtotal of every directory too, like 'du'.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--depth",
+        help="With --tree, show directories only up to N levels below the input. (implies --tree)",
+        type=int,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--group-by",
+        help="Also show the number of files and the total duration per value of a field, "
+        "e.g. per 'codec' or per 'resolution'. (implies the needed --fields)",
+        choices=GROUPS,
+        metavar="FIELD",
+    )
+
+    parser.add_argument(
+        "--estimate",
+        help="Probe only a random sample of the files and estimate the total (with a 95%% "
+        "confidence interval) from the sizes of all of them.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--sample",
+        help=f"Number of files probed by --estimate at first. (default: {SAMPLE_SIZE})",
+        type=int,
+        default=SAMPLE_SIZE,
+        metavar="N",
+    )
+
+    parser.add_argument(
+        "--target-error",
+        help="Keep growing the sample until the confidence interval is within this fraction "
+        "of the estimate, e.g. 0.02 for 2%%. (implies --estimate)",
+        type=float,
+        metavar="FRACTION",
+    )
+
+    parser.add_argument(
+        "--time-budget",
+        help="Keep growing the sample for at most this many seconds. (implies --estimate)",
+        type=float,
+        metavar="SECONDS",
+    )
+
+    parser.add_argument(
+        "--workers",
+        help="Shard the files across N processes, each one probing with its own --sem; "
+        "for when in-process work (native parsing, --sniff) keeps a core busy. (default: 1)",
+        type=int,
+        default=1,
+        metavar="N",
+    )
+
+    add_filter_arguments(parser)
+    add_probing_arguments(parser)
+    add_output_arguments(parser)
+
+    return parser
+
+
+def parsing_args() -> argparse.Namespace:
     """
-    Get a filename and extract the duration of it. it will return False for failure.
+    Parsing the passed arguments, read help (-h, --help) for further information.
+    """
+    return checking_args(build_parser())
+
+
+def kill(process: asyncio.subprocess.Process) -> None:
+    """
+    Kill the shell and "ffprobe" itself; they are in their own process group.
+    """
+    with contextlib.suppress(ProcessLookupError):
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+
+
+async def run_probe(
+    command: str, timeout: Optional[float] = None
+) -> tuple[Optional[int], bytes]:
+    """
+    Run a probing command; return its exit code and its output.
+    If it doesn't finish in `timeout` seconds, it gets killed and asyncio.TimeoutError is raised.
     """
     process = await asyncio.create_subprocess_shell(
-        COMMAND.format(file),
+        command,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.DEVNULL,
+        start_new_session=True,
     )
-    stdout, _ = await process.communicate()
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException:  # Timed out or cancelled; don't leave a stuck process behind.
+        kill(process)
+        await process.wait()
+        raise
+    return process.returncode, stdout
+
 
+async def find_duration(
+    file: str, timeout: Optional[float] = None
+) -> Union[float, Literal[False]]:
+    """
+    Get a filename and extract the duration of it. it will return False for failure.
+    If "ffprobe" doesn't finish in `timeout` seconds, it gets killed and asyncio.TimeoutError is raised.
+    """
+    returncode, stdout = await run_probe(COMMAND.format(file), timeout)
     if (
-        not process.returncode and stdout != b"N/A\n" and (res := float(stdout))
+        not returncode and stdout != b"N/A\n" and (res := float(stdout))
     ):  # In some cases ffprobe return a successful 0 code but the duration is N/A.
         # furthermore if duration of file is "0" then there is something wrong!
         return res
     return False
 
 
+async def find_metadata(
+    file: str, fields: tuple[str, ...], timeout: Optional[float] = None
+) -> Union[tuple[float, dict], Literal[False]]:
+    """
+    Extract the duration and the fields with a single "ffprobe" run; False for failure.
+    """
+    returncode, stdout = await run_probe(probe_command(fields).format(file), timeout)
+    if returncode or (result := parse_output(stdout, fields)) is None:
+        return False
+    return result
+
+
+async def probe_duration(
+    file: str, args: argparse.Namespace
+) -> Union[float, tuple[float, dict], Literal[False]]:
+    """
+    Extract the duration with the selected prober; native parsers read only a few KB of the file,
+    so "ffprobe" is spawned only if they fail (in "auto" mode).
+    With --fields, "ffprobe" extracts them along with the duration (and the metadata is returned
+    too); the native parsers know only the duration.
+    """
+    if args.fields:
+        return await find_metadata(file, args.fields)
+    if args.prober != "ffprobe":
+        if result := await asyncio.to_thread(native_duration, file):
+            return result
+        if args.prober == "native":
+            return False
+    return await find_duration(file)
+
+
+async def probe_with_retries(
+    file: str, sem: Limiter, args: argparse.Namespace
+) -> tuple[Union[float, tuple[float, dict], Literal[False], None], float]:
+    """
+    Probe the file within a slot of the semaphore; retrying timed out probes with an exponential
+    backoff (outside of the semaphore). Return the duration (None if all of the attempts timed out)
+    and the seconds spent on probing.
+    """
+    elapsed = 0.0
+    for attempt in range(args.retries + 1):
+        if attempt:
+            await asyncio.sleep(args.backoff * 2 ** (attempt - 1))
+        # With cautious of not opening too much file at the same time.
+        async with acquire(sem, file):
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    probe_duration(file, args), args.timeout
+                )
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                elapsed += time.perf_counter() - start
+            return result, elapsed
+    return None, elapsed
+
+
 async def handle(
-    file: str, sem: asyncio.locks.Semaphore, args: argparse.Namespace
+    file: str,
+    sem: Limiter,
+    args: argparse.Namespace,
+    cache: Optional[DurationCache] = None,
+    dedup: Optional[Deduplicator] = None,
+) -> Result:
+    """
+    Get a filename and examine it; return the result without printing anything.
+    If a cache is given, it's consulted before spawning "ffprobe".
+    With a deduplicator, a file with the same content as an examined one isn't examined again.
+    """
+
+    video = await asyncio.to_thread(sniff, file) if args.sniff else None
+    if video is None:
+        video = args.all or media_kind(file) == "video"
+    if not video or (not args.playlists and is_playlist(file)):
+        return Result(file, 0.0, Status.NOT_MEDIA)
+    if dedup is not None:
+        return await dedup.run(file, lambda: examine(file, sem, args, cache))
+    return await examine(file, sem, args, cache)
+
+
+async def examine(
+    file: str,
+    sem: Limiter,
+    args: argparse.Namespace,
+    cache: Optional[DurationCache],
+) -> Result:
+    """
+    Get the duration of a media file from the cache or by probing it.
+    The cache has only durations; with --fields files are probed, but the cache is still updated.
+    """
+    elapsed = 0.0
+    metadata = None
+    result: Union[float, tuple[float, dict], Literal[False], None]
+    key = stat_key(file) if cache is not None else None
+    if (
+        cache is None
+        or key is None
+        or args.fields
+        or (result := cache.get(key)) is None
+    ):
+        result, elapsed = await probe_with_retries(file, sem, args)
+        if isinstance(result, tuple):
+            result, metadata = result
+        if result and cache is not None and key is not None:
+            cache.put(key, file, result)
+    if result is None:
+        return Result(file, 0.0, Status.TIMED_OUT, elapsed)
+    if result:
+        return Result(file, result, Status.OK, elapsed, metadata)
+    return Result(file, 0.0, Status.FAILED, elapsed)
+
+
+def detail(result: Result, args: argparse.Namespace) -> str:
+    """
+    Formatted duration of a result, followed by its fields (if any).
+    """
+    if result.metadata:
+        return f"{format_time(result.duration, args)}  {describe(result.metadata)}"
+    return format_time(result.duration, args)
+
+
+def report(
+    result: Result, args: argparse.Namespace, results: Optional[ResultStore]
 ) -> int:
     """
-    Get a filename and based on the result of processing it, print of store and return status code.
-    """
-
-    mime_guess = mimetypes.guess_type(file)[0]
-    if args.all or (mime_guess is not None and mime_guess.split("/")[0] == "video"):
-        async with sem:  # With cautious of not opening too much file at the same time.
-            result = await find_duration(file)
-        if result:
-            duration = result
-            FILES_DUR[file] = duration
-            if args.verbose:
-                if not (args.sort or args.reverse):
-                    pretty_print(file, format_time(duration, args), args)
-            return 0
-        if not args.quiet:
-            if not (args.sort or args.reverse):
-                pretty_print(file, "cannot get examined.", args)
-            else:
-                FILES_DUR[file] = 0.0
-        return 1
-    if args.verbose:
-        if not (args.sort or args.reverse):
-            pretty_print(file, "is not recognized as a media.", args)
-        else:
-            FILES_DUR[file] = 0.0  # same as `FILES_DUR[file] = False`
-    return 0
+    Print the result or store it for sorting, based on cli args; return its status code.
+    Nothing is stored without a store; it's only needed for sorting.
+    """
+    sorting = args.sort or args.reverse
+    if result.status is Status.OK:
+        if results is not None:
+            results.add(result)
+        if args.verbose and not sorting:
+            pretty_print(result.path, detail(result, args), args)
+        return 0
+    if (
+        args.verbose
+        if result.status in (Status.NOT_MEDIA, Status.DUPLICATE)
+        else not args.quiet
+    ):
+        if not sorting:
+            pretty_print(result.path, MESSAGES[result.status], args)
+        elif results is not None:
+            results.add(result)
+    return int(result.failed)
 
 
-def sorted_msgs(args: argparse.Namespace) -> None:
+def sorted_msgs(results: ResultStore, args: argparse.Namespace) -> None:
     """
     Printing Sorted durations.
     """
-    # noinspection PyTypeChecker
-    sorted_dict = dict(
-        sorted(FILES_DUR.items(), key=lambda item: item[1], reverse=args.reverse)
-    )
-    for key, value in sorted_dict.items():
-        if value:
-            pretty_print(key, format_time(value, args), args)
-        else:  # if value == 0.0, this is a failure.
-            pretty_print(key, "cannot get examined.", args)
+    for result in results.sorted(args.reverse):
+        if result.status is Status.OK:
+            pretty_print(result.path, detail(result, args), args)
+        else:
+            pretty_print(result.path, MESSAGES[result.status], args)
 
 
-def cleanup_inputs(args: argparse.Namespace) -> Union[list[str], Iterator[str]]:
+def cleanup_inputs(
+    args: argparse.Namespace, segments: Optional[SegmentIndex] = None
+) -> Iterable[str]:
     """
     Delivering list of all files based on our parsed arguments.
+    The manifests found while walking are indexed in `segments` (a new index if it isn't given),
+    and so are the given files; files read --files-from are claimed as they come, so a segment
+    listed before its manifest is still examined.
     """
+    walk_filter = make_filter(args)
+    if segments is None and args.playlists:
+        segments = SegmentIndex()
+    files: Iterable[str]
+    if getattr(args, "files_from", None) is not None:
+        files = read_paths(args.files_from, args.null)  # Lazily; read while probing.
+        if walk_filter is not None:
+            files = walk_filter.select(files)
+        return files if segments is None else segments.select(files)
+
     if args.recursive:  # Asserting for bad use of --recursive option.
         if len(args.path_file) != 1 or not os.path.isdir(args.path_file[0]):
             raise NotADirectoryError(
@@ -289,6 +995,8 @@ def cleanup_inputs(args: argparse.Namespace) -> Union[list[str], Iterator[str]]:
         args.path_file[0]
     ):  # Single filename.
         files = args.path_file
+        if walk_filter is not None:
+            files = list(walk_filter.select(files))
     elif (
         len(args.path_file) > 1
     ):  # It must be a list of files (e.g. 1.mkv 2.mp4) or a wildcard (e.g. *.avi)
@@ -296,44 +1004,390 @@ def cleanup_inputs(args: argparse.Namespace) -> Union[list[str], Iterator[str]]:
             os.path.isfile(name) for name in args.path_file
         ):  # Check if all of inputs are files.
             files = args.path_file
+            if walk_filter is not None:
+                files = list(walk_filter.select(files))
+            if segments is not None:
+                files = segments.claim(files)
         else:
             raise FileExistsError("With multiple inputs you must provide only files.")
     elif os.path.isdir((directory := args.path_file[0])):
         if args.recursive:
-            files = (
-                os.path.join(os.path.relpath(path), file)
-                for path, _, files_list in os.walk(top=directory)
-                for file in files_list
+            files = walk(
+                os.path.relpath(directory), args.walk_threads, walk_filter, segments
             )
         else:
-            os.chdir(directory)
-            files = (file for file in os.listdir() if os.path.isfile(file))
+            files = list_files(os.path.relpath(directory), walk_filter, segments)
     else:  # in case of a single invalid argument (e.g. viddur fake) we should fail.
         raise NotADirectoryError(f"{directory!r} is not a valid directory or filename.")
 
     return files
 
 
+def print_breakdown(breakdown: Breakdown, args: argparse.Namespace) -> None:
+    """
+    Print the number of files and the total duration of every group, the longest first.
+    """
+    print(f"\nBy {breakdown.group}:")
+    for key, count, total in breakdown.rows():
+        print(f"{key:<20} {count:>8,} files  {format_time(total, args)}")
+
+
+def tree_root(args: argparse.Namespace) -> str:
+    """
+    Directory that --tree subtotals are relative to; the input directory or $PWD for files.
+    """
+    if len(args.path_file) == 1 and os.path.isdir(args.path_file[0]):
+        return os.path.relpath(args.path_file[0])
+    return os.curdir
+
+
+def print_tree(tree: DurationTree, args: argparse.Namespace) -> None:
+    """
+    Printing the subtotals of directories, "du --max-depth" style.
+    """
+    for directory, total, _ in tree.totals(args.depth):
+        print(f"{format_time(total, args)}\t{directory}")
+
+
+def make_semaphore(args: argparse.Namespace) -> Limiter:
+    """
+    Limiter of simultaneous probes; adaptive with "--sem auto" and per device with --per-device.
+    """
+    if args.per_device:
+        return DeviceScheduler(args.sem)
+    if args.sem == "auto":
+        return AdaptiveLimiter()
+    return asyncio.Semaphore(args.sem)
+
+
+async def worker(
+    queue: asyncio.Queue,
+    output: asyncio.Queue,
+    sem: Limiter,
+    args: argparse.Namespace,
+    cache: Optional[DurationCache],
+    dedup: Optional[Deduplicator],
+) -> None:
+    """
+    Consume files from the queue until a None arrives; results are put in the output queue.
+    """
+    while (file := await queue.get()) is not None:
+        await output.put(await handle(file, sem, args, cache, dedup))
+
+
+async def produce(files: Iterable[str], queue: asyncio.Queue, workers: int) -> None:
+    """
+    Feed files to the workers and then stop them.
+    Files are discovered in a background thread, overlapping with the probes.
+    """
+    async for file in threaded(files):
+        await queue.put(file)  # Blocks while the queue is full.
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def iter_results(
+    files: Iterable[str],
+    args: argparse.Namespace,
+    cache: Optional[DurationCache] = None,
+    sem: Optional[Limiter] = None,
+) -> AsyncGenerator[Result, None]:
+    """
+    Run files through a fixed pool of workers fed from a bounded queue, so probing starts with
+    the first discovered file and memory doesn't grow with the size of the tree.
+    Results are yielded as soon as they are ready; nothing is stored or printed here.
+    """
+    if sem is None:
+        sem = make_semaphore(args)
+    limit = MAX_LIMIT if args.sem == "auto" else args.sem
+    if isinstance(sem, DeviceScheduler):
+        limit *= BUSY_DEVICES
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    output: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    dedup = Deduplicator(args.dedup, args.count_duplicates) if args.dedup else None
+
+    async def run() -> None:
+        # Twice the semaphore; so cached and non-media files don't wait behind the probes.
+        workers = [
+            worker(queue, output, sem, args, cache, dedup) for _ in range(limit * 2)
+        ]
+        gathered = asyncio.gather(produce(files, queue, len(workers)), *workers)
+        try:
+            await gathered
+        except Exception as error:  # pylint: disable=broad-except
+            gathered.cancel()
+            await output.put(error)  # Raised for the consumer.
+        else:
+            await output.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (result := await output.get()) is not None:
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        # The consumer is done (or gone); no probe is started after this, and the running ones
+        # are killed before returning.
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+def open_cache(args: argparse.Namespace) -> Optional[DurationCache]:
+    """
+    Open the persistent cache if it's requested.
+    """
+    if not args.cache:
+        return None
+    cache = DurationCache(args.cache, args.cache_max_entries)
+    if args.cache_prune:
+        cache.prune()
+    return cache
+
+
+def resolve_prober(args: argparse.Namespace) -> None:
+    """
+    Fail if "ffprobe" is needed but not installed; "auto" goes native without it.
+    """
+    if args.prober != "native" and not check_ffprobe():
+        assert args.prober == "auto" and not args.fields, '"ffprobe" is not found.'
+        args.prober = "native"  # Nothing to fall back to.
+
+
+def report_concurrency(sem: Limiter) -> None:
+    """
+    Print the concurrency level that adaptive limiters settled on.
+    """
+    if isinstance(sem, AdaptiveLimiter):
+        print(
+            f"Concurrency settled at {sem.limit} "
+            f"(ranged from {sem.lowest} to {sem.highest})."
+        )
+    elif isinstance(sem, DeviceScheduler):
+        for dev, device in sorted(sem.devices.items()):
+            if (controller := device.controller) is not None:
+                print(
+                    f"Device {dev}: concurrency settled at {controller.limit} "
+                    f"(ranged from {controller.lowest} to {controller.highest})."
+                )
+
+
+async def watch(
+    files: Iterable[str],
+    args: argparse.Namespace,
+    cache: Optional[DurationCache],
+    sem: Limiter,
+    segments: Optional[SegmentIndex] = None,
+) -> int:
+    """
+    Scan the files once and keep the total updated until interrupted.
+    Changed files referenced by a manifest of `segments` are skipped, like while walking.
+    """
+    watcher = make_watcher(
+        args.path_file, args.recursive, args.poll, args.watch_interval
+    )
+    durations: dict[str, float] = {}
+
+    async def update(paths: Iterable[str]) -> None:
+        async for result in iter_results(paths, args, cache, sem):
+            path = os.path.normpath(result.path)
+            if result.status is Status.OK:
+                durations[path] = result.duration
+                if args.verbose:
+                    pretty_print(path, format_time(result.duration, args), args)
+            else:
+                durations.pop(path, None)
+                if args.verbose and result.status is not Status.NOT_MEDIA:
+                    pretty_print(path, MESSAGES[result.status], args)
+        if cache is not None:
+            cache.commit()
+        prefix = "" if args.quiet else "\nTotal Time is: "
+        print(prefix + format_time(sum(durations.values()), args), flush=True)
+
+    await update(files)
+    async for changed, deleted in watcher.changes():
+        remove(durations, deleted)
+        changed_files = sorted(changed)
+        if segments is not None:
+            changed_files = segments.claim(changed_files)
+            if any(
+                map(is_playlist, changed_files)
+            ):  # Its segments may have come before it.
+                for path in [path for path in durations if segments.referenced(path)]:
+                    del durations[path]
+        await update(changed_files)
+    return 0
+
+
+async def print_estimate(
+    files: Iterable[str],
+    args: argparse.Namespace,
+    cache: Optional[DurationCache],
+    sem: Limiter,
+) -> int:
+    """
+    Estimate the total from a sample of the files and print it with its confidence interval.
+    """
+    population = await asyncio.to_thread(collect, files, args.all)
+    if not population:
+        print("Nothing to estimate.")
+        return 1
+    result = await estimate(
+        population,
+        lambda paths: iter_results(paths, args, cache, sem),
+        args.sample,
+        args.target_error,
+        args.time_budget,
+    )
+    if args.quiet:
+        print(format_time(result.total, args))
+        return 0
+    print(
+        f"\nEstimated Total Time is: {format_time(result.total, args)} "
+        f"± {format_time(result.error, args)} (95% confidence)"
+    )
+    print(f"Probed {result.probed:,} of {result.population:,} files.")
+    return 0
+
+
+async def journaled(
+    results: AsyncGenerator[Result, None], journal: Journal
+) -> AsyncGenerator[Result, None]:
+    """
+    Yield the results of a previous run from the journal, then the new ones while journaling them.
+    """
+    for result in journal.done.values():
+        yield result
+    try:
+        async for result in results:
+            journal.record(result)
+            yield result
+    finally:
+        await results.aclose()
+
+
 async def main() -> int:
     """
-    main function. This program is CLI based and you shouldn't run it as a package.
+    main function. This program is CLI based; use viddur.api for running it as a package.
     """
     args = parsing_args()
-    files = cleanup_inputs(args)
-    sem = asyncio.Semaphore(args.sem)
-    tasks = [asyncio.create_task(handle(file, sem, args)) for file in files]
-    results = await asyncio.gather(*tasks)
+    resolve_prober(args)
+    segments = SegmentIndex() if args.playlists else None
+    files = cleanup_inputs(args, segments)
+    if args.shard:
+        files = in_shard(files, *args.shard)
+    journal = Journal(args.journal, args.resume, args.fields) if args.journal else None
+    if journal is not None:
+        files = journal.pending(files)
+    cache = open_cache(args)
+    sem = make_semaphore(args)
+    if args.watch:
+        try:
+            return await watch(files, args, cache, sem, segments)
+        finally:
+            if cache is not None:
+                cache.close()
+    if args.estimate:
+        try:
+            return await print_estimate(files, args, cache, sem)
+        finally:
+            if cache is not None:
+                cache.close()
+    results = ResultStore() if args.sort or args.reverse else None
+    # With a store, the subtotals are rolled up from it at the end instead of file by file.
+    tree = DurationTree(tree_root(args)) if args.tree and results is None else None
+    ranking = (
+        TopK(args.top or args.bottom, bool(args.top))
+        if args.top or args.bottom
+        else None
+    )
+    breakdown = Breakdown(args.group_by) if args.group_by else None
+    writer = make_writer(args.output, sys.stdout, args.fields)
+    count = exit_code = failed = timed_out = duplicates = 0
+    total = elapsed = 0.0
+    if args.workers > 1:
+        results_iterator = iter_pool_results(files, args, cache)
+    else:
+        results_iterator = iter_results(files, args, cache, sem)
+    if journal is not None:
+        results_iterator = journaled(results_iterator, journal)
+    try:
+        async for result in results_iterator:
+            count += 1
+            total += result.duration
+            elapsed += result.elapsed
+            failed += result.failed
+            timed_out += result.status is Status.TIMED_OUT
+            duplicates += result.status is Status.DUPLICATE
+            if writer is None:
+                exit_code |= report(result, args, results)
+            else:
+                exit_code |= result.failed
+                if args.verbose or result.status is not Status.NOT_MEDIA:
+                    writer.record(result)
+            if result.status is Status.OK:
+                if tree is not None:
+                    tree.add(result.path, result.duration)
+                if ranking is not None:
+                    ranking.push(result)
+                if breakdown is not None:
+                    breakdown.add(result)
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        if journal is not None:
+            print(
+                f"\nFinished files are kept in {args.journal!r}; continue with --resume.",
+                file=sys.stderr,
+            )
+        raise
+    finally:
+        # Closed here, not whenever it's collected; so the probes stop while the loop runs.
+        await results_iterator.aclose()
+        if cache is not None:
+            cache.close()
+        if journal is not None:
+            journal.close()
 
-    if tasks:
-        if args.sort or args.reverse:
-            sorted_msgs(args)
-        exit_code = int(
-            any(results)
-        )  # Check to see if any of the checked file is failed; for the return code.
+    if count:
+        if results is not None:
+            sorted_msgs(results, args)
+            if args.tree:
+                tree = results.rollup(tree_root(args))
+        if ranking is not None and not args.quiet:
+            for result in ranking.results(args.descending):
+                pretty_print(result.path, detail(result, args), args)
+        if tree is not None:
+            print_tree(tree, args)
     else:  # bad arguments -> returning failure return code.
         exit_code = 1
 
+    if writer is not None:
+        counts: dict[str, Any] = {
+            "count": count,
+            "failed": failed,
+            "timed_out": timed_out,
+            "duplicates": duplicates,
+        }
+        if cache is not None:
+            counts.update(cache_hits=cache.hits, cache_misses=cache.misses)
+        if args.shard:
+            counts["shard"] = "/".join(map(str, args.shard))
+        if breakdown is not None and writer.kind == "jsonl":
+            counts[f"by_{args.group_by}"] = breakdown.as_dict()
+        writer.summary(total, elapsed, **counts)
+        return exit_code
+
     prefix = "" if args.quiet else "\nTotal Time is: "
-    print(prefix + format_time(sum(FILES_DUR.values()), args))
+    print(prefix + format_time(total, args))
+    if timed_out and not args.quiet:
+        print(f"{timed_out:,} files timed out.")
+    if duplicates and not args.quiet:
+        print(f"{duplicates:,} duplicates excluded.")
+    if cache is not None and not args.quiet:
+        print(f"Cache: {cache.hits:,} hits, {cache.misses:,} misses.")
+    if breakdown is not None and not args.quiet:
+        print_breakdown(breakdown, args)
+    if not args.quiet and args.workers == 1:
+        report_concurrency(sem)
 
     return exit_code
@@ -0,0 +1,243 @@
+#! /usr/bin/python3.9
+
+"""
+Directory traversal based on "os.scandir"; file types come from the cached "d_type" of the
+entries, so there is no extra stat per file. Subdirectories are listed in parallel over a thread pool,
+which pays off on network filesystems (NFS/SMB) where each listing is a round trip.
+A WalkFilter prunes the walk while listing; see "filters". A SegmentIndex drops the segments of
+the HLS/DASH manifests listed so far; see "playlists".
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator, Optional, TypeVar
+
+from .filters import WalkFilter
+from .playlists import SegmentIndex
+
+__all__ = [
+    "WALK_THREADS",
+    "expand",
+    "in_shard",
+    "list_files",
+    "read_paths",
+    "scan_dir",
+    "threaded",
+    "walk",
+]
+
+T = TypeVar("T")
+
+# Number of threads listing directories simultaneously.
+WALK_THREADS = min(32, multiprocessing.cpu_count() * 4)
+# Number of paths handed over to the event loop at once, when it's busy.
+BATCH_SIZE = 256
+# Number of batches waiting in the event loop before the walking thread blocks.
+QUEUE_BATCHES = 16
+# Bytes read at once from a list of paths.
+READ_SIZE = 1 << 16
+
+
+def scan_dir(
+    directory: str, walk_filter: Optional[WalkFilter] = None, depth: int = 0
+) -> tuple[list[str], list[str]]:
+    """
+    List a directory (at `depth` of the walk); return (files, subdirectories) accepted by the filter.
+    Like "os.walk", symbolic links to directories are not followed and unreadable directories are
+    ignored.
+    """
+    files, directories = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    if walk_filter is None or walk_filter.accept_file(entry):
+                        files.append(entry.path)
+                elif not entry.is_symlink() and (
+                    walk_filter is None
+                    or walk_filter.accept_directory(entry, depth + 1)
+                ):
+                    directories.append(os.path.normpath(entry.path))
+    except OSError:
+        pass
+    return files, directories
+
+
+def walk(
+    top: str,
+    threads: int = WALK_THREADS,
+    walk_filter: Optional[WalkFilter] = None,
+    segments: Optional[SegmentIndex] = None,
+) -> Iterator[str]:
+    """
+    Yield the files under `top` recursively, as soon as each directory is listed.
+    The order isn't deterministic, but a directory's manifests are indexed before its
+    subdirectories are listed.
+    """
+    if walk_filter is not None:
+        walk_filter = walk_filter.rooted(top)
+    pool = ThreadPoolExecutor(max_workers=max(threads, 1))
+    try:
+        depths = {pool.submit(scan_dir, top, walk_filter): 0}
+        while depths:
+            done, _ = concurrent.futures.wait(depths, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = depths.pop(future) + 1
+                files, directories = future.result()
+                if segments is not None:
+                    files = segments.claim(files)
+                for path in directories:
+                    depths[pool.submit(scan_dir, path, walk_filter, depth)] = depth
+                yield from files
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def list_files(
+    directory: str,
+    walk_filter: Optional[WalkFilter] = None,
+    segments: Optional[SegmentIndex] = None,
+) -> Iterator[str]:
+    """
+    Yield the paths of the regular files (or links to them) of a directory accepted by the filter.
+    Files of the current directory are yielded by their bare names.
+    """
+    if segments is not None:  # The whole listing is needed for finding the manifests.
+        yield from segments.claim(list_files(directory, walk_filter))
+        return
+    if walk_filter is not None:
+        walk_filter = walk_filter.rooted(directory)
+    bare = directory == os.curdir
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and (
+                    walk_filter is None or walk_filter.accept_file(entry)
+                ):
+                    yield entry.name if bare else entry.path
+            except OSError:
+                continue
+
+
+def expand(
+    paths: Iterable[str],
+    recursive: bool = False,
+    threads: int = WALK_THREADS,
+    walk_filter: Optional[WalkFilter] = None,
+    segments: Optional[SegmentIndex] = None,
+) -> Iterator[str]:
+    """
+    Yield the files of a mix of files and directories; directories are walked if `recursive`.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            if walk_filter is None or walk_filter.accept_path(path):
+                yield path
+        elif recursive:
+            yield from walk(path, threads, walk_filter, segments)
+        else:
+            yield from list_files(path, walk_filter, segments)
+
+
+def in_shard(files: Iterable[str], index: int, count: int) -> Iterator[str]:
+    """
+    Yield the files of the index-th (starting from 1) of `count` partitions, as absolute paths.
+    Files are assigned by the CRC32 of their absolute path, so every node agrees on it, whatever
+    its working directory or listing order; the partials have the same paths to merge.
+    """
+    for file in map(os.path.abspath, files):
+        if zlib.crc32(os.fsencode(file)) % count == index - 1:
+            yield file
+
+
+def read_paths(source: str, null: bool = False) -> Iterator[str]:
+    """
+    Yield the paths listed in a file ("-" is stdin) as they are read; one per line, or separated
+    by NUL characters if `null` (like "find -print0").
+    """
+    separator = b"\0" if null else b"\n"
+    # Unbuffered; a read returns whatever is available, so paths from a pipe flow in as they're
+    # written. Stdin is read through its own file object, not "sys.stdin.buffer" whose lock a
+    # (daemon) thread blocked in a read would hold at exit.
+    stream = open(
+        sys.stdin.fileno() if source == "-" else source,
+        "rb",
+        buffering=0,
+        closefd=source != "-",
+    )
+    with stream:
+        rest = b""
+        while chunk := stream.read(READ_SIZE):
+            *paths, rest = (rest + chunk).split(separator)
+            yield from (os.fsdecode(path) for path in paths if path)
+        if rest:
+            yield os.fsdecode(rest)
+
+
+class _Stopped(Exception):
+    """
+    The consumer of a threaded iterable is gone.
+    """
+
+
+async def threaded(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """
+    Iterate over a blocking iterable in a background thread, so the event loop keeps probing
+    meanwhile. Items are sent in batches while the consumer is busy and immediately when it waits.
+    The thread is a daemon one and isn't waited for if the consumer stops early; it may be blocked
+    on input (e.g. a pipe given to --files-from) that never comes.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_BATCHES)
+    stop = threading.Event()
+    done = object()
+
+    def put(item: object) -> None:
+        if stop.is_set():
+            raise _Stopped
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    raise _Stopped from None
+
+    def pump() -> None:
+        batch: list = []
+        try:
+            for item in iterable:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE or queue.empty():
+                    put(batch)
+                    batch = []
+            put(batch)
+            put(done)
+        except _Stopped:
+            pass
+        except BaseException as error:  # pylint: disable=broad-except
+            try:
+                put(error)  # Raised in the event loop.
+            except _Stopped:
+                pass
+
+    threading.Thread(target=pump, name="viddur-pump", daemon=True).start()
+    try:
+        while (batch := await queue.get()) is not done:
+            if isinstance(batch, BaseException):
+                raise batch
+            for item in batch:
+                yield item
+    finally:
+        stop.set()
@@ -0,0 +1,268 @@
+#! /usr/bin/python3.9
+
+"""
+Watch mode (--watch); scan once, then re-probe only the files that are created or modified and drop
+the deleted ones, printing the updated total after each batch of changes. So the cost of an update is
+proportional to the change, not to the size of the tree.
+Changes come from Linux inotify (through ctypes) or, elsewhere and with --poll (e.g. on network
+filesystems where inotify doesn't see remote changes), from comparing "os.scandir" snapshots.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import AsyncIterator, Iterable, Optional, Union
+
+from .walker import scan_dir
+
+__all__ = ["InotifyWatcher", "PollingWatcher", "make_watcher", "remove"]
+
+# Changes arriving within this many seconds are handled as one batch.
+DEBOUNCE = 0.5
+# Seconds between snapshots of the polling watcher.
+POLL_INTERVAL = 2.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+Changes = tuple[
+    set[str], set[str]
+]  # (created or modified files, deleted files or directories)
+
+
+def _files_under(directory: str, recursive: bool) -> tuple[list[str], list[str]]:
+    """
+    All the files (and the directories) under a directory.
+    """
+    files: list[str] = []
+    directories, pending = [directory], [directory]
+    while pending:
+        found, subdirectories = scan_dir(pending.pop())
+        files.extend(os.path.normpath(path) for path in found)
+        if recursive:
+            directories.extend(subdirectories)
+            pending.extend(subdirectories)
+    return files, directories
+
+
+class PollingWatcher:
+    """
+    Find changes by comparing the (mtime, size) of files between two snapshots.
+    """
+
+    def __init__(
+        self,
+        roots: list[str],
+        recursive: bool,
+        only: Optional[set[str]] = None,
+        interval: float = POLL_INTERVAL,
+    ) -> None:
+        self.roots = roots
+        self.recursive = recursive
+        self.only = only
+        self.interval = interval
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        """
+        Map the watched files to their (mtime_ns, size).
+        """
+        state = {}
+        for root in self.roots:
+            for path in _files_under(root, self.recursive)[0]:
+                if self.only is not None and path not in self.only:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    async def changes(self) -> AsyncIterator[Changes]:
+        """
+        Yield the changes since the previous snapshot, whenever there are some.
+        """
+        previous = await asyncio.to_thread(self.snapshot)
+        while True:
+            await asyncio.sleep(self.interval)
+            current = await asyncio.to_thread(self.snapshot)
+            changed = {
+                path for path, state in current.items() if previous.get(path) != state
+            }
+            deleted = previous.keys() - current.keys()
+            previous = current
+            if changed or deleted:
+                yield changed, set(deleted)
+
+
+class InotifyWatcher:
+    """
+    Find changes with Linux inotify; a watch is added for every watched directory.
+    """
+
+    def __init__(
+        self, roots: list[str], recursive: bool, only: Optional[set[str]] = None
+    ) -> None:
+        self.roots = roots
+        self.recursive = recursive
+        self.only = only
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed.")
+        self._directories: dict[int, str] = {}
+        self._events: asyncio.Queue[tuple[int, int, str]] = asyncio.Queue()
+        for root in roots:
+            self._add_tree(root)
+
+    @staticmethod
+    def available() -> bool:
+        """
+        Check if inotify could be used here.
+        """
+        if not sys.platform.startswith("linux"):
+            return False
+        library = ctypes.util.find_library("c")
+        return library is not None and hasattr(ctypes.CDLL(library), "inotify_init1")
+
+    def _add_tree(self, directory: str) -> list[str]:
+        """
+        Watch a directory (and its subdirectories if recursive); return the files under it.
+        """
+        files, directories = _files_under(directory, self.recursive)
+        for path in directories:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                self._directories[wd] = path
+        return files
+
+    def _read(self) -> None:
+        """
+        Read the pending events of the inotify file descriptor.
+        """
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            self._events.put_nowait((wd, mask, name))
+
+    def _apply(self, wd: int, mask: int, name: str, changes: Changes) -> None:
+        """
+        Translate an event into the changes.
+        """
+        changed, deleted = changes
+        if mask & IN_Q_OVERFLOW:  # Events are lost; start over.
+            deleted.update(self.roots)
+            for root in self.roots:
+                changed.update(_files_under(root, self.recursive)[0])
+            return
+        if mask & IN_IGNORED:
+            self._directories.pop(wd, None)
+            return
+        if (directory := self._directories.get(wd)) is None or not name:
+            return
+        path = os.path.normpath(os.path.join(directory, name))
+        if mask & IN_ISDIR:
+            if not self.recursive:
+                return
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                new_files = self._add_tree(path)
+                changed.update(new_files)
+                deleted.difference_update(new_files)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                deleted.add(path)
+            return
+        if self.only is not None and path not in self.only:
+            return
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            changed.add(path)
+            deleted.discard(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            deleted.add(path)
+            changed.discard(path)
+
+    async def changes(self) -> AsyncIterator[Changes]:
+        """
+        Yield batches of changes, debounced.
+        """
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self._fd, self._read)
+        try:
+            while True:
+                batch: Changes = (set(), set())
+                wd, mask, name = await self._events.get()
+                self._apply(wd, mask, name, batch)
+                while True:
+                    try:
+                        wd, mask, name = await asyncio.wait_for(
+                            self._events.get(), DEBOUNCE
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                    self._apply(wd, mask, name, batch)
+                if batch[0] or batch[1]:
+                    yield batch
+        finally:
+            loop.remove_reader(self._fd)
+            os.close(self._fd)
+
+
+def make_watcher(
+    paths: list[str], recursive: bool, poll: bool, interval: float = POLL_INTERVAL
+) -> Union[PollingWatcher, InotifyWatcher]:
+    """
+    Choose the watcher and what it watches; a directory or a list of files.
+    """
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        roots, only = [os.path.normpath(os.path.relpath(paths[0]))], None
+    else:  # Files; their directories are watched.
+        only = {os.path.normpath(path) for path in paths}
+        roots = sorted({os.path.dirname(path) or os.curdir for path in only})
+    if not poll and InotifyWatcher.available():
+        return InotifyWatcher(roots, recursive, only)
+    return PollingWatcher(roots, recursive, only, interval)
+
+
+def remove(durations: dict[str, float], paths: Iterable[str]) -> None:
+    """
+    Forget deleted files, and every file under the deleted directories. Known files are dropped by
+    their key; the keys are scanned (once for all of them) only for the other paths, which may be
+    directories.
+    """
+    prefixes = []
+    for path in paths:
+        if path in durations:
+            del durations[path]
+        else:
+            prefixes.append(os.path.join(path, "") if path != os.curdir else "")
+    if prefixes:
+        under = tuple(prefixes)
+        for key in [key for key in durations if key.startswith(under)]:
+            del durations[key]